@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Verifica di parità tra il nucleo di inferenza NumPy (utils/inference.py)
+e la pipeline pandas originale di predict_exoplanet, su tutto KOI_cleaned.csv.
+Eseguita nel workflow di build del backend (.github/workflows): esce con
+codice 1 se le probabilità o le classi differiscono.
+"""
+
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Aggiungi il percorso del backend al Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from utils.inference import InferenceCore
+
+CSV_PATH = backend_dir / "data" / "KOI_cleaned.csv"
+MODEL_PATH = backend_dir / "models" / "best_model.pkl"
+SCALER_PATH = backend_dir / "models" / "scaler.pkl"
+
+# Colonne del CSV nell'ordine di scaler.feature_names_in_
+CSV_FEATURES = {
+    'Teff': 'koi_steff',
+    'logg': 'koi_slogg',
+    'radius': 'koi_srad',
+    'mag': 'koi_kepmag',
+    'period': 'koi_period',
+    'duration': 'koi_duration',
+    'depth': 'koi_depth',
+    'planet_radius': 'koi_prad',
+    'insolation': 'koi_insol',
+    'Teq': 'koi_teq',
+}
+
+# Tolleranza sulle probabilità (il modello lavora comunque in float32)
+TOLERANCE = 1e-6
+
+
+def legacy_predict_proba(model, scaler, features: pd.DataFrame, ra_dec: pd.DataFrame) -> np.ndarray:
+    """Pipeline originale: DataFrame -> scaler.transform -> DataFrame -> concat con RA/Dec."""
+    X_scaled = scaler.transform(features)
+    X_scaled_df = pd.DataFrame(X_scaled, columns=scaler.feature_names_in_)
+    X_final = pd.concat([ra_dec.reset_index(drop=True), X_scaled_df], axis=1)
+    return model.predict_proba(X_final)[:, 1]
+
+
+def check_parity() -> bool:
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    core = InferenceCore(model, scaler)
+
+    df = pd.read_csv(CSV_PATH)
+    features = pd.DataFrame({name: df[col].astype(float) for name, col in CSV_FEATURES.items()})
+    features = features[list(scaler.feature_names_in_)]
+    ra_dec = pd.DataFrame({'RA': df['RA'].astype(float), 'Dec': df['Dec'].astype(float)})
+    print(f"📂 Righe nel catalogo: {len(df)}")
+
+    expected = legacy_predict_proba(model, scaler, features, ra_dec)
+
+    # Percorso batch
+    batch = core.score_batch(features.to_numpy(), ra_dec.to_numpy())
+
+    # Percorso a riga singola (quello usato da predict_exoplanet)
+    single = np.empty(len(df))
+    for i, (row, (ra, dec)) in enumerate(zip(features.to_dict("records"), ra_dec.itertuples(index=False))):
+        single[i] = core.score_one(row, ra, dec)
+
+    ok = True
+    for label, got in (("batch", batch), ("riga singola", single)):
+        max_diff = float(np.max(np.abs(got - expected)))
+        class_mismatches = int(np.sum((got > 0.5) != (expected > 0.5)))
+        passed = max_diff <= TOLERANCE and class_mismatches == 0
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {label}: differenza massima {max_diff:.2e}, "
+              f"classi diverse {class_mismatches}")
+    return ok
+
+
+if __name__ == "__main__":
+    print("🔍 Verifica parità pipeline di inferenza...")
+    if check_parity():
+        print("🎉 Il nucleo NumPy coincide con la pipeline pandas!")
+        sys.exit(0)
+    else:
+        print("💥 Differenze rilevate tra le due pipeline!")
+        sys.exit(1)
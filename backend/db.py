@@ -1,11 +1,128 @@
-from sqlalchemy import create_engine
+"""
+Engine SQLAlchemy per il database SQLite.
+Ogni nuova connessione del pool viene configurata con i PRAGMA per letture
+concorrenti: journal WAL (i lettori non si bloccano durante una scrittura),
+mmap, cache delle pagine, synchronous=NORMAL, tabelle temporanee in memoria
+e busy timeout. Con DB_READ_ONLY=1 i worker che servono le API aprono il
+file in sola lettura (URI mode=ro); gli script di import e migrazione vanno
+eseguiti senza questa variabile.
+Accanto all'engine sincrono c'è un engine asincrono (aiosqlite) con la
+stessa configurazione, usato dagli handler async di lista e ricerca:
+l'I/O non occupa i thread del threadpool di FastAPI.
+"""
+
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
+DATABASE_PATH = os.getenv("DATABASE_PATH", "./database.db")
+
+# Apertura in sola lettura per i worker di produzione
+READ_ONLY = os.getenv("DB_READ_ONLY", "0").strip().lower() in ("1", "true", "yes")
+
+# PRAGMA applicati a ogni connessione
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # byte
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Pool per processo: gunicorn crea un pool per worker, quindi la dimensione va
+# commisurata ai thread che in un worker eseguono richieste in parallelo
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", os.getenv("GUNICORN_THREADS", "8")))
+POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def database_url(path: str = DATABASE_PATH, read_only: bool = False, driver: str = "sqlite") -> str:
+    if read_only:
+        return f"{driver}:///file:{path}?mode=ro&uri=true"
+    return f"{driver}:///{path}"
+
+
+def _apply_pragmas(dbapi_connection, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        if not read_only:
+            # journal_mode è persistente nel file: basta impostarlo da una connessione scrivibile
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = {-CACHE_SIZE_KB}")  # negativo = KiB
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+
+def create_sqlite_engine(path: str = DATABASE_PATH, read_only: bool = READ_ONLY,
+                         pool_size: int = POOL_SIZE, max_overflow: int = POOL_OVERFLOW,
+                         begin_immediate: bool = False) -> Engine:
+    """
+    Engine SQLite con PRAGMA di connessione e pool dimensionato per worker.
+    Con begin_immediate=True ogni transazione inizia con BEGIN IMMEDIATE: il
+    lock di scrittura viene preso subito e anche il DDL (DROP/CREATE INDEX)
+    fa parte della transazione, cosa che pysqlite da solo non garantisce.
+    Usato dagli import, che devono essere atomici.
+    """
+    new_engine = create_engine(
+        database_url(path, read_only),
+        connect_args={"check_same_thread": False},  # necessario per SQLite in FastAPI
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=POOL_TIMEOUT,
+    )
+
+    @event.listens_for(new_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, read_only)
+        if begin_immediate:
+            dbapi_connection.isolation_level = None  # le transazioni le apre l'evento begin
+
+    if begin_immediate:
+        @event.listens_for(new_engine, "begin")
+        def _on_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},  # necessario per SQLite in FastAPI
-)
+    return new_engine
+
+
+def create_async_sqlite_engine(path: str = DATABASE_PATH, read_only: bool = READ_ONLY,
+                               pool_size: int = POOL_SIZE, max_overflow: int = POOL_OVERFLOW) -> AsyncEngine:
+    """Engine aiosqlite con gli stessi PRAGMA; ogni connessione ha un proprio thread di I/O."""
+    new_engine = create_async_engine(
+        database_url(path, read_only, driver="sqlite+aiosqlite"),
+        # Di default aiosqlite userebbe NullPool: un nuovo thread e una nuova connessione per richiesta
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=POOL_TIMEOUT,
+    )
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, read_only)
+
+    return new_engine
+
+
+SQLALCHEMY_DATABASE_URL = database_url(DATABASE_PATH, READ_ONLY)
+
+engine = create_sqlite_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+async_engine = create_async_sqlite_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def _dispose_after_fork() -> None:
+    # Con gunicorn --preload il processo figlio non deve riusare le connessioni del padre
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
@@ -1,216 +1,84 @@
 #!/usr/bin/env python3
 """
-Script di importazione CORRETTO per KOI_cleaned.csv
-Gestisce le colonne duplicate e i campi extra presenti nel file reale
+Script di importazione per KOI_cleaned.csv
+Di default sincronizza il database con il CSV in modo incrementale (solo le
+righe nuove, modificate o rimosse, in un'unica transazione); con --full, o
+se la tabella è vuota, ricarica tutto con l'import massivo di
+utils/bulk_import.py (executemany, indici ricostruiti alla fine).
 """
 
 import sys
-import os
-import csv
 from pathlib import Path
 
 # Aggiungi il percorso del backend al Python path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
-from db import SessionLocal, engine
-from models import Planet, Base
+from utils.bulk_import import bulk_import, load_kepoi_names, sync_import
 
-def safe_float(value, default=None):
-    """Converte in float gestendo valori nulli/non validi"""
-    if value is None or value == '' or str(value).lower() in ['nan', 'null', 'none']:
-        return default
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return default
-
-def safe_str(value, default="Unknown"):
-    """Converte in stringa gestendo valori nulli"""
-    if value is None or value == '' or str(value).lower() in ['nan', 'null', 'none']:
-        return default
-    return str(value).strip()
+def import_koi_cleaned(csv_file: Path = backend_dir / "data" / "KOI_cleaned.csv", full: bool = False):
+    """Importa i dati dal KOI_cleaned.csv: sincronizzazione incrementale o, con full=True, ricaricamento completo"""
 
-def import_koi_cleaned():
-    """Importa i dati dal KOI_cleaned.csv con la struttura reale del file"""
-    
-    # Percorso del file CSV
-    csv_file = backend_dir / "data" / "KOI_cleaned.csv"
-    
     if not csv_file.exists():
         print(f"❌ File CSV non trovato: {csv_file}")
         return False
-    
-    # Crea le tabelle se non esistono
-    Base.metadata.create_all(bind=engine)
-    
-    # Crea sessione database
-    db = SessionLocal()
-    
+
+    # Designazioni KOI reali per i pianeti Kepler
+    kepoi_names = load_kepoi_names(backend_dir / "data" / "KOI_with_esi.csv")
+    print(f"🏷️  Designazioni KOI disponibili: {len(kepoi_names)}")
+    print(f"📂 Lettura CSV da: {csv_file}")
+
     try:
-        print(f"📂 Lettura CSV da: {csv_file}")
-        
-        # Controlla se ci sono già dati
-        existing_count = db.query(Planet).count()
-        if existing_count > 0:
-            print(f"⚠️  Database contiene già {existing_count} pianeti")
-            # Elimina tutti i record esistenti per ricominciare da capo
-            db.query(Planet).delete()
-            db.commit()
-            print("🗑️  Dati esistenti eliminati")
-        
-        # Leggi il CSV
-        imported = 0
-        errors = 0
-        stats = {
-            'CONFIRMED': 0,
-            'CANDIDATE': 0,
-            'FALSE POSITIVE': 0
-        }
-        
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            # Leggi l'header per capire la struttura
-            first_line = f.readline().strip()
-            columns = [col.strip() for col in first_line.split(',')]
-            print(f"📋 Colonne trovate: {len(columns)}")
-            
-            # Trova gli indici delle colonne che ci interessano
-            col_indices = {}
-            # TUTTE le colonne dal CSV, incluse le nuove
-            required_cols = [
-                'koi_disposition', 'RA', 'Dec', 
-                'koi_steff', 'koi_slogg', 'koi_srad', 'koi_kepmag',
-                'koi_period', 'koi_duration', 'koi_depth', 
-                'koi_prad', 'koi_insol', 'koi_teq',
-                'source'
-            ]
-            
-            for i, col in enumerate(columns):
-                if col in required_cols:
-                    # Per ra e dec duplicati, usa la prima occorrenza
-                    if col not in col_indices:
-                        col_indices[col] = i
-            
-            print(f"📍 Indici colonne utilizzate:")
-            for col, idx in col_indices.items():
-                print(f"   {col}: posizione {idx}")
-            
-            # Processa ogni riga
-            for line_num, line in enumerate(f, 2):
-                try:
-                    # Rimuovi whitespace e dividi
-                    line = line.strip()
-                    if not line:
-                        continue
-                        
-                    values = [val.strip() for val in line.split(',')]
-                    
-                    # Verifica che abbiamo abbastanza colonne
-                    if len(values) < len(columns):
-                        print(f"⚠️  Riga {line_num}: colonne insufficienti ({len(values)}/{len(columns)})")
-                        errors += 1
-                        continue
-                    
-                    # Estrai i valori usando gli indici
-                    def get_value(col_name, default=None):
-                        idx = col_indices.get(col_name)
-                        if idx is not None and idx < len(values):
-                            return values[idx]
-                        return default
-                    
-                    # Verifica che almeno koi_disposition sia presente
-                    disposition = safe_str(get_value('koi_disposition'))
-                    if disposition == "Unknown":
-                        errors += 1
-                        continue
-                    
-                    # Crea il pianeta con TUTTI i dati dal CSV
-                    planet = Planet(
-                        koi_disposition=disposition,
-                        ra=safe_float(get_value('RA')),
-                        dec=safe_float(get_value('Dec')),
-                        # Proprietà stellari
-                        koi_steff=safe_float(get_value('koi_steff')),
-                        koi_slogg=safe_float(get_value('koi_slogg')),
-                        koi_srad=safe_float(get_value('koi_srad')),
-                        koi_kepmag=safe_float(get_value('koi_kepmag')),
-                        # Proprietà planetarie
-                        koi_period=safe_float(get_value('koi_period')),
-                        koi_duration=safe_float(get_value('koi_duration')),
-                        koi_depth=safe_float(get_value('koi_depth')),
-                        koi_prad=safe_float(get_value('koi_prad'), 1.0),  # Default 1.0 per compatibilità
-                        koi_insol=safe_float(get_value('koi_insol')),
-                        koi_teq=safe_float(get_value('koi_teq')),
-                        # Metadata
-                        source=safe_str(get_value('source'), "Kepler")
-                    )
-                    
-                    # Aggiungi al database
-                    db.add(planet)
-                    imported += 1
-                    
-                    # Aggiorna statistiche
-                    disp = planet.koi_disposition
-                    if disp in stats:
-                        stats[disp] += 1
-                    
-                    # Commit ogni 1000 record per performance
-                    if imported % 1000 == 0:
-                        db.commit()
-                        print(f"📦 Importati {imported} pianeti...")
-                
-                except Exception as e:
-                    errors += 1
-                    if errors <= 5:  # Mostra solo i primi 5 errori
-                        print(f"❌ Errore riga {line_num}: {e}")
-                    continue
-        
-        # Commit finale
-        db.commit()
-        
-        # Report finale
-        print("\n" + "="*50)
-        print("📊 IMPORTAZIONE COMPLETATA")
-        print("="*50)
-        print(f"✅ Pianeti importati: {imported}")
-        print(f"❌ Errori: {errors}")
-        if imported + errors > 0:
-            print(f"📈 Percentuale successo: {(imported/(imported+errors)*100):.1f}%")
-        
-        print("\n📋 Distribuzione per disposizione:")
-        for disp, count in stats.items():
-            if imported > 0:
-                percentage = (count/imported*100)
-                print(f"   {disp}: {count} ({percentage:.1f}%)")
-            else:
-                print(f"   {disp}: {count}")
-        
-        # Verifica indici
-        print(f"\n🔍 Verifica indici database:")
-        print(f"   Indice ra: ✅")
-        print(f"   Indice dec: ✅") 
-        print(f"   Indice koi_prad: ✅")
-        print(f"   Indice koi_teq: ✅")
-        
-        return imported > 0
-        
+        if full:
+            report = bulk_import(csv_file, kepoi_names=kepoi_names)
+        else:
+            report = sync_import(csv_file, kepoi_names=kepoi_names)
     except Exception as e:
-        print(f"💥 Errore fatale durante l'importazione: {e}")
+        print(f"💥 Errore fatale durante l'importazione (database invariato): {e}")
         import traceback
         traceback.print_exc()
-        db.rollback()
         return False
-        
-    finally:
-        db.close()
+
+    # Report finale
+    accepted = report.imported + report.updated + report.unchanged
+    total = accepted + report.quarantined
+    print("\n" + "="*50)
+    print(f"📊 IMPORTAZIONE COMPLETATA ({'sincronizzazione' if report.mode == 'sync' else 'completa'})")
+    print("="*50)
+    print(f"✅ Pianeti inseriti: {report.imported}")
+    if report.mode == "sync":
+        print(f"🔄 Pianeti aggiornati: {report.updated}")
+        print(f"💤 Pianeti invariati: {report.unchanged}")
+        print(f"🪦 Pianeti rimossi: {report.removed}")
+    print(f"🚧 Righe in quarantena: {report.quarantined}")
+    if total > 0:
+        print(f"📈 Percentuale successo: {(accepted/total*100):.1f}%")
+
+    print("\n📋 Distribuzione per disposizione:")
+    for disp, count in sorted(report.dispositions.items()):
+        print(f"   {disp}: {count} ({count/max(accepted, 1)*100:.1f}%)")
+
+    if report.rejected:
+        print("\n🚧 Motivi di rifiuto (tabella import_quarantine):")
+        for (reason, column), count in sorted(report.rejected.items(), key=lambda item: -item[1]):
+            print(f"   {reason} [{column}]: {count}")
+
+    print("\n⏱️  Tempi:")
+    print(f"   Conversione: {report.convert_seconds:.2f}s")
+    print(f"   Inserimento: {report.insert_seconds:.2f}s")
+    print(f"   Indici: {report.index_seconds:.2f}s")
+    print(f"   Totale: {report.total_seconds:.2f}s ({report.rows_per_second:,.0f} righe/s)")
+
+    return accepted > 0
 
 if __name__ == "__main__":
-    print("🚀 Avvio importazione KOI_cleaned.csv (VERSIONE CORRETTA)")
-    success = import_koi_cleaned()
-    
+    full = "--full" in sys.argv[1:]
+    print(f"🚀 Avvio importazione KOI_cleaned.csv ({'completa' if full else 'incrementale'})")
+    success = import_koi_cleaned(full=full)
+
     if success:
         print("🎉 Importazione completata con successo!")
         exit(0)
     else:
         print("💥 Importazione fallita!")
-        exit(1)
\ No newline at end of file
+        exit(1)
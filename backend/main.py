@@ -1,12 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from db import Base, engine
-from routers import planets, similarity, predictions  # Aggiunto predictions per ML
+from fastapi.responses import PlainTextResponse
+from db import Base, READ_ONLY, async_engine, engine
+from routers import planets, similarity, predictions, optimized_search, stats, tiles  # Aggiunto predictions per ML
+from utils.catalog import load_catalog
+from utils.sky_index import get_sky_index
+from utils.neighbors import get_neighbor_index
+from utils.sky_tiles import get_sky_tiles
+from utils.model_loader import load_models
+from utils.metrics import MetricsMiddleware, registry
+from utils.inference_pool import dispatcher
+from utils.name_search import ensure_name_index
+from utils.pagination import NEXT_CURSOR_HEADER
 
-app = FastAPI(title="A World Away - Exoplanet Backend", version="0.1.0")
+if not READ_ONLY:
+    # ✅ Crea le tabelle (se usi SQLAlchemy)
+    Base.metadata.create_all(bind=engine)
+    # 🔎 Indice trigram per la ricerca dei nomi per sottostringa
+    ensure_name_index(engine)
 
-# ✅ Crea le tabelle (se usi SQLAlchemy)
-Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 🪐 Carica lo snapshot del catalogo una sola volta all'avvio
+    load_catalog()
+    # 🌌 Indice spaziale (KD-tree) per le ricerche per posizione sul cielo
+    get_sky_index()
+    # 🤖 Carica modello/scaler ed esegue il warmup prima della prima richiesta
+    load_models()
+    # 🔭 KD-tree per i pianeti simili (usa media e scala dello scaler)
+    get_neighbor_index()
+    # 🧩 Piramide di tile del cielo per la GalaxyMap (criterio di default)
+    get_sky_tiles()
+    yield
+    # 🧵 Chiude il pool di thread dell'inferenza
+    dispatcher.shutdown()
+    # 🔌 Chiude le connessioni aiosqlite (un thread di I/O per connessione)
+    await async_engine.dispose()
+
+
+app = FastAPI(title="A World Away - Exoplanet Backend", version="0.1.0", lifespan=lifespan)
 
 # ✅ Abilita CORS per il frontend React
 app.add_middleware(
@@ -15,19 +49,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Cursore della paginazione keyset
 )
 
+# 📈 Istogrammi di latenza per router, esposti su /metrics
+app.add_middleware(MetricsMiddleware)
+
 # ✅ Registra i router con prefisso coerente
 app.include_router(planets.router, prefix="/api", tags=["Planets"])
 app.include_router(similarity.router, prefix="/api", tags=["Similarity"])
 app.include_router(predictions.router, prefix="/api", tags=["ML Predictions"])  # 🤖 Router ML
-# app.include_router(optimized_search.router, prefix="/api", tags=["Optimized Search"])  # Temporaneamente disabilitato
+app.include_router(optimized_search.router, prefix="/api", tags=["Optimized Search"])
+app.include_router(stats.router, prefix="/api", tags=["Stats"])  # 📊 Aggregati per le viste di popolazione
+app.include_router(tiles.router, prefix="/api", tags=["Sky Tiles"])  # 🧩 Tile del cielo a livelli di dettaglio
 
 # ✅ Rotta di test per verificare che il backend risponde
 @app.get("/")
 def root():
     return {"status": "Backend attivo 🚀 con database SQLite"}
 
+# 📈 Metriche in formato testuale Prometheus
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Avvio server FastAPI...")
@@ -0,0 +1,101 @@
+"""
+Script di migrazione per materializzare le colonne name e kepoi_name
+della tabella planets, con indici COLLATE NOCASE per la ricerca per
+prefisso e un indice FTS5 trigram per la ricerca per sottostringa.
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+# Aggiungi il percorso del backend al Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from db import engine
+from models import BUMP_CATALOG_VERSION_SQL, CatalogVersion
+from utils.bulk_import import load_kepoi_names
+from utils.name_search import ensure_name_index
+
+# Percorso del database
+DB_PATH = backend_dir / "database.db"
+
+# Colonne dei nomi e indici (stessi nomi di models.py)
+NAME_COLUMNS = ["name", "kepoi_name"]
+NAME_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_planets_name ON planets(name)",
+    "CREATE INDEX IF NOT EXISTS ix_planets_kepoi_name ON planets(kepoi_name)",
+]
+
+def add_name_columns(cursor):
+    """Aggiunge le colonne dei nomi mancanti e i relativi indici."""
+    cursor.execute("PRAGMA table_info(planets)")
+    columns = {row[1] for row in cursor.fetchall()}
+    for column in NAME_COLUMNS:
+        if column in columns:
+            print(f"  ✓ Colonna {column} già presente")
+        else:
+            cursor.execute(f"ALTER TABLE planets ADD COLUMN {column} VARCHAR COLLATE NOCASE")
+            print(f"  ✓ Colonna {column} aggiunta")
+    for index_sql in NAME_INDEXES:
+        cursor.execute(index_sql)
+
+def fill_names(cursor):
+    """Popola i nomi mancanti: KOI-<id> e, per i pianeti Kepler, la designazione KOI reale."""
+    cursor.execute("UPDATE planets SET name = printf('KOI-%05d', id) WHERE name IS NULL")
+    named = cursor.rowcount
+    kepoi_names = load_kepoi_names(backend_dir / "data" / "KOI_with_esi.csv")
+    cursor.execute("SELECT id, ra, dec, koi_period FROM planets WHERE kepoi_name IS NULL")
+    values = [
+        (kepoi_names[(ra, dec, period)], planet_id)
+        for planet_id, ra, dec, period in cursor.fetchall()
+        if (ra, dec, period) in kepoi_names
+    ]
+    cursor.executemany("UPDATE planets SET kepoi_name = ? WHERE id = ?", values)
+    return named, len(values)
+
+def migrate():
+    print("🔧 Connessione al database...")
+    # Tabella della versione del catalogo (definita in models.py), incrementata al commit
+    CatalogVersion.__table__.create(bind=engine, checkfirst=True)
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        add_name_columns(cursor)
+        print("🏷️  Popolamento nomi in corso...")
+        named, designated = fill_names(cursor)
+        cursor.execute(BUMP_CATALOG_VERSION_SQL)
+        cursor.execute("ANALYZE")
+        conn.commit()
+        print(f"✅ Nomi generati: {named:,} — designazioni KOI associate: {designated:,}")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Errore durante la migrazione: {e}")
+        conn.rollback()
+        raise
+        
+    finally:
+        conn.close()
+        print("🔐 Connessione al database chiusa.")
+    
+    # Indice FTS5 trigram e trigger di sincronizzazione, ricostruito dal contenuto attuale
+    print("🔎 Ricostruzione indice trigram dei nomi...")
+    if ensure_name_index(engine, rebuild=True):
+        print("✅ Indice trigram pronto")
+
+if __name__ == "__main__":
+    print("🚀 Avvio migrazione database per materializzare i nomi...")
+    print(f"📍 Database: {DB_PATH}")
+    
+    if not DB_PATH.exists():
+        print("❌ File database non trovato! Assicurati che il database esista.")
+        exit(1)
+    
+    try:
+        migrate()
+        print("\n🎉 Migrazione completata con successo!")
+        
+    except Exception as e:
+        print(f"\n💥 Errore durante la migrazione: {e}")
+        exit(1)
@@ -0,0 +1,101 @@
+"""
+Script di migrazione per aggiungere le colonne esi e habitability_score
+(con i relativi indici) alla tabella planets e calcolare i punteggi dei
+pianeti già importati.
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Aggiungi il percorso del backend al Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from db import engine
+from models import BUMP_CATALOG_VERSION_SQL, CatalogVersion
+from utils.esi import compute_esi, compute_habitability
+
+# Percorso del database
+DB_PATH = backend_dir / "database.db"
+
+# Colonne dei punteggi e indici usati per le classifiche (stessi nomi di models.py)
+SCORE_COLUMNS = ["esi", "habitability_score"]
+SCORE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_planets_esi ON planets(esi)",
+    "CREATE INDEX IF NOT EXISTS ix_planets_habitability_score ON planets(habitability_score)",
+]
+
+def add_score_columns(cursor):
+    """Aggiunge le colonne dei punteggi mancanti e i relativi indici."""
+    cursor.execute("PRAGMA table_info(planets)")
+    columns = {row[1] for row in cursor.fetchall()}
+    for column in SCORE_COLUMNS:
+        if column in columns:
+            print(f"  ✓ Colonna {column} già presente")
+        else:
+            cursor.execute(f"ALTER TABLE planets ADD COLUMN {column} FLOAT")
+            print(f"  ✓ Colonna {column} aggiunta")
+    for index_sql in SCORE_INDEXES:
+        cursor.execute(index_sql)
+
+def recompute_scores(cursor):
+    """Ricalcola ESI e abitabilità di tutti i pianeti con un solo passaggio vettoriale."""
+    cursor.execute("SELECT id, koi_prad, koi_teq, koi_period FROM planets")
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+    ids, radius, temperature, period = zip(*rows)
+    radius = np.array(radius, dtype=np.float64)
+    temperature = np.array(temperature, dtype=np.float64)
+    esi = compute_esi(radius, temperature).tolist()
+    habitability = compute_habitability(radius, temperature, np.array(period, dtype=np.float64)).tolist()
+    values = [
+        (None if esi_value != esi_value else esi_value, score, planet_id)
+        for esi_value, score, planet_id in zip(esi, habitability, ids)
+    ]
+    cursor.executemany("UPDATE planets SET esi = ?, habitability_score = ? WHERE id = ?", values)
+    return len(values)
+
+def migrate():
+    print("🔧 Connessione al database...")
+    # Tabella della versione del catalogo (definita in models.py), incrementata al commit
+    CatalogVersion.__table__.create(bind=engine, checkfirst=True)
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        add_score_columns(cursor)
+        print("🌍 Calcolo ESI e abitabilità in corso...")
+        updated = recompute_scores(cursor)
+        cursor.execute(BUMP_CATALOG_VERSION_SQL)
+        cursor.execute("ANALYZE")
+        conn.commit()
+        print(f"✅ Punteggi calcolati per {updated:,} pianeti")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Errore durante la migrazione: {e}")
+        conn.rollback()
+        raise
+        
+    finally:
+        conn.close()
+        print("🔐 Connessione al database chiusa.")
+
+if __name__ == "__main__":
+    print("🚀 Avvio migrazione database per aggiunta punteggi (ESI, abitabilità)...")
+    print(f"📍 Database: {DB_PATH}")
+    
+    if not DB_PATH.exists():
+        print("❌ File database non trovato! Assicurati che il database esista.")
+        exit(1)
+    
+    try:
+        migrate()
+        print("\n🎉 Migrazione completata con successo!")
+        
+    except Exception as e:
+        print(f"\n💥 Errore durante la migrazione: {e}")
+        exit(1)
@@ -0,0 +1,94 @@
+"""
+Script di migrazione per la sincronizzazione incrementale del catalogo:
+aggiunge alla tabella planets le colonne sync_key (indice univoco) e
+content_hash, crea la tabella planet_tombstones e calcola chiave e hash
+dei pianeti già importati, così che il primo sync non riscriva tutto.
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Aggiungi il percorso del backend al Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from db import engine
+from models import PlanetTombstone
+from utils.bulk_import import HASH_COLUMNS, content_hashes, sync_keys
+
+# Percorso del database
+DB_PATH = backend_dir / "database.db"
+
+# Colonne di sincronizzazione e indice (stessi nomi di models.py)
+SYNC_COLUMNS = {"sync_key": "VARCHAR", "content_hash": "VARCHAR(16)"}
+SYNC_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS ix_planets_sync_key ON planets(sync_key)"
+
+def add_sync_columns(cursor):
+    """Aggiunge le colonne di sincronizzazione mancanti."""
+    cursor.execute("PRAGMA table_info(planets)")
+    columns = {row[1] for row in cursor.fetchall()}
+    for column, column_type in SYNC_COLUMNS.items():
+        if column in columns:
+            print(f"  ✓ Colonna {column} già presente")
+        else:
+            cursor.execute(f"ALTER TABLE planets ADD COLUMN {column} {column_type}")
+            print(f"  ✓ Colonna {column} aggiunta")
+
+def fill_sync_keys(conn):
+    """Chiave e hash per le righe che non li hanno (una chiave duplicata resta NULL)."""
+    table = pd.read_sql_query(
+        f"SELECT id, {', '.join(HASH_COLUMNS)} FROM planets WHERE sync_key IS NULL ORDER BY id", conn
+    )
+    if table.empty:
+        return 0
+    table["sync_key"] = sync_keys(table)
+    table["content_hash"] = content_hashes(table)
+    existing = {row[0] for row in conn.execute("SELECT sync_key FROM planets WHERE sync_key IS NOT NULL")}
+    table = table[~table["sync_key"].duplicated() & ~table["sync_key"].isin(existing)]
+    conn.executemany(
+        "UPDATE planets SET sync_key = ?, content_hash = ? WHERE id = ?",
+        zip(table["sync_key"].tolist(), table["content_hash"].tolist(), table["id"].tolist()),
+    )
+    return len(table)
+
+def migrate():
+    print("🔧 Connessione al database...")
+    # Tabella delle lapidi (definita in models.py)
+    PlanetTombstone.__table__.create(bind=engine, checkfirst=True)
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        add_sync_columns(cursor)
+        print("🔑 Calcolo chiavi e hash del contenuto...")
+        filled = fill_sync_keys(conn)
+        cursor.execute(SYNC_INDEX)
+        conn.commit()
+        print(f"✅ Chiavi di sincronizzazione calcolate per {filled:,} pianeti")
+
+    except sqlite3.Error as e:
+        print(f"❌ Errore durante la migrazione: {e}")
+        conn.rollback()
+        raise
+
+    finally:
+        conn.close()
+        print("🔐 Connessione al database chiusa.")
+
+if __name__ == "__main__":
+    print("🚀 Avvio migrazione: chiavi di sincronizzazione del catalogo")
+
+    if not DB_PATH.exists():
+        print("❌ File database non trovato! Assicurati che il database esista.")
+        exit(1)
+
+    try:
+        migrate()
+        print("\n🎉 Migrazione completata con successo!")
+
+    except Exception as e:
+        print(f"\n💥 Errore durante la migrazione: {e}")
+        exit(1)
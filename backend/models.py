@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, Index
+from sqlalchemy import Column, DateTime, Integer, String, Float, Index, event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from db import Base
+from utils.esi import compute_esi, compute_habitability
 
 class Planet(Base):
     __tablename__ = "planets"
 
     id = Column(Integer, primary_key=True, index=True)
+    # Nomi materializzati; COLLATE NOCASE rende gli indici utilizzabili per la ricerca per prefisso
+    name = Column(String(collation="NOCASE"), index=True)  # Nome mostrato dal frontend (KOI-00001)
+    kepoi_name = Column(String(collation="NOCASE"), index=True)  # Designazione KOI reale (K00752.01), se nota
     # Coordinate celesti
     ra = Column(Float, index=True)  # Right Ascension (RA)
     dec = Column(Float, index=True)  # Declination (Dec)
@@ -26,12 +32,15 @@ class Planet(Base):
     
     source = Column(String)  # Sorgente (es. Kepler)
     
-    # Campi di compatibilità per il frontend
-    @property
-    def name(self):
-        """Genera un nome basato su ID e coordinate"""
-        return f"KOI-{self.id:05d}"
+    # Punteggi derivati (utils/esi.py), ricalcolati a ogni flush se cambiano gli input
+    esi = Column(Float, index=True)  # Earth Similarity Index
+    habitability_score = Column(Float, index=True)  # Punteggio di abitabilità semplificato
+
+    # Sincronizzazione incrementale con il CSV (utils/bulk_import.py); NULL per i pianeti aggiunti via API
+    sync_key = Column(String, unique=True, index=True)  # kepoi_name, o sorgente + RA/Dec/periodo se manca
+    content_hash = Column(String(16))  # Hash delle colonne del CSV, per riconoscere le righe modificate
     
+    # Campi di compatibilità per il frontend
     @property 
     def radius(self):
         """Alias per koi_prad (compatibilità frontend)"""
@@ -64,3 +73,103 @@ class Planet(Base):
         Index('idx_celestial_coords', 'ra', 'dec'),  # Per coordinate celesti
         Index('idx_disposition', 'koi_disposition'),  # Per stato conferma
     )
+
+class PlanetTombstone(Base):
+    """Pianeta rimosso dal catalogo da una sincronizzazione incrementale."""
+    __tablename__ = "planet_tombstones"
+
+    id = Column(Integer, primary_key=True)  # id che il pianeta aveva nella tabella planets
+    sync_key = Column(String, index=True)
+    kepoi_name = Column(String)
+    removed_at = Column(DateTime, index=True)
+
+
+class QuarantinedRow(Base):
+    """Riga del CSV rifiutata dalla validazione dell'import (utils/import_validation.py)."""
+    __tablename__ = "import_quarantine"
+
+    id = Column(Integer, primary_key=True)
+    run_at = Column(DateTime, index=True)  # Inizio dell'import che l'ha rifiutata
+    source_file = Column(String, index=True)
+    line = Column(Integer)  # Riga nel file CSV (1 = intestazione)
+    reason = Column(String, index=True)  # Codice del motivo (missing_required, out_of_range, ...)
+    column_name = Column(String)  # Colonna che ha violato la regola
+    value = Column(String)  # Valore rifiutato, come letto dal CSV
+    raw = Column(String)  # Riga completa in JSON
+
+
+class CatalogVersion(Base):
+    """Versione del catalogo (riga unica con id 1), incrementata a ogni import o modifica dei pianeti."""
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)  # Base degli ETag delle API (utils/http_cache.py)
+    updated_at = Column(DateTime)
+
+
+# Incrementa la versione nella transazione corrente. La prima versione è il timestamp
+# Unix: un database ricreato non riusa versioni (ed ETag) già viste dai client
+BUMP_CATALOG_VERSION_SQL = (
+    "INSERT INTO catalog_version (id, version, updated_at) "
+    "VALUES (1, CAST(strftime('%s', 'now') AS INTEGER), CURRENT_TIMESTAMP) "
+    "ON CONFLICT(id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP"
+)
+
+
+def bump_catalog_version(connection) -> None:
+    """Nuova versione del catalogo, visibile solo al commit della transazione di `connection`."""
+    connection.exec_driver_sql(BUMP_CATALOG_VERSION_SQL)
+
+
+def default_planet_name(planet_id: int) -> str:
+    """Nome generato dall'id, usato quando il pianeta non ne ha uno."""
+    return f"KOI-{planet_id:05d}"
+
+
+@event.listens_for(Planet, "after_insert")
+def _assign_default_name(mapper, connection, target):
+    """I pianeti inseriti senza nome ricevono KOI-<id> appena l'id è noto."""
+    if target.name is None:
+        name = default_planet_name(target.id)
+        connection.execute(Planet.__table__.update().where(Planet.__table__.c.id == target.id).values(name=name))
+        set_committed_value(target, "name", name)
+
+
+# Colonne da cui dipendono esi e habitability_score
+SCORE_INPUTS = ('koi_prad', 'koi_teq', 'koi_period')
+
+
+def _score_inputs_changed(planet: Planet) -> bool:
+    state = inspect(planet)
+    return any(state.attrs[name].history.has_changes() for name in SCORE_INPUTS)
+
+
+def update_planet_scores(planets) -> None:
+    """Calcola esi e habitability_score per un gruppo di pianeti in un solo passaggio vettoriale."""
+    if not planets:
+        return
+    nan = float('nan')
+    radius = [nan if p.koi_prad is None else p.koi_prad for p in planets]
+    temperature = [nan if p.koi_teq is None else p.koi_teq for p in planets]
+    period = [nan if p.koi_period is None else p.koi_period for p in planets]
+    esi = compute_esi(radius, temperature).tolist()
+    habitability = compute_habitability(radius, temperature, period).tolist()
+    for planet, esi_value, score in zip(planets, esi, habitability):
+        planet.esi = None if esi_value != esi_value else esi_value
+        planet.habitability_score = score
+
+
+@event.listens_for(Session, "before_flush")
+def _refresh_planet_scores(session, flush_context, instances):
+    """Ricalcolo incrementale: solo i pianeti nuovi o con raggio/temperatura/periodo modificati."""
+    planets = [obj for obj in session.new if isinstance(obj, Planet)]
+    planets += [obj for obj in session.dirty if isinstance(obj, Planet) and _score_inputs_changed(obj)]
+    update_planet_scores(planets)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_catalog_version(session, flush_context):
+    """Inserimenti, modifiche e cancellazioni di pianeti via ORM cambiano la versione del catalogo."""
+    changed = list(session.new) + list(session.deleted) + [obj for obj in session.dirty if session.is_modified(obj)]
+    if any(isinstance(obj, Planet) for obj in changed):
+        bump_catalog_version(session.connection())
@@ -1,180 +1,212 @@
 """
 Router aggiuntivo per ricerche ottimizzate con indici del database.
 Implementa algoritmi di ricerca binaria per performance migliori.
+Ogni ricerca seleziona solo i campi richiesti (parametro fields=) e
+serializza le righe direttamente con orjson.
+Le ricerche per posizione sul cielo (cono, box) usano l'indice KD-tree in memoria.
+Le ricerche sul database sono handler async su sessioni aiosqlite.
+Le risposte hanno un ETag legato alla versione del catalogo (304 con If-None-Match).
+I risultati delle ricerche sul database restano in cache fino al cambio di
+versione del catalogo (utils/search_cache.py).
 """
 
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from db import SessionLocal
-from models import Planet
+from db import AsyncSessionLocal
+from utils.http_cache import CatalogCachedRoute
 from utils.optimized_search import get_planet_search
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from utils.search_cache import search_cache
+from utils.sky_index import get_sky_index, sky_rows
+from utils.serialization import (
+    FIELDS_DESCRIPTION, SEARCH_FIELDS, FastJSONResponse, page_response, parse_fields, rows_to_dicts,
+)
 
-router = APIRouter(prefix="/search", tags=["Optimized Search"])
+router = APIRouter(
+    prefix="/search", tags=["Optimized Search"], default_response_class=FastJSONResponse, route_class=CatalogCachedRoute,
+)
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Campi aggiuntivi di default per le singole ricerche
+EARTH_LIKE_FIELDS = SEARCH_FIELDS + ("radius_diff", "temp_diff")
+HABITABLE_ZONE_FIELDS = SEARCH_FIELDS + ("habitability_score",)
+
+# Le ricerche sono handler async: le query girano su una sessione aiosqlite con run_sync
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def _page_response(db: AsyncSession, query, names):
+    """Esegue la query di una pagina sulla sessione aiosqlite e serializza le righe."""
+    return page_response(await db.run_sync(query), names)
 
 @router.get("/by-radius", response_model=List[dict])
-def search_by_radius(
+async def search_by_radius(
     min_radius: float = Query(..., description="Raggio minimo in raggi terrestri"),
     max_radius: float = Query(..., description="Raggio massimo in raggi terrestri"),
-    db: Session = Depends(get_db)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Dimensione della pagina"),
+    cursor: Optional[str] = Query(None, description="Cursore della pagina successiva (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ricerca binaria ottimizzata per raggio planetario."""
     try:
-        search_engine = get_planet_search(db)
-        planets = search_engine.binary_search_by_radius(min_radius, max_radius)
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "radius": p.radius,
-                "period": p.period,
-                "eq_temp": p.eq_temp,
-                "star_temp": p.star_temp,
-                "star_radius": p.star_radius
-            }
-            for p in planets
-        ]
+        names = parse_fields(fields, SEARCH_FIELDS)
+        return await search_cache.respond(
+            ("by-radius", min_radius, max_radius, limit, cursor, names),
+            lambda: _page_response(db, lambda session: get_planet_search(session).binary_search_by_radius(
+                min_radius, max_radius, limit, cursor, names
+            ), names),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore nella ricerca: {str(e)}")
 
 @router.get("/by-temperature", response_model=List[dict])
-def search_by_temperature(
+async def search_by_temperature(
     min_temp: float = Query(..., description="Temperatura minima in Kelvin"),
     max_temp: float = Query(..., description="Temperatura massima in Kelvin"),
-    db: Session = Depends(get_db)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Dimensione della pagina"),
+    cursor: Optional[str] = Query(None, description="Cursore della pagina successiva (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ricerca binaria ottimizzata per temperatura di equilibrio."""
     try:
-        search_engine = get_planet_search(db)
-        planets = search_engine.binary_search_by_temperature(min_temp, max_temp)
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "radius": p.radius,
-                "period": p.period,
-                "eq_temp": p.eq_temp,
-                "star_temp": p.star_temp,
-                "star_radius": p.star_radius
-            }
-            for p in planets
-        ]
+        names = parse_fields(fields, SEARCH_FIELDS)
+        return await search_cache.respond(
+            ("by-temperature", min_temp, max_temp, limit, cursor, names),
+            lambda: _page_response(db, lambda session: get_planet_search(session).binary_search_by_temperature(
+                min_temp, max_temp, limit, cursor, names
+            ), names),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore nella ricerca: {str(e)}")
 
 @router.get("/earth-like", response_model=List[dict])
-def search_earth_like_planets(
+async def search_earth_like_planets(
     radius_tolerance: float = Query(0.5, description="Tolleranza per il raggio terrestre"),
     temp_tolerance: float = Query(50.0, description="Tolleranza per la temperatura terrestre (K)"),
-    db: Session = Depends(get_db)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Dimensione della pagina"),
+    cursor: Optional[str] = Query(None, description="Cursore della pagina successiva (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ricerca ottimizzata per pianeti simili alla Terra."""
     try:
-        search_engine = get_planet_search(db)
-        planets = search_engine.search_earth_like_planets(radius_tolerance, temp_tolerance)
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "radius": p.radius,
-                "period": p.period,
-                "eq_temp": p.eq_temp,
-                "star_temp": p.star_temp,
-                "star_radius": p.star_radius,
-                "earth_similarity": {
-                    "radius_diff": abs(p.radius - 1.0) if p.radius else None,
-                    "temp_diff": abs(p.eq_temp - 288.0) if p.eq_temp else None
+        names = parse_fields(fields, EARTH_LIKE_FIELDS)
+
+        async def compute():
+            page = await db.run_sync(
+                lambda session: get_planet_search(session).search_earth_like_planets(
+                    radius_tolerance, temp_tolerance, limit, cursor, names
+                )
+            )
+            if fields:
+                return page_response(page, names)
+            # Formato di default: le distanze dalla Terra sono raggruppate in earth_similarity
+            planets = rows_to_dicts(page.items, names)
+            for planet in planets:
+                planet["earth_similarity"] = {
+                    "radius_diff": planet.pop("radius_diff"),
+                    "temp_diff": planet.pop("temp_diff")
                 }
-            }
-            for p in planets
-        ]
+            headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+            return FastJSONResponse(planets, headers=headers)
+
+        # Il formato di default (senza fields=) è diverso: fa parte della chiave
+        return await search_cache.respond(
+            ("earth-like", radius_tolerance, temp_tolerance, limit, cursor, names, bool(fields)), compute
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore nella ricerca: {str(e)}")
 
 @router.get("/habitable-zone", response_model=List[dict])
-def search_habitable_zone(
+async def search_habitable_zone(
     min_radius: float = Query(0.5, description="Raggio minimo in raggi terrestri"),
     max_radius: float = Query(2.0, description="Raggio massimo in raggi terrestri"),
     min_temp: float = Query(200.0, description="Temperatura minima in Kelvin"),
     max_temp: float = Query(350.0, description="Temperatura massima in Kelvin"),
     min_period: float = Query(0.1, description="Periodo orbitale minimo in giorni"),
     max_period: float = Query(500.0, description="Periodo orbitale massimo in giorni"),
-    db: Session = Depends(get_db)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Dimensione della pagina"),
+    cursor: Optional[str] = Query(None, description="Cursore della pagina successiva (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ricerca ottimizzata per pianeti nella zona abitabile."""
     try:
-        search_engine = get_planet_search(db)
-        planets = search_engine.search_habitable_zone_planets(
-            min_radius, max_radius, min_temp, max_temp, min_period, max_period
+        names = parse_fields(fields, HABITABLE_ZONE_FIELDS)
+        return await search_cache.respond(
+            ("habitable-zone", min_radius, max_radius, min_temp, max_temp, min_period, max_period, limit, cursor, names),
+            lambda: _page_response(db, lambda session: get_planet_search(session).search_habitable_zone_planets(
+                min_radius, max_radius, min_temp, max_temp, min_period, max_period, limit, cursor, names
+            ), names),
         )
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "radius": p.radius,
-                "period": p.period,
-                "eq_temp": p.eq_temp,
-                "star_temp": p.star_temp,
-                "star_radius": p.star_radius,
-                "habitability_score": _calculate_habitability_score(p)
-            }
-            for p in planets
-        ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore nella ricerca: {str(e)}")
 
 @router.get("/sorted", response_model=List[dict])
-def get_sorted_planets(
-    field: str = Query(..., description="Campo per ordinamento (radius, period, eq_temp, star_temp, star_radius, name)"),
-    limit: int = Query(100, ge=1, le=1000, description="Numero massimo di risultati"),
+async def get_sorted_planets(
+    field: str = Query(..., description="Campo per ordinamento (radius, period, eq_temp, star_temp, star_radius, name, esi, habitability_score)"),
     ascending: bool = Query(True, description="Ordinamento crescente"),
-    db: Session = Depends(get_db)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Dimensione della pagina"),
+    cursor: Optional[str] = Query(None, description="Cursore della pagina successiva (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ricerca con ordinamento ottimizzato utilizzando gli indici."""
     try:
-        search_engine = get_planet_search(db)
-        planets = search_engine.get_sorted_planets_by_field(field, limit, ascending)
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "radius": p.radius,
-                "period": p.period,
-                "eq_temp": p.eq_temp,
-                "star_temp": p.star_temp,
-                "star_radius": p.star_radius
-            }
-            for p in planets
-        ]
+        names = parse_fields(fields, SEARCH_FIELDS)
+        return await search_cache.respond(
+            ("sorted", field, ascending, limit, cursor, names),
+            lambda: _page_response(db, lambda session: get_planet_search(session).get_sorted_planets_by_field(
+                field, limit, ascending, cursor, names
+            ), names),
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore nella ricerca: {str(e)}")
 
-def _calculate_habitability_score(planet: Planet) -> float:
-    """Calcola un punteggio di abitabilità semplificato."""
-    score = 1.0
-    
-    # Penalità per raggio troppo diverso dalla Terra
-    if planet.radius:
-        radius_factor = 1.0 - abs(planet.radius - 1.0) / 2.0
-        score *= max(0.1, radius_factor)
-    
-    # Penalità per temperatura troppo diversa dalla Terra
-    if planet.eq_temp:
-        temp_factor = 1.0 - abs(planet.eq_temp - 288.0) / 200.0
-        score *= max(0.1, temp_factor)
-    
-    # Penalità per periodo orbitale estremo
-    if planet.period:
-        if planet.period < 1 or planet.period > 1000:
-            score *= 0.5
-    
-    return round(max(0.0, min(1.0, score)), 3)
\ No newline at end of file
+@router.get("/cone", response_model=List[dict])
+def search_cone(
+    ra: float = Query(..., ge=0.0, le=360.0, description="Ascensione retta del centro (gradi)"),
+    dec: float = Query(..., ge=-90.0, le=90.0, description="Declinazione del centro (gradi)"),
+    radius_deg: float = Query(..., gt=0.0, le=180.0, description="Raggio del cono (gradi)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Numero massimo di risultati"),
+):
+    """Pianeti entro radius_deg dal punto indicato, dal più vicino (indice KD-tree in memoria)."""
+    index = get_sky_index()
+    rows, separation = index.cone(ra, dec, radius_deg, limit)
+    return FastJSONResponse(sky_rows(index.snapshot, rows, separation))
+
+@router.get("/box", response_model=List[dict])
+def search_box(
+    ra_min: float = Query(..., ge=0.0, le=360.0, description="RA minima (gradi)"),
+    ra_max: float = Query(..., ge=0.0, le=360.0, description="RA massima (gradi); se minore di ra_min il box attraversa RA = 0"),
+    dec_min: float = Query(..., ge=-90.0, le=90.0, description="Dec minima (gradi)"),
+    dec_max: float = Query(..., ge=-90.0, le=90.0, description="Dec massima (gradi)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Numero massimo di risultati"),
+):
+    """Pianeti in un box RA/Dec, ordinati per RA e Dec (indice KD-tree in memoria)."""
+    if dec_min > dec_max:
+        raise HTTPException(status_code=400, detail="dec_min deve essere minore o uguale a dec_max")
+    index = get_sky_index()
+    rows = index.box(ra_min, ra_max, dec_min, dec_max, limit)
+    return FastJSONResponse(sky_rows(index.snapshot, rows))
+
+# Statistiche della cache dei risultati: fuori da CatalogCachedRoute, non dipendono dal catalogo
+def search_cache_stats():
+    """Occupazione, hit rate, richieste accorpate ed evizioni della cache delle ricerche."""
+    return search_cache.stats()
+
+router.add_api_route("/cache/stats", search_cache_stats, methods=["GET"], route_class_override=APIRoute)
@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from db import SessionLocal
+from db import AsyncSessionLocal, SessionLocal
 from models import Planet
 from utils.db import get_all_planets
+from utils.catalog import get_catalog
+from utils.catalog_export import EXPORT_FORMATS, available_formats, export_catalog, negotiate
+from utils.http_cache import CatalogCachedRoute, versioned_response
+from utils.optimized_search import get_planet_search
+from utils.name_search import search_by_substring, search_names
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, decode_cursor, encode_cursor, paginate
+from utils.serialization import (
+    FIELDS_DESCRIPTION, TABLE_FIELDS, page_response, parse_fields, rows_response, select_columns,
+)
 
-router = APIRouter(prefix="/planets", tags=["Planets"])
+# I GET ricevono un ETag dalla versione del catalogo e rispondono 304 a If-None-Match
+router = APIRouter(prefix="/planets", tags=["Planets"], route_class=CatalogCachedRoute)
+
+# Campi di default delle risposte leggere
+NAME_SEARCH_FIELDS = ("id", "name", "kepoi_name", "disposition")
+TOP_FIELDS = ("id", "name", "disposition", "radius", "temperature", "period", "esi", "habitability_score")
 
 
 # funzione di dipendenza per aprire e chiudere la sessione DB
@@ -16,18 +31,47 @@ def get_db():
         db.close()
 
 
-# 📄 GET /planets/ — ritorna lista di pianeti con filtro opzionale
+# sessione asincrona (aiosqlite) per gli handler async di lista e ricerca: le query
+# esistenti girano con run_sync e l'I/O non occupa un thread del threadpool
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# 📄 GET /planets/ — ritorna una pagina di pianeti (ordinati per id) con filtro opzionale
 @router.get("/")
-def get_planets(
-    db: Session = Depends(get_db),
-    limit: int = Query(100, ge=1, le=1000, description="Numero massimo di risultati"),
+async def get_planets(
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Dimensione della pagina"),
     search: str | None = Query(None, description="Filtra per nome pianeta"),
+    cursor: str | None = Query(None, description="Cursore della pagina successiva (header X-Next-Cursor)"),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
 ):
-    query = db.query(Planet)
-    if search:
-        query = query.filter(Planet.name.ilike(f"%{search}%"))
-    results = query.limit(limit).all()
-    return results
+    try:
+        names = parse_fields(fields, TABLE_FIELDS)
+        if search:
+            page = await db.run_sync(_search_page, search.strip(), limit, cursor, names)
+        else:
+            page = await db.run_sync(lambda session: paginate(session.query(*select_columns(names)), [], limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(page, names)
+
+
+def _search_page(db: Session, search: str, limit: int, cursor: str | None, names) -> Page:
+    """Pagina della ricerca per sottostringa: l'indice trigram restituisce gli id in ordine."""
+    after_id = decode_cursor(cursor, ["id"])[0] if cursor else 0
+    if not isinstance(after_id, int):
+        raise ValueError("Cursore non valido")
+    if not search:
+        return Page(items=[])
+    # L'id viene selezionato in coda per costruire il cursore e poi rimosso
+    columns = select_columns(names) + [Planet.id.label("_cursor_id")]
+    rows = search_by_substring(db, search, limit + 1, after_id, columns)
+    items = [tuple(row)[:-1] for row in rows[:limit]]
+    if len(rows) <= limit:
+        return Page(items=items)
+    return Page(items=items, next_cursor=encode_cursor(["id"], [rows[limit - 1][-1]]))
 
 
 # 📄 POST /planets/ — aggiunge un nuovo pianeta
@@ -40,24 +84,67 @@ def add_planet(planet: dict, db: Session = Depends(get_db)):
     return {"message": "✅ Pianeta aggiunto con successo", "planet": new_planet}
 
 
-# (Opzionale) GET /planets/all — ritorna tutti i pianeti dal CSV
+# 🔎 GET /planets/search — ricerca per nome (prefisso o sottostringa) tramite indice
+@router.get("/search")
+async def search_planets_by_name(
+    q: str = Query(..., min_length=1, description="Nome o designazione KOI (es. KOI-0001, K00752)"),
+    mode: str = Query("prefix", description="Tipo di ricerca (prefix, substring)"),
+    limit: int = Query(20, ge=1, le=100, description="Numero massimo di risultati"),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        names = parse_fields(fields, NAME_SEARCH_FIELDS)
+        rows = await db.run_sync(search_names, q, limit, mode, select_columns(names))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return rows_response(rows, names)
+
+
+# 🏆 GET /planets/top — pianeti più simili alla Terra, ordinati tramite indice
+@router.get("/top")
+async def get_top_planets(
+    db: AsyncSession = Depends(get_async_db),
+    by: str = Query("esi", description="Punteggio per la classifica (esi, habitability_score)"),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE, description="Numero massimo di risultati"),
+    cursor: str | None = Query(None, description="Cursore della pagina successiva (header X-Next-Cursor)"),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+):
+    try:
+        names = parse_fields(fields, TOP_FIELDS)
+        page = await db.run_sync(lambda session: get_planet_search(session).top_ranked(by, limit, cursor, names))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(page, names)
+
+
+# GET /planets/all — ritorna tutti i pianeti dallo snapshot in memoria del catalogo
 @router.get("/all")
-def get_planets_all():
-    import csv
-    with open("data/KOI_cleaned.csv", newline='', encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-        planets = []
-        for row in reader:
-            planets.append({
-                "name": row.get("kepoi_name"),
-                "radius": float(row.get("koi_prad")) if row.get("koi_prad") else None,
-                "distance": float(row.get("koi_sma")) if row.get("koi_sma") else None,
-                "temperature": float(row.get("koi_teq")) if row.get("koi_teq") else None,
-                "starTemperature": float(row.get("koi_steff")) if row.get("koi_steff") else None,
-                "coordinates": {
-                    "ra": float(row.get("ra")) if row.get("ra") else None,
-                    "dec": float(row.get("dec")) if row.get("dec") else None
-                }
-            })
-        return planets
- 
\ No newline at end of file
+def get_planets_all(request: Request):
+    # Il payload JSON è serializzato una sola volta per snapshot, e compresso una volta per codifica
+    snapshot = get_catalog()
+    return versioned_response(request, snapshot, snapshot.planets_all_json, "application/json")
+
+
+# GET /planets/export — catalogo completo in formato binario colonnare (Arrow, Parquet o float32)
+@router.get("/export")
+def export_planets(
+    request: Request,
+    format: str | None = Query(None, description="Forza il formato: arrow, parquet o float32 (altrimenti header Accept)"),
+    accept: str | None = Header(None),
+):
+    fmt = negotiate(accept, format)
+    if fmt is None:
+        raise HTTPException(
+            status_code=406,
+            detail={"available": {name: EXPORT_FORMATS[name][0] for name in available_formats()}},
+        )
+    media_type, extension = EXPORT_FORMATS[fmt]
+    snapshot = get_catalog()
+    return versioned_response(
+        request, snapshot, export_catalog(fmt, snapshot), media_type,
+        variant=fmt,
+        compress=fmt != "parquet",  # già compresso con zstd
+        vary="Accept, Accept-Encoding",
+        headers={"Content-Disposition": f'attachment; filename="planets.{extension}"'},
+    )
@@ -1,59 +1,57 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
-import joblib
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Any, List, Optional
+import json
 import numpy as np
-import pandas as pd
-from pathlib import Path
-import random
+from utils.catalog import refresh_catalog_async
+from utils.imputation import DEFAULT_STRATEGY, Imputer, get_imputer, peek_imputer
+from utils.inference import InferenceCore
+from utils.model_loader import get_model_bundle, load_error, refresh_if_changed
+from utils.prediction_cache import prediction_cache
+from utils.metrics import log_sampled, stage_timer
+from utils.inference_pool import InferenceOverloaded, dispatcher
 
 # Router setup
 router = APIRouter()
 
-# Funzione per generare valori plausibili random
-def generate_plausible_value(field_name, value):
-    """Genera un valore plausibile se il valore è None"""
-    if value is not None:
-        return value
-    
-    # Valori plausibili basati su statistiche reali degli esopianeti
-    plausible_ranges = {
-        'koi_steff': (3500, 7000),  # Temperatura stellare (K)
-        'koi_slogg': (4.0, 4.8),    # Gravità stellare
-        'koi_srad': (0.5, 2.0),     # Raggio stellare (solar radii)
-        'koi_kepmag': (10.0, 17.0), # Magnitudine Kepler
-        'koi_period': (0.5, 500.0), # Periodo orbitale (giorni)
-        'koi_duration': (0.5, 10.0),# Durata transito (ore)
-        'koi_depth': (10.0, 10000.0), # Profondità transito (ppm)
-        'koi_prad': (0.5, 20.0),    # Raggio planetario (Earth radii)
-        'koi_insol': (0.01, 1000.0),# Insolazione
-        'koi_teq': (200, 2000)      # Temperatura equilibrio (K)
-    }
-    
-    if field_name in plausible_ranges:
-        min_val, max_val = plausible_ranges[field_name]
-        # Genera valore random in scala logaritmica per distribuzioni più realistiche
-        if field_name in ['koi_period', 'koi_depth', 'koi_insol']:
-            return round(10 ** random.uniform(np.log10(min_val), np.log10(max_val)), 2)
+# Mappa feature del modello -> campo della richiesta (ordine di scaler.feature_names_in_)
+FEATURE_FIELDS = {
+    'Teff': 'koi_steff',
+    'logg': 'koi_slogg',
+    'radius': 'koi_srad',
+    'mag': 'koi_kepmag',
+    'period': 'koi_period',
+    'duration': 'koi_duration',
+    'depth': 'koi_depth',
+    'planet_radius': 'koi_prad',
+    'insolation': 'koi_insol',
+    'Teq': 'koi_teq',
+}
+
+# Numero massimo di candidati per singola richiesta batch
+MAX_BATCH_SIZE = 50000
+
+def classify_prediction(prob_exoplanet: float):
+    """Restituisce (is_exoplanet, confidence, prediction_class) dalla probabilità CONFIRMED."""
+    prob_false_positive = 1.0 - prob_exoplanet
+    # Stessa soglia di XGBClassifier.predict per la classificazione binaria
+    is_exoplanet = prob_exoplanet > 0.5
+    confidence = max(prob_false_positive, prob_exoplanet)
+    if is_exoplanet:
+        if prob_exoplanet >= 0.8:
+            prediction_class = "HIGHLY LIKELY EXOPLANET"
+        elif prob_exoplanet >= 0.6:
+            prediction_class = "LIKELY EXOPLANET"
         else:
-            return round(random.uniform(min_val, max_val), 2)
-    
-    return value
-
-# Load the trained model and scaler
-MODEL_PATH = Path(__file__).parent.parent / "models" / "best_model.pkl"
-SCALER_PATH = Path(__file__).parent.parent / "models" / "scaler.pkl"
-try:
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    print(f"✅ Model loaded successfully from {MODEL_PATH}")
-    print(f"✅ Scaler loaded successfully from {SCALER_PATH}")
-    print(f"Model type: {type(model)}")
-    print(f"Scaler type: {type(scaler)}")
-except Exception as e:
-    print(f"❌ Error loading model/scaler: {e}")
-    model = None
-    scaler = None
+            prediction_class = "POSSIBLE EXOPLANET"
+    else:
+        if prob_false_positive >= 0.8:
+            prediction_class = "LIKELY FALSE POSITIVE"
+        elif prob_false_positive >= 0.6:
+            prediction_class = "POSSIBLE FALSE POSITIVE"
+        else:
+            prediction_class = "UNCERTAIN"
+    return is_exoplanet, confidence, prediction_class
 
 # Pydantic models for request/response
 class ExoplanetPredictionRequest(BaseModel):
@@ -79,8 +77,62 @@ class ExoplanetPredictionResponse(BaseModel):
     prediction_class: str
     is_exoplanet: Optional[bool]
 
+async def get_inference_core() -> InferenceCore:
+    """Nucleo di inferenza del modello caricato all'avvio (500 se non disponibile)."""
+    bundle = refresh_if_changed()
+    if bundle is None and load_error() is None:
+        # Primo accesso senza lifespan: il caricamento avviene nel pool, non sull'event loop
+        try:
+            bundle = await dispatcher.run(get_model_bundle)
+        except InferenceOverloaded as e:
+            raise overloaded_error(e)
+    if bundle is None:
+        raise HTTPException(status_code=500, detail="Model or scaler not loaded")
+    # Se il file del modello è cambiato i risultati in cache non valgono più
+    prediction_cache.bind_model(bundle.model_hash)
+    return bundle.core
+
+async def score_with_cache(inference_core: InferenceCore, X: np.ndarray, ra_dec: np.ndarray) -> np.ndarray:
+    """
+    Probabilità CONFIRMED per riga: dalla cache quando possibile; le altre
+    righe vengono valutate nel pool di inferenza, fuori dall'event loop.
+    """
+    keys = prediction_cache.keys(X, ra_dec)
+    cached = prediction_cache.get_many(keys)
+    misses = [i for i, value in enumerate(cached) if value is None]
+    prob_exoplanet = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+    if misses:
+        scored = await dispatcher.score(inference_core, X[misses], ra_dec[misses])
+        prob_exoplanet[misses] = scored
+        prediction_cache.put_many([keys[i] for i in misses], scored.tolist())
+    return prob_exoplanet
+
+def overloaded_error(e: InferenceOverloaded) -> HTTPException:
+    """503 con Retry-After quando la coda dell'inferenza è piena."""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def get_feature_imputer(inference_core: InferenceCore, strategy: Optional[str]) -> Imputer:
+    """Imputer per le colonne del modello (400 se la strategia non esiste)."""
+    fields = [FEATURE_FIELDS[feature] for feature in inference_core.feature_names]
+    try:
+        return get_imputer(fields, (strategy or DEFAULT_STRATEGY).lower())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def build_feature_matrix(inference_core: InferenceCore, candidates: List["ExoplanetPredictionRequest"]):
+    """Matrice delle feature (NaN dove mancano, ordine dello scaler) e coordinate RA/Dec."""
+    X = np.array(
+        [[getattr(c, FEATURE_FIELDS[feature]) for feature in inference_core.feature_names] for c in candidates],
+        dtype=np.float64,
+    )
+    ra_dec = np.array([[c.ra, c.dec] for c in candidates], dtype=np.float64)
+    return X, ra_dec
+
 @router.post("/predict-exoplanet", response_model=ExoplanetPredictionResponse)
-async def predict_exoplanet(request: ExoplanetPredictionRequest):
+async def predict_exoplanet(
+    request: ExoplanetPredictionRequest,
+    imputation: Optional[str] = Query(None, description="Missing-value strategy: median, knn or random (seeded)"),
+):
     """
     Predict if a CANDIDATE planet is likely to be a confirmed exoplanet
     using the trained machine learning model.
@@ -96,130 +148,153 @@ async def predict_exoplanet(request: ExoplanetPredictionRequest):
     - koi_duration: Transit duration (hours) - optional
     - koi_depth: Transit depth (ppm) - optional
     - koi_insol: Insolation flux (Earth units) - optional
+    
+    Missing features are imputed deterministically (see utils/imputation.py),
+    so identical requests always return the same prediction.
     """
     
-    if model is None or scaler is None:
-        raise HTTPException(status_code=500, detail="Model or scaler not loaded")
+    # Le statistiche dell'imputazione seguono la versione del catalogo
+    await refresh_catalog_async()
+    inference_core = await get_inference_core()
     
     try:
-        # Log valori ricevuti
-        print(f"📥 Valori ricevuti dal frontend:")
-        print(f"   koi_steff={request.koi_steff}, koi_slogg={request.koi_slogg}")
-        print(f"   koi_srad={request.koi_srad}, koi_kepmag={request.koi_kepmag}")
-        print(f"   koi_period={request.koi_period}, koi_duration={request.koi_duration}")
-        print(f"   koi_depth={request.koi_depth}, koi_prad={request.koi_prad}")
-        print(f"   koi_insol={request.koi_insol}, koi_teq={request.koi_teq}")
-        
-        # Genera valori plausibili per campi None
-        koi_steff_val = generate_plausible_value('koi_steff', request.koi_steff)
-        koi_slogg_val = generate_plausible_value('koi_slogg', request.koi_slogg) if request.koi_slogg != 4.5 else 4.5
-        koi_srad_val = generate_plausible_value('koi_srad', request.koi_srad) if request.koi_srad != 1.0 else 1.0
-        koi_kepmag_val = generate_plausible_value('koi_kepmag', request.koi_kepmag) if request.koi_kepmag != 15.0 else 15.0
-        koi_period_val = generate_plausible_value('koi_period', request.koi_period)
-        koi_duration_val = generate_plausible_value('koi_duration', request.koi_duration) if request.koi_duration != 3.0 else 3.0
-        koi_depth_val = generate_plausible_value('koi_depth', request.koi_depth) if request.koi_depth != 100.0 else 100.0
-        koi_prad_val = generate_plausible_value('koi_prad', request.koi_prad)
-        koi_insol_val = generate_plausible_value('koi_insol', request.koi_insol) if request.koi_insol != 1.0 else 1.0
-        koi_teq_val = generate_plausible_value('koi_teq', request.koi_teq)
-        
-        print(f"🎲 Valori dopo generazione random (se necessario):")
-        print(f"   Teff={koi_steff_val}, logg={koi_slogg_val}, radius={koi_srad_val}")
-        print(f"   mag={koi_kepmag_val}, period={koi_period_val}, duration={koi_duration_val}")
-        print(f"   depth={koi_depth_val}, planet_radius={koi_prad_val}")
-        print(f"   insolation={koi_insol_val}, Teq={koi_teq_val}")
-        
-        # Map request fields to the exact feature names used during model training
-        # Model expects ONLY 10 features (verified from scaler.feature_names_in_)
-        # Order: Teff, logg, radius, mag, period, duration, depth, planet_radius, insolation, Teq
-        features = {
-            'Teff': koi_steff_val,          # koi_steff -> Teff
-            'logg': koi_slogg_val,          # koi_slogg -> logg
-            'radius': koi_srad_val,         # koi_srad -> radius (star radius)
-            'mag': koi_kepmag_val,          # koi_kepmag -> mag
-            'period': koi_period_val,       # koi_period -> period
-            'duration': koi_duration_val,   # koi_duration -> duration
-            'depth': koi_depth_val,         # koi_depth -> depth
-            'planet_radius': koi_prad_val,  # koi_prad -> planet_radius
-            'insolation': koi_insol_val,    # koi_insol -> insolation
-            'Teq': koi_teq_val              # koi_teq -> Teq
-        }
-        
-        # Create DataFrame with the exact column names the model expects
-        df = pd.DataFrame([features])
-
-        print(f"📝 DataFrame finale per predizione: {df}")
-
-        # Print scaler info for debugging
-        print(f"🔍 Scaler: {scaler}")
-        
-        # Apply StandardScaler transformation
-        X_scaled = scaler.transform(df)
-    
-        print(f"🔍 Scaled features (numpy array): {X_scaled}")
-        print(f"🔍 Shape delle features scalate: {X_scaled.shape}")
-        
-        # Converti X_scaled da numpy array a DataFrame
-        X_scaled_df = pd.DataFrame(X_scaled, columns=scaler.feature_names_in_)
-        
-        # Concatena RA e Dec come colonne aggiuntive
-        X_final = pd.concat([
-            pd.DataFrame([[request.ra, request.dec]], columns=['RA', 'Dec']),
-            X_scaled_df
-        ], axis=1)
-        
-        print(f"📋 X_final shape: {X_final.shape}")
-        print(f"📋 X_final values: {list(X_final.values)}")
-        
-        # Make prediction using scaled data (con RA e Dec)
-        prediction = model.predict(X_final)[0]
-        prediction_proba = model.predict_proba(X_final)[0]
-
-        print(f"📊 Prediction: {prediction} (0=FALSE POSITIVE, 1=CONFIRMED)")
-        print(f"📊 Probabilities: FALSE POSITIVE={prediction_proba[0]:.4f}, CONFIRMED={prediction_proba[1]:.4f}")
-        
-        # Extract probabilities
-        # Assuming binary classification: 0 = FALSE POSITIVE, 1 = CONFIRMED
-        prob_false_positive = float(prediction_proba[0])
-        prob_exoplanet = float(prediction_proba[1])
-        
-        is_exoplanet = bool(prediction == 1)
-        confidence = max(prob_false_positive, prob_exoplanet)
-        
-        print(f"🎯 Risultato predizione:")
-        print(f"   is_exoplanet={is_exoplanet}")
-        print(f"   prob_false_positive={prob_false_positive:.4f}")
-        print(f"   prob_exoplanet={prob_exoplanet:.4f}")
-        print(f"   confidence={confidence:.4f}")
-        
-        # Determine prediction class
-        if is_exoplanet:
-            if prob_exoplanet >= 0.8:
-                prediction_class = "HIGHLY LIKELY EXOPLANET"
-            elif prob_exoplanet >= 0.6:
-                prediction_class = "LIKELY EXOPLANET"
-            else:
-                prediction_class = "POSSIBLE EXOPLANET"
-            print(f"✅ Classificato come EXOPLANET: {prediction_class}")
+        # Una sola riga: costruzione della matrice e imputazione costano poco e
+        # restano sull'event loop, così la richiesta passa una sola volta dal pool
+        imputer = await get_single_imputer(inference_core, imputation)
+        with stage_timer("validation", "single"):
+            X, ra_dec = build_feature_matrix(inference_core, [request])
+        with stage_timer("imputation", "single"):
+            X_imputed = imputer.transform(X)
+        prob_exoplanet = await score_with_cache(inference_core, X_imputed, ra_dec)
+        results = build_results(prob_exoplanet)
+        log_prediction("single", inference_core, imputer, X, X_imputed, prob_exoplanet, results)
+        return results[0]
+    except InferenceOverloaded as e:
+        raise overloaded_error(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error during prediction: {str(e)}"
+        )
+
+def build_results(prob_exoplanet: np.ndarray) -> List[dict]:
+    """Risposte per riga a partire dalle probabilità CONFIRMED."""
+    results = []
+    for p in prob_exoplanet.tolist():
+        is_exoplanet, confidence, prediction_class = classify_prediction(p)
+        results.append({
+            "is_exoplanet": is_exoplanet,
+            "confidence": confidence,
+            "prediction_class": prediction_class,
+        })
+    return results
+
+async def get_single_imputer(inference_core: InferenceCore, strategy: Optional[str]) -> Imputer:
+    """
+    Imputer per una predizione singola: quello già costruito, se c'è; altrimenti
+    (primo uso dopo l'avvio o un import) viene costruito nel pool di inferenza.
+    """
+    fields = [FEATURE_FIELDS[feature] for feature in inference_core.feature_names]
+    imputer = peek_imputer(fields, (strategy or DEFAULT_STRATEGY).lower())
+    if imputer is None:
+        imputer = await dispatcher.run(get_feature_imputer, inference_core, strategy)
+    return imputer
+
+def log_prediction(endpoint, inference_core, imputer, X, X_imputed, prob_exoplanet, results) -> None:
+    """Payload di debug campionato (solo le prime righe)."""
+    log_sampled(
+        "prediction",
+        endpoint=endpoint,
+        rows=len(X),
+        imputation=imputer.name,
+        features=inference_core.feature_names,
+        received=X[:5].tolist(),
+        imputed=X_imputed[:5].tolist(),
+        prob_exoplanet=prob_exoplanet[:5].tolist(),
+        results=results[:5],
+    )
+
+def prepare_batch(inference_core: InferenceCore, imputation: Optional[str], body: bytes, content_type: str):
+    """Parsing, validazione e imputazione di un batch (eseguita nel pool di inferenza)."""
+    # Il primo accesso a un imputer lo costruisce (per il KNN la matrice di riferimento)
+    imputer = get_feature_imputer(inference_core, imputation)
+    with stage_timer("validation", "batch"):
+        candidates = _parse_batch_body(body, content_type)
+        if not candidates:
+            return None
+        X, ra_dec = build_feature_matrix(inference_core, candidates)
+    with stage_timer("imputation", "batch"):
+        X_imputed = imputer.transform(X)
+    return imputer, X, X_imputed, ra_dec
+
+def _parse_batch_body(body: bytes, content_type: str) -> List[ExoplanetPredictionRequest]:
+    """Legge un array JSON o un corpo NDJSON (un candidato per riga)."""
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
         else:
-            if prob_false_positive >= 0.8:
-                prediction_class = "LIKELY FALSE POSITIVE"
-            elif prob_false_positive >= 0.6:
-                prediction_class = "POSSIBLE FALSE POSITIVE"
-            else:
-                prediction_class = "UNCERTAIN"
-            print(f"❌ Classificato come FALSE POSITIVE: {prediction_class}")
-
-        response = ExoplanetPredictionResponse(
-            is_exoplanet=is_exoplanet,
-            confidence=confidence,
-            prediction_class=prediction_class
+            items = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of candidates")
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} candidates)")
+    
+    try:
+        return [ExoplanetPredictionRequest.model_validate(item) for item in items]
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
+@router.post("/predict-exoplanet/batch", response_model=List[ExoplanetPredictionResponse])
+async def predict_exoplanet_batch(
+    http_request: Request,
+    imputation: Optional[str] = Query(None, description="Missing-value strategy: median, knn or random (seeded)"),
+):
+    """
+    Batch version of /predict-exoplanet.
+    
+    Accepts either a JSON array of candidates (`application/json`) or one
+    candidate per line (`application/x-ndjson`). Each candidate has the same
+    fields as ExoplanetPredictionRequest; results are returned in input order.
+    """
+    await refresh_catalog_async()
+    inference_core = await get_inference_core()
+    
+    body = await http_request.body()
+    try:
+        prepared = await dispatcher.run(
+            prepare_batch, inference_core, imputation, body, http_request.headers.get("content-type", "")
         )
-        
-        print(f"📤 Response inviata al frontend: {response}")
-        return response
-        
+        if prepared is None:
+            return []
+        imputer, X, X_imputed, ra_dec = prepared
+        prob_exoplanet = await score_with_cache(inference_core, X_imputed, ra_dec)
+        results = build_results(prob_exoplanet)
+        log_prediction("batch", inference_core, imputer, X, X_imputed, prob_exoplanet, results)
+        return results
+    except InferenceOverloaded as e:
+        raise overloaded_error(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error during prediction: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Error during batch prediction: {str(e)}"
+        )
+
+@router.get("/predict-exoplanet/diagnostics")
+def model_diagnostics():
+    """Model source, feature list, load time, warmup latency, cache and pool statistics."""
+    bundle = get_model_bundle()
+    if bundle is None:
+        return {"loaded": False, "error": load_error()}
+    return {
+        "loaded": True,
+        **bundle.diagnostics(),
+        "cache": prediction_cache.stats(),
+        "pool": dispatcher.stats(),
+    }
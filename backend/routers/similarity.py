@@ -1,16 +1,82 @@
-from fastapi import APIRouter
-from schemas import PlanetBase
-from math import exp
+from typing import List
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request
+from schemas import EsiRequest, SimilarPlanetsRequest
+from utils.esi import compute_esi_table, esi_scalar
+from utils.http_cache import CatalogCachedRoute, versioned_response
+from utils.neighbors import DEFAULT_K, MAX_K, NEIGHBOR_FEATURES, get_neighbor_index
+from utils.serialization import dumps
 
-router = APIRouter(prefix="/similarity", tags=["similarity"])
+# CatalogCachedRoute: lo snapshot (e quindi l'indice dei vicini) segue la versione del catalogo
+router = APIRouter(prefix="/similarity", tags=["similarity"], route_class=CatalogCachedRoute)
 
-def compute_esi(radius: float, distance: float, temperature: float | None):
-    # Placeholder fisicamente sensato: picco attorno a Terra (1 R⊕, 1 AU, 288K)
-    score = exp(-abs(radius - 1)) * exp(-abs(distance - 1))
-    if temperature is not None:
-        score *= exp(-abs((temperature - 288.0) / 288.0))
-    return round(max(0.0, min(1.0, score)), 3)
+# Numero massimo di pianeti per richiesta batch
+MAX_BATCH_SIZE = 50000
+
+def compute_esi(radius: float | None, temperature: float | None, density: float | None = None):
+    """ESI (0..1, arrotondato a 3 decimali) con i componenti usati; vedi utils/esi.py."""
+    result = esi_scalar(radius, temperature, density)
+    esi = result.pop("ESI")
+    n_components = result.pop("ESI_n_components")
+    return {
+        "ESI": round(esi, 3) if esi is not None else None,
+        "components": result,
+        "n_components": n_components,
+    }
 
 @router.post("/", summary="Compute Earth Similarity Index")
-def post_similarity(planet: PlanetBase):
-    return {"ESI": compute_esi(planet.radius, planet.distance, planet.temperature)}
+def post_similarity(planet: EsiRequest):
+    # Servono raggio e temperatura (più densità se nota); distanza e periodo non entrano nell'ESI
+    return compute_esi(planet.radius, planet.temperature, planet.density)
+
+@router.post("/batch", summary="Compute Earth Similarity Index for many planets")
+def post_similarity_batch(planets: List[EsiRequest]):
+    if len(planets) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch troppo grande (max {MAX_BATCH_SIZE} pianeti)")
+    if not planets:
+        return []
+    columns = np.array([[p.radius, p.temperature, p.density] for p in planets], dtype=np.float64)
+    table = compute_esi_table(columns[:, 0], columns[:, 1], columns[:, 2])
+    esi = np.round(table["ESI"], 3)
+    return [
+        {
+            "ESI": None if np.isnan(esi[i]) else float(esi[i]),
+            "n_components": int(table["ESI_n_components"][i]),
+        }
+        for i in range(len(planets))
+    ]
+
+@router.get("/similar/{planet_id}", summary="Find the k most similar catalog planets")
+def get_similar_planets(request: Request, planet_id: int, k: int = Query(DEFAULT_K, ge=1, le=MAX_K)):
+    # Vicini nello spazio delle feature standardizzate con lo scaler del modello
+    index = get_neighbor_index()
+    row = index.row_of_id(planet_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Pianeta {planet_id} non trovato")
+    features = index.row_features(row)
+    try:
+        rows, distances = index.query(features, k, exclude_rows=[row])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    body = dumps({
+        "planet": {"id": planet_id, "name": index.snapshot.names[row], **features},
+        "scaling": index.scaling_source,
+        "neighbors": index.results(rows, distances),
+    })
+    # Il risultato dipende anche da k e dallo scaler: entrambi fanno parte dell'ETag
+    variant = f"k{k}-{(index.scaling_hash or 'catalog')[:12]}"
+    return versioned_response(request, index.snapshot, body, "application/json", variant=variant)
+
+@router.post("/similar", summary="Find the k catalog planets most similar to a feature vector")
+def post_similar_planets(request: SimilarPlanetsRequest):
+    index = get_neighbor_index()
+    features = {name: getattr(request, name) for name in NEIGHBOR_FEATURES}
+    try:
+        rows, distances = index.query(features, request.k)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        "features": [name for name, value in features.items() if value is not None],
+        "scaling": index.scaling_source,
+        "neighbors": index.results(rows, distances),
+    }
@@ -0,0 +1,71 @@
+"""
+Aggregati del catalogo per le viste di popolazione (utils/stats.py):
+pochi KB di conteggi al posto dell'intero catalogo. Le risposte hanno
+l'ETag della versione del catalogo (304 con If-None-Match).
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from utils.http_cache import CatalogCachedRoute
+from utils.serialization import FastJSONResponse
+from utils.stats import (
+    DEFAULT_BINS, DEFAULT_GRID_BINS, MAX_BINS, MAX_GRID_BINS, STATS_COLUMNS, get_catalog_stats,
+)
+
+router = APIRouter(prefix="/stats", tags=["Stats"], default_response_class=FastJSONResponse,
+                   route_class=CatalogCachedRoute)
+
+COLUMN_DESCRIPTION = f"Colonna del catalogo ({', '.join(STATS_COLUMNS)})"
+SCALE_DESCRIPTION = "Scala dei bin (linear, log); di default log per raggio, periodo, insolazione e profondità"
+DISPOSITION_DESCRIPTION = "Solo i pianeti con questa disposizione (CONFIRMED, CANDIDATE, FALSE POSITIVE)"
+
+
+# 📊 GET /stats — conteggi per disposizione, istogrammi di raggio, temperatura, periodo e insolazione, griglia periodo/raggio
+@router.get("")
+def get_stats_summary():
+    return get_catalog_stats().summary()
+
+
+# 🔢 GET /stats/dispositions — numero di pianeti per disposizione
+@router.get("/dispositions")
+def get_disposition_counts():
+    return get_catalog_stats().disposition_counts()
+
+
+# 📈 GET /stats/histogram/{column} — istogramma 1D di una colonna
+@router.get("/histogram/{column}")
+def get_histogram(
+    column: str,
+    bins: int = Query(DEFAULT_BINS, ge=1, le=MAX_BINS, description="Numero di bin"),
+    scale: Optional[str] = Query(None, description=SCALE_DESCRIPTION),
+    range_min: Optional[float] = Query(None, description="Estremo inferiore (di default il minimo dei dati)"),
+    range_max: Optional[float] = Query(None, description="Estremo superiore (di default il massimo dei dati)"),
+    disposition: Optional[str] = Query(None, description=DISPOSITION_DESCRIPTION),
+):
+    try:
+        return get_catalog_stats().histogram(
+            column, scale=scale, bins=bins, range_min=range_min, range_max=range_max, disposition=disposition
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 🗺️ GET /stats/grid — conteggi 2D su una griglia di bin (es. raggio contro periodo)
+@router.get("/grid")
+def get_grid(
+    x: str = Query("koi_period", description=COLUMN_DESCRIPTION),
+    y: str = Query("koi_prad", description=COLUMN_DESCRIPTION),
+    x_bins: int = Query(DEFAULT_GRID_BINS, ge=1, le=MAX_GRID_BINS, description="Numero di bin su x"),
+    y_bins: int = Query(DEFAULT_GRID_BINS, ge=1, le=MAX_GRID_BINS, description="Numero di bin su y"),
+    x_scale: Optional[str] = Query(None, description=SCALE_DESCRIPTION),
+    y_scale: Optional[str] = Query(None, description=SCALE_DESCRIPTION),
+    disposition: Optional[str] = Query(None, description=DISPOSITION_DESCRIPTION),
+):
+    try:
+        return get_catalog_stats().grid(
+            x, y, x_scale=x_scale, y_scale=y_scale, x_bins=x_bins, y_bins=y_bins, disposition=disposition
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,45 @@
+"""
+Tile del cielo a livelli di dettaglio (utils/sky_tiles.py): il client carica
+solo le tile visibili, partendo dal livello 0 e scendendo finché servono
+più dettagli. Le tile sono costruite una volta per versione del catalogo e
+servite con ETag e compressione precalcolata.
+"""
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from utils.http_cache import CatalogCachedRoute, versioned_response
+from utils.serialization import FastJSONResponse
+from utils.sky_tiles import DEFAULT_RANKING, RANKINGS, get_sky_tiles
+
+router = APIRouter(prefix="/tiles", tags=["Sky Tiles"], default_response_class=FastJSONResponse,
+                   route_class=CatalogCachedRoute)
+
+RANKING_DESCRIPTION = f"Criterio di importanza dei pianeti ({', '.join(RANKINGS)})"
+
+
+# 🗺️ GET /tiles — schema della piramide: livelli, tile per livello, pianeti per livello
+@router.get("")
+def get_tiles_schema(ranking: str = Query(DEFAULT_RANKING, description=RANKING_DESCRIPTION)):
+    try:
+        return get_sky_tiles(ranking).describe()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 🧩 GET /tiles/{level}/{tile} — pianeti della tile, in ordine di importanza
+@router.get("/{level}/{tile}")
+def get_tile(
+    request: Request,
+    level: int,
+    tile: int,
+    ranking: str = Query(DEFAULT_RANKING, description=RANKING_DESCRIPTION),
+):
+    try:
+        tiles = get_sky_tiles(ranking)
+        body = tiles.body(level, tile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Tile {level}/{tile} inesistente")
+    # Il criterio fa parte della variante: stessa tile, rappresentazioni diverse
+    return versioned_response(request, tiles.snapshot, body, "application/json", variant=ranking)
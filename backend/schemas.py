@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 class PlanetBase(BaseModel):
     name: str
@@ -8,6 +8,21 @@ class PlanetBase(BaseModel):
     temperature: float | None = None
     esi: float | None = None
 
+class EsiRequest(BaseModel):
+    radius: float | None = None  # Raggio planetario (Earth radii)
+    temperature: float | None = None  # Temperatura di equilibrio (K)
+    density: float | None = None  # Densità (Earth units), opzionale
+
+class SimilarPlanetsRequest(BaseModel):
+    # Feature fisiche (unità del catalogo KOI); almeno una è richiesta
+    koi_prad: float | None = None
+    koi_teq: float | None = None
+    koi_period: float | None = None
+    koi_insol: float | None = None
+    koi_steff: float | None = None
+    koi_srad: float | None = None
+    k: int = Field(10, ge=1, le=100)
+
 class PlanetCreate(PlanetBase):
     pass
 
@@ -18,6 +33,7 @@ class PlanetRead(PlanetBase):
 class Planet(BaseModel):
     id: int
     name: str
+    kepoi_name: str | None = None
     # Coordinate celesti
     ra: float | None = None
     dec: float | None = None
@@ -40,5 +56,7 @@ class Planet(BaseModel):
     star_temp: float | None = None
     star_radius: float | None = None
     source: str | None = None
+    esi: float | None = None
+    habitability_score: float | None = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# I moduli del backend si importano come in main.py (utils.*, models, db)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+class FakeCatalog:
+    """Catalogo minimo: solo column(), quanto basta a imputer e statistiche."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def column(self, name):
+        return self.columns[name]
+
+
+@pytest.fixture
+def fake_catalog():
+    """Costruttore di un catalogo finto a partire da un dizionario colonna -> array."""
+    return FakeCatalog
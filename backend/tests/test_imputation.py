@@ -0,0 +1,24 @@
+import numpy as np
+
+from utils.imputation import KNNImputer
+
+FIELDS = ["koi_steff", "koi_slogg", "koi_srad", "koi_period"]
+
+
+def test_knn_chunked_matches_single_chunk(fake_catalog):
+    rng = np.random.default_rng(0)
+    catalog = fake_catalog({f: rng.normal(loc=i + 1.0, scale=1.0 + i, size=2000) for i, f in enumerate(FIELDS)})
+    X = rng.normal(loc=2.0, scale=2.0, size=(5000, len(FIELDS)))
+    X[rng.random(X.shape) < 0.6] = np.nan
+    X[:10] = np.nan  # righe senza feature osservate
+
+    single = KNNImputer(FIELDS, catalog)
+    single.chunk_rows = len(X)
+    chunked = KNNImputer(FIELDS, catalog)
+    chunked.chunk_rows = 128
+
+    expected = single.transform(X)
+    result = chunked.transform(X)
+    assert not np.isnan(result).any()
+    np.testing.assert_allclose(result, expected)
+    np.testing.assert_array_equal(result[:10], np.tile(chunked.fallback, (10, 1)))
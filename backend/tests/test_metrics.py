@@ -0,0 +1,12 @@
+import json
+import logging
+
+from utils.metrics import log_sampled
+
+
+def test_log_sampled_writes_non_finite_floats_as_null(caplog):
+    with caplog.at_level(logging.INFO):
+        log_sampled("prediction", rate=1.0, received=[[1.5, float("nan")]], prob=float("inf"))
+
+    payload = json.loads(caplog.records[-1].getMessage())
+    assert payload == {"event": "prediction", "received": [[1.5, None]], "prob": None}
@@ -0,0 +1,17 @@
+import numpy as np
+
+from utils.stats import CatalogStats
+
+
+def test_log_histogram_splits_missing_and_underflow(fake_catalog):
+    values = np.array([np.nan, np.nan, 0.0, -3.0, 1.0, 10.0, 100.0])
+    stats = CatalogStats(fake_catalog({"koi_prad": values}))
+
+    result = stats.histogram("koi_prad", bins=2)
+
+    assert result["scale"] == "log"
+    assert result["total"] == 7
+    assert result["missing"] == 2
+    assert result["underflow"] == 2
+    assert result["overflow"] == 0
+    assert result["counts"] == [1, 2]
@@ -0,0 +1,42 @@
+from sqlalchemy import select
+
+from db import create_sqlite_engine
+from models import Planet, PlanetTombstone, QuarantinedRow
+from utils.bulk_import import sync_import
+
+HEADER = "kepoi_name,koi_disposition,RA,Dec,koi_period,koi_prad,koi_teq\n"
+
+
+def _write(path, rows):
+    path.write_text(HEADER + "".join(f"{row}\n" for row in rows))
+
+
+def test_sync_keeps_planet_whose_row_is_quarantined(tmp_path):
+    engine = create_sqlite_engine(str(tmp_path / "planets.db"), read_only=False, begin_immediate=True,
+                                  pool_size=1, max_overflow=0)
+    csv_path = tmp_path / "koi.csv"
+    try:
+        _write(csv_path, [
+            "K00001.01,CONFIRMED,290.1,44.5,10.5,1.1,290",
+            "K00002.01,CANDIDATE,291.2,45.1,20.0,2.0,400",
+        ])
+        sync_import(csv_path, engine, kepoi_names={})
+
+        # K00002.01 torna con un'ascensione retta impossibile
+        _write(csv_path, [
+            "K00001.01,CONFIRMED,290.1,44.5,10.5,1.1,290",
+            "K00002.01,CANDIDATE,400.0,45.1,20.0,2.0,400",
+        ])
+        report = sync_import(csv_path, engine, kepoi_names={})
+
+        assert report.quarantined == 1
+        assert report.removed == 0
+        with engine.connect() as conn:
+            planets = dict(conn.execute(select(Planet.kepoi_name, Planet.ra)).all())
+            tombstones = conn.execute(select(PlanetTombstone.sync_key)).all()
+            quarantined = conn.execute(select(QuarantinedRow.reason, QuarantinedRow.column_name)).all()
+        assert planets == {"K00001.01": 290.1, "K00002.01": 291.2}
+        assert tombstones == []
+        assert quarantined == [("out_of_range", "ra")]
+    finally:
+        engine.dispose()
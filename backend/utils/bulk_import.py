@@ -0,0 +1,420 @@
+"""
+Import massivo del catalogo KOI da CSV.
+Il file viene letto a blocchi (pandas, chunksize), le colonne sono convertite
+in modo vettoriale e le righe inserite con executemany di SQLAlchemy Core,
+tutto in un'unica transazione. Indici secondari e trigger FTS vengono rimossi
+prima del caricamento e ricostruiti una sola volta alla fine.
+Gli insert Core non passano dagli eventi ORM di models.py: nome di default,
+esi e habitability_score vengono calcolati qui. Prima della conversione ogni
+blocco passa dalla validazione di utils/import_validation.py: le righe
+rifiutate vanno nella tabella import_quarantine con il codice del motivo.
+
+La sincronizzazione incrementale (sync_import) confronta invece il CSV con
+le righe salvate tramite una chiave (kepoi_name) e un hash del contenuto per
+riga: scrive solo le righe nuove o modificate e sposta le rimosse in
+planet_tombstones, in un'unica transazione. Con il journal WAL i lettori
+vedono il catalogo precedente fino al commit, mai uno stato parziale.
+Un import che cambia il catalogo ne incrementa la versione (catalog_version)
+nella stessa transazione.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from db import create_sqlite_engine
+from models import Base, Planet, PlanetTombstone, QuarantinedRow, bump_catalog_version, default_planet_name
+from utils.catalog import CSV_COLUMN_MAP, CSV_PATH, NUMERIC_COLUMNS
+from utils.esi import compute_esi, compute_habitability
+from utils.import_validation import DUPLICATE_KEY, row_json, validate_chunk
+from utils.name_search import create_name_index, drop_name_triggers
+
+# Catalogo con le designazioni KOI reali (KOI_cleaned.csv non ha kepoi_name)
+KEPOI_NAMES_PATH = CSV_PATH.parent / "KOI_with_esi.csv"
+
+# Righe per blocco letto dal CSV e inserito con un executemany
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+STRING_COLUMNS = ("koi_disposition", "kepoi_name", "source")
+DEFAULT_SOURCE = "Kepler"
+
+# Colonne che provengono dal CSV: il loro hash identifica una versione della riga
+HASH_COLUMNS = NUMERIC_COLUMNS + STRING_COLUMNS
+
+# Righe per DELETE ... WHERE id IN (...) (limite di variabili di SQLite)
+DELETE_BATCH = 500
+
+
+@dataclass
+class ImportReport:
+    """
+    Riepilogo di un import: righe, tempi per fase e throughput.
+    imported conta le righe inserite (tutte nell'import completo, le nuove
+    nella sincronizzazione); rejected conta le righe in quarantena per
+    (motivo, colonna).
+    """
+
+    mode: str = "full"
+    imported: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    quarantined: int = 0
+    rejected: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    dispositions: Dict[str, int] = field(default_factory=dict)
+    convert_seconds: float = 0.0
+    insert_seconds: float = 0.0
+    index_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        rows = self.imported + self.updated + self.unchanged
+        return rows / self.total_seconds if self.total_seconds > 0 else 0.0
+
+
+def read_csv_chunks(csv_path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Blocchi del CSV con le sole colonne note; float letti come float() di Python."""
+    wanted = set(CSV_COLUMN_MAP) | set(NUMERIC_COLUMNS) | set(STRING_COLUMNS)
+    return pd.read_csv(
+        csv_path,
+        chunksize=chunk_size,
+        usecols=lambda column: column in wanted,
+        dtype={name: str for name in STRING_COLUMNS},
+        float_precision="round_trip",
+    )
+
+
+def load_kepoi_names(csv_file: Path = KEPOI_NAMES_PATH) -> Dict[Tuple[float, float, float], str]:
+    """
+    Designazioni KOI (kepoi_name) dal catalogo KOI_with_esi.csv, indicizzate per
+    (RA, Dec, periodo): KOI_cleaned.csv non contiene la colonna kepoi_name.
+    """
+    if not csv_file.exists():
+        return {}
+    df = pd.read_csv(csv_file, usecols=["kepoi_name", "ra", "dec", "koi_period"],
+                     dtype={"kepoi_name": str}, float_precision="round_trip").dropna()
+    df["kepoi_name"] = df["kepoi_name"].str.strip()
+    df = df[df["kepoi_name"] != ""]
+    return dict(zip(zip(df["ra"].tolist(), df["dec"].tolist(), df["koi_period"].tolist()), df["kepoi_name"]))
+
+
+def _strings(chunk: pd.DataFrame, name: str) -> pd.Series:
+    """Colonna di testo ripulita; stringhe vuote come valori mancanti."""
+    if name not in chunk.columns:
+        return pd.Series(None, index=chunk.index, dtype=object)
+    values = chunk[name].str.strip()
+    return values.where(values != "", None)
+
+
+def sync_keys(table: pd.DataFrame) -> pd.Series:
+    """Chiave di sincronizzazione: kepoi_name, altrimenti sorgente + RA/Dec/periodo."""
+    fallback = (table["source"].astype(str) + ":" + table["ra"].astype(str) + ":"
+                + table["dec"].astype(str) + ":" + table["koi_period"].astype(str))
+    return table["kepoi_name"].where(table["kepoi_name"].notna(), fallback)
+
+
+def content_hashes(table: pd.DataFrame) -> pd.Series:
+    """Hash (esadecimale, 64 bit) delle colonne del CSV di ogni riga."""
+    canonical = pd.DataFrame({
+        name: table[name].astype(np.float64) if name in NUMERIC_COLUMNS
+        else table[name].astype(object).where(table[name].notna(), None)
+        for name in HASH_COLUMNS
+    })
+    hashes = pd.util.hash_pandas_object(canonical, index=False).tolist()
+    return pd.Series([f"{value:016x}" for value in hashes], index=table.index, dtype=object)
+
+
+def _add_identity(table: pd.DataFrame, chunk: pd.DataFrame,
+                  kepoi_names: Dict[Tuple[float, float, float], str]) -> None:
+    """Aggiunge source e kepoi_name (dal CSV o da KOI_with_esi.csv) a una tabella con ra, dec e koi_period."""
+    table["source"] = _strings(chunk, "source").fillna(DEFAULT_SOURCE)
+    kepoi_name = _strings(chunk, "kepoi_name")
+    keys = zip(table["ra"].tolist(), table["dec"].tolist(), table["koi_period"].tolist())
+    table["kepoi_name"] = kepoi_name.fillna(pd.Series([kepoi_names.get(key) for key in keys],
+                                                      index=table.index, dtype=object))
+
+
+def rejected_keys(chunk: pd.DataFrame, kepoi_names: Dict[Tuple[float, float, float], str]) -> List[str]:
+    """
+    Chiavi di sincronizzazione di righe rifiutate dalla validazione, calcolate
+    come per le righe valide (i valori non numerici diventano NaN).
+    """
+    table = pd.DataFrame({
+        name: pd.to_numeric(chunk[name], errors="coerce") if name in chunk.columns else np.nan
+        for name in ("ra", "dec", "koi_period")
+    }, index=chunk.index)
+    _add_identity(table, chunk, kepoi_names)
+    return sync_keys(table).tolist()
+
+
+def convert_chunk(chunk: pd.DataFrame, kepoi_names: Dict[Tuple[float, float, float], str]) -> pd.DataFrame:
+    """
+    Righe della tabella planets (senza id e nome) per righe già validate,
+    con punteggi, chiave e hash. I valori mancanti restano NULL.
+    """
+    table = pd.DataFrame(index=chunk.index)
+    for name in NUMERIC_COLUMNS:
+        table[name] = (pd.to_numeric(chunk[name], errors="coerce") if name in chunk.columns
+                       else np.nan)
+    table["koi_disposition"] = _strings(chunk, "koi_disposition")
+    _add_identity(table, chunk, kepoi_names)
+
+    radius = table["koi_prad"].to_numpy(dtype=np.float64)
+    temperature = table["koi_teq"].to_numpy(dtype=np.float64)
+    period = table["koi_period"].to_numpy(dtype=np.float64)
+    table["esi"] = compute_esi(radius, temperature)
+    table["habitability_score"] = compute_habitability(radius, temperature, period)
+    table["sync_key"] = sync_keys(table)
+    table["content_hash"] = content_hashes(table)
+    return table
+
+
+def prepare_chunk(chunk: pd.DataFrame, kepoi_names: Dict[Tuple[float, float, float], str],
+                  seen_keys: set, held_keys: Optional[set] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Valida, converte e deduplica (per sync_key, anche tra blocchi) un blocco del CSV.
+    Restituisce (righe valide, righe rifiutate con reason, column, value, line e raw).
+    Se held_keys è indicato vi aggiunge le chiavi delle righe rifiutate dalla validazione.
+    """
+    chunk = chunk.rename(columns=CSV_COLUMN_MAP)
+    rejected = validate_chunk(chunk)
+    if held_keys is not None and len(rejected):
+        held_keys.update(rejected_keys(chunk.loc[rejected.index], kepoi_names))
+    rows = convert_chunk(chunk.drop(index=rejected.index), kepoi_names)
+    duplicate = (rows["sync_key"].duplicated() | rows["sync_key"].isin(seen_keys)).to_numpy()
+    seen_keys.update(rows["sync_key"][~duplicate].tolist())
+    if duplicate.any():
+        keys = rows["sync_key"][duplicate]
+        rejected = pd.concat([rejected, pd.DataFrame(
+            {"reason": DUPLICATE_KEY, "column": "sync_key", "value": keys}, index=keys.index
+        )]).sort_index()
+    # L'indice di pandas prosegue tra i blocchi: riga del file = indice + 2 (intestazione)
+    rejected["line"] = rejected.index + 2
+    rejected["raw"] = [row_json(chunk, index) for index in rejected.index]
+    return rows[~duplicate], rejected
+
+
+def quarantine(conn: Connection, rejected: pd.DataFrame, source_file: str, run_at: datetime,
+               report: "ImportReport") -> None:
+    """Salva le righe rifiutate in import_quarantine e aggiorna il riepilogo."""
+    if rejected.empty:
+        return
+    conn.execute(QuarantinedRow.__table__.insert(), [
+        {"run_at": run_at, "source_file": source_file, "line": int(line), "reason": reason,
+         "column_name": column, "value": value, "raw": raw}
+        for line, reason, column, value, raw in zip(
+            rejected["line"], rejected["reason"], rejected["column"], rejected["value"], rejected["raw"]
+        )
+    ])
+    for (reason, column), count in rejected.groupby(["reason", "column"]).size().items():
+        report.rejected[(reason, column)] = report.rejected.get((reason, column), 0) + int(count)
+    report.quarantined += len(rejected)
+
+
+def _start_quarantine(conn: Connection, csv_path: Path) -> Tuple[str, datetime]:
+    """La quarantena tiene solo l'ultimo import di ogni file: le righe precedenti vengono rimosse."""
+    source_file = Path(csv_path).name
+    quarantined = QuarantinedRow.__table__
+    conn.execute(quarantined.delete().where(quarantined.c.source_file == source_file))
+    return source_file, datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def assign_ids(table: pd.DataFrame, ids) -> pd.DataFrame:
+    """Id delle righe e nome di default KOI-<id>."""
+    table = table.copy()
+    table.insert(0, "id", ids)
+    table.insert(1, "name", [default_planet_name(int(i)) for i in ids])
+    return table
+
+
+def to_records(table: pd.DataFrame) -> List[dict]:
+    """Dizionari per executemany; NaN diventa NULL."""
+    names = list(table.columns)
+    columns = [[None if value != value else value for value in table[name].tolist()] for name in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def drop_secondary_indexes(conn: Connection, table: str = "planets") -> List[str]:
+    """Rimuove indici e trigger FTS della tabella; restituisce il DDL per ricreare gli indici."""
+    indexes = conn.execute(
+        text("SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name=:table AND sql IS NOT NULL"),
+        {"table": table},
+    ).all()
+    for name, _ in indexes:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    drop_name_triggers(conn)
+    return [sql for _, sql in indexes]
+
+
+def restore_secondary_indexes(conn: Connection, index_sql: List[str]) -> None:
+    """Ricrea gli indici e ricostruisce l'indice FTS dei nomi, poi aggiorna le statistiche."""
+    for sql in index_sql:
+        conn.execute(text(sql))
+    try:
+        create_name_index(conn, rebuild=True)
+    except OperationalError as e:
+        print(f"⚠️  Indice FTS5 trigram non disponibile: {e}")
+    conn.execute(text("ANALYZE"))
+
+
+def bulk_import(csv_path: Path = CSV_PATH, engine: Optional[Engine] = None, chunk_size: int = CHUNK_SIZE,
+                kepoi_names: Optional[Dict] = None) -> ImportReport:
+    """
+    Sostituisce il contenuto della tabella planets con le righe del CSV in
+    un'unica transazione: in caso di errore il database resta invariato.
+    """
+    own_engine = engine is None
+    if own_engine:
+        engine = create_sqlite_engine(read_only=False, begin_immediate=True, pool_size=1, max_overflow=0)
+    if kepoi_names is None:
+        kepoi_names = load_kepoi_names()
+    table = Planet.__table__
+    report = ImportReport()
+    start = time.perf_counter()
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            index_sql = drop_secondary_indexes(conn)
+            conn.execute(table.delete())
+            # Gli id vengono riassegnati: le lapidi di una sincronizzazione precedente non valgono più
+            conn.execute(PlanetTombstone.__table__.delete())
+            source_file, run_at = _start_quarantine(conn, csv_path)
+            seen_keys = set()
+            for chunk in read_csv_chunks(csv_path, chunk_size):
+                t0 = time.perf_counter()
+                rows, rejected = prepare_chunk(chunk, kepoi_names, seen_keys)
+                first_id = report.imported + 1
+                rows = assign_ids(rows, np.arange(first_id, first_id + len(rows)))
+                records = to_records(rows)
+                t1 = time.perf_counter()
+                if records:
+                    conn.execute(table.insert(), records)
+                t2 = time.perf_counter()
+                report.convert_seconds += t1 - t0
+                report.insert_seconds += t2 - t1
+                report.imported += len(records)
+                quarantine(conn, rejected, source_file, run_at, report)
+                for label, count in rows["koi_disposition"].value_counts().items():
+                    report.dispositions[label] = report.dispositions.get(label, 0) + int(count)
+                elapsed = time.perf_counter() - start
+                print(f"📦 Importati {report.imported} pianeti ({report.imported / elapsed:,.0f} righe/s)")
+            t0 = time.perf_counter()
+            restore_secondary_indexes(conn, index_sql)
+            report.index_seconds = time.perf_counter() - t0
+            bump_catalog_version(conn)
+    finally:
+        if own_engine:
+            engine.dispose()
+    report.total_seconds = time.perf_counter() - start
+    return report
+
+
+def sync_import(csv_path: Path = CSV_PATH, engine: Optional[Engine] = None, chunk_size: int = CHUNK_SIZE,
+                kepoi_names: Optional[Dict] = None) -> ImportReport:
+    """
+    Sincronizzazione incrementale della tabella planets con il CSV, per chiave
+    e hash del contenuto: inserisce le righe nuove, aggiorna le modificate e
+    rimuove (con lapide) quelle non più presenti. I pianeti aggiunti via API
+    (senza sync_key) non vengono toccati, e nemmeno quelli la cui riga del CSV
+    finisce in quarantena. Su tabella vuota esegue l'import completo.
+    """
+    own_engine = engine is None
+    if own_engine:
+        engine = create_sqlite_engine(read_only=False, begin_immediate=True, pool_size=1, max_overflow=0)
+    if kepoi_names is None:
+        kepoi_names = load_kepoi_names()
+    table = Planet.__table__
+    report = ImportReport(mode="sync")
+    start = time.perf_counter()
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.connect() as conn:
+            empty = conn.execute(select(func.count()).select_from(table)).scalar() == 0
+        if empty:
+            return bulk_import(csv_path, engine, chunk_size, kepoi_names)
+        # Le colonne del SET sono quelle dei dizionari passati a executemany
+        update = table.update().where(table.c.id == bindparam("_id"))
+        with engine.begin() as conn:
+            # Letto dentro la transazione (BEGIN IMMEDIATE): nessuna scrittura concorrente nel frattempo
+            stored = {key: (planet_id, digest, kepoi_name) for key, planet_id, digest, kepoi_name in conn.execute(
+                select(table.c.sync_key, table.c.id, table.c.content_hash, table.c.kepoi_name)
+                .where(table.c.sync_key.isnot(None))
+            )}
+            next_id = (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+            # Un pianeta rimosso e poi tornato nel catalogo riprende il suo id
+            tombstones = PlanetTombstone.__table__
+            tombstoned = dict(conn.execute(
+                select(tombstones.c.sync_key, tombstones.c.id).where(tombstones.c.id.not_in(select(table.c.id)))
+            ).all())
+            revived = []
+            source_file, run_at = _start_quarantine(conn, csv_path)
+            seen_keys, held_keys = set(), set()
+            for chunk in read_csv_chunks(csv_path, chunk_size):
+                t0 = time.perf_counter()
+                rows, rejected = prepare_chunk(chunk, kepoi_names, seen_keys, held_keys)
+                quarantine(conn, rejected, source_file, run_at, report)
+                known = [stored.get(key) for key in rows["sync_key"].tolist()]
+                is_new = np.array([entry is None for entry in known], dtype=bool)
+                is_changed = np.array([entry is not None and entry[1] != digest
+                                       for entry, digest in zip(known, rows["content_hash"].tolist())], dtype=bool)
+                ids = []
+                for key in rows["sync_key"][is_new].tolist():
+                    planet_id = tombstoned.pop(key, None)
+                    if planet_id is None:
+                        planet_id, next_id = next_id, next_id + 1
+                    else:
+                        revived.append(planet_id)
+                    ids.append(planet_id)
+                new_rows = assign_ids(rows[is_new], ids)
+                changed = rows[is_changed].drop(columns=["sync_key"])
+                changed.insert(0, "_id", [entry[0] for entry, flag in zip(known, is_changed) if flag])
+                inserts, updates = to_records(new_rows), to_records(changed)
+                t1 = time.perf_counter()
+                if inserts:
+                    conn.execute(table.insert(), inserts)
+                if updates:
+                    conn.execute(update, updates)
+                report.convert_seconds += t1 - t0
+                report.insert_seconds += time.perf_counter() - t1
+                report.imported += len(inserts)
+                report.updated += len(updates)
+                report.unchanged += len(rows) - len(inserts) - len(updates)
+                for label, count in rows["koi_disposition"].value_counts().items():
+                    report.dispositions[label] = report.dispositions.get(label, 0) + int(count)
+
+            for i in range(0, len(revived), DELETE_BATCH):
+                conn.execute(tombstones.delete().where(tombstones.c.id.in_(revived[i:i + DELETE_BATCH])))
+            # Una riga in quarantena non è stata rimossa dal catalogo: resta com'era
+            removed = [(key, entry) for key, entry in stored.items()
+                       if key not in seen_keys and key not in held_keys]
+            if removed:
+                removed_ids = [planet_id for _, (planet_id, _, _) in removed]
+                now = datetime.now(timezone.utc).replace(tzinfo=None)
+                for i in range(0, len(removed_ids), DELETE_BATCH):
+                    batch = removed_ids[i:i + DELETE_BATCH]
+                    conn.execute(table.delete().where(table.c.id.in_(batch)))
+                    conn.execute(tombstones.delete().where(tombstones.c.id.in_(batch)))
+                conn.execute(tombstones.insert(), [
+                    {"id": planet_id, "sync_key": key, "kepoi_name": kepoi_name, "removed_at": now}
+                    for key, (planet_id, _, kepoi_name) in removed
+                ])
+            report.removed = len(removed)
+            if report.imported or report.updated or report.removed:
+                bump_catalog_version(conn)
+    finally:
+        if own_engine:
+            engine.dispose()
+    report.total_seconds = time.perf_counter() - start
+    print(f"🔄 Sincronizzazione: {report.imported} nuovi, {report.updated} aggiornati, "
+          f"{report.unchanged} invariati, {report.removed} rimossi")
+    return report
@@ -0,0 +1,292 @@
+"""
+Snapshot colonnare in memoria del catalogo KOI.
+Caricato una sola volta all'avvio (dal database o dal CSV) e condiviso
+in sola lettura da tutti i router. Ogni snapshot ricorda la versione del
+catalogo da cui è stato letto: refresh_catalog() lo ricarica quando un
+import o un inserimento (anche da un altro processo) la incrementa.
+Gli handler async usano refresh_catalog_async(), che non blocca l'event
+loop: legge la versione con l'engine asincrono (al massimo una volta ogni
+CATALOG_VERSION_CHECK_SECONDS) e ricarica lo snapshot in un thread di
+sottofondo, continuando a servire quello vecchio fino alla sostituzione.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from db import async_engine, engine
+from models import CatalogVersion, Planet, default_planet_name
+from utils.esi import compute_esi, compute_habitability
+
+CSV_PATH = Path(__file__).parent.parent / "data" / "KOI_cleaned.csv"
+
+# Colonne numeriche del catalogo (nomi come nel modello Planet)
+NUMERIC_COLUMNS = (
+    "ra", "dec",
+    "koi_period", "koi_prad", "koi_teq", "koi_duration", "koi_depth", "koi_insol",
+    "koi_steff", "koi_srad", "koi_slogg", "koi_kepmag",
+)
+
+# Colonne derivate calcolate alla costruzione dello snapshot
+DERIVED_COLUMNS = ("esi", "habitability_score")
+
+# Il CSV usa RA/Dec maiuscoli, il database ra/dec
+CSV_COLUMN_MAP = {"RA": "ra", "Dec": "dec"}
+
+# Intervallo minimo (secondi) tra due letture della versione da parte degli handler async
+VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "1"))
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Catalogo immutabile: un array NumPy per colonna, disposizione codificata a dizionario."""
+
+    ids: np.ndarray
+    names: np.ndarray
+    columns: Dict[str, np.ndarray]
+    disposition_codes: np.ndarray
+    disposition_labels: Tuple[str, ...]
+    source: str
+    planets_all_json: bytes = field(default=b"", repr=False)
+    version: int = 0  # Versione del catalogo nel database al momento del caricamento
+    revision: str = "0"  # Identifica il contenuto: base degli ETag (utils/http_cache.py)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, name: str) -> np.ndarray:
+        """Restituisce la colonna richiesta (NaN dove il valore manca)."""
+        return self.columns[name]
+
+    def dispositions(self) -> np.ndarray:
+        """Decodifica le disposizioni in un array di stringhe."""
+        return np.asarray(self.disposition_labels, dtype=object)[self.disposition_codes]
+
+    def disposition_mask(self, label: str) -> np.ndarray:
+        """Maschera booleana delle righe con la disposizione indicata."""
+        try:
+            code = self.disposition_labels.index(label)
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return self.disposition_codes == code
+
+
+def _nullable(values: np.ndarray) -> list:
+    """Converte un array float in lista Python con None al posto dei NaN."""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def _render_planets_all(ids, names, columns) -> bytes:
+    """Serializza il payload di /planets/all una volta per snapshot."""
+    n = len(ids)
+    radius = _nullable(columns["koi_prad"])
+    temperature = _nullable(columns["koi_teq"])
+    star_temperature = _nullable(columns["koi_steff"])
+    ra = _nullable(columns["ra"])
+    dec = _nullable(columns["dec"])
+    esi = _nullable(np.round(columns["esi"], 4))
+    planets = [
+        {
+            "name": names[i],
+            "radius": radius[i],
+            "distance": None,  # koi_sma non è presente nel catalogo
+            "temperature": temperature[i],
+            "starTemperature": star_temperature[i],
+            "coordinates": {"ra": ra[i], "dec": dec[i]},
+            "esi": esi[i],
+        }
+        for i in range(n)
+    ]
+    return json.dumps(planets, separators=(",", ":")).encode("utf-8")
+
+
+def _build_snapshot(ids, columns, dispositions, source: str, names=None, version: int = 0,
+                    revision: Optional[str] = None) -> CatalogSnapshot:
+    ids = np.asarray(ids, dtype=np.int64)
+    if names is None:
+        names = [None] * len(ids)
+    names = np.array(
+        [name or default_planet_name(i) for i, name in zip(ids.tolist(), names)], dtype=object
+    )
+    labels, codes = np.unique(np.asarray(dispositions, dtype=object).astype(str), return_inverse=True)
+    columns = {name: np.asarray(columns[name], dtype=np.float64) for name in NUMERIC_COLUMNS}
+    columns["esi"] = compute_esi(columns["koi_prad"], columns["koi_teq"])
+    columns["habitability_score"] = compute_habitability(columns["koi_prad"], columns["koi_teq"], columns["koi_period"])
+    for array in columns.values():
+        array.setflags(write=False)
+    for array in (ids, names):
+        array.setflags(write=False)
+    codes = codes.astype(np.int8)
+    codes.setflags(write=False)
+    return CatalogSnapshot(
+        ids=ids,
+        names=names,
+        columns=columns,
+        disposition_codes=codes,
+        disposition_labels=tuple(labels.tolist()),
+        source=source,
+        planets_all_json=_render_planets_all(ids, names, columns),
+        version=version,
+        revision=str(version) if revision is None else revision,
+    )
+
+
+def read_catalog_version(conn) -> int:
+    """Versione corrente del catalogo (0 se non è mai stata incrementata)."""
+    try:
+        version = conn.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar()
+    except OperationalError as e:
+        # Database precedente alla tabella catalog_version (es. aperto in sola lettura)
+        if "no such table" not in str(e):
+            raise
+        conn.rollback()
+        return 0
+    return version or 0
+
+
+def current_catalog_version() -> int:
+    with engine.connect() as conn:
+        return read_catalog_version(conn)
+
+
+def load_from_db() -> Optional[CatalogSnapshot]:
+    """Carica il catalogo dalla tabella planets; None se la tabella è vuota."""
+    stmt = select(
+        Planet.id, Planet.name, Planet.koi_disposition, *[getattr(Planet, c) for c in NUMERIC_COLUMNS]
+    ).order_by(Planet.id)
+    with engine.connect() as conn:
+        # Versione letta prima delle righe: se un import si inserisce in mezzo, lo
+        # snapshot risulta più vecchio del contenuto e viene ricaricato, mai il contrario
+        version = read_catalog_version(conn)
+        rows = conn.execute(stmt).all()
+    if not rows:
+        return None
+    data = list(zip(*rows))
+    columns = {name: np.array(data[i + 3], dtype=np.float64) for i, name in enumerate(NUMERIC_COLUMNS)}
+    dispositions = [d or "Unknown" for d in data[2]]
+    return _build_snapshot(data[0], columns, dispositions, source="database", names=data[1], version=version)
+
+
+def load_from_csv(csv_path: Path = CSV_PATH, version: int = 0) -> CatalogSnapshot:
+    """Carica il catalogo dal CSV; gli id seguono l'ordine di import_fixed.py."""
+    df = pd.read_csv(csv_path).rename(columns=CSV_COLUMN_MAP)
+    columns = {
+        name: pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+        if name in df.columns else np.full(len(df), np.nan)
+        for name in NUMERIC_COLUMNS
+    }
+    dispositions = df["koi_disposition"].fillna("Unknown").to_numpy()
+    # Il CSV può cambiare tra un riavvio e l'altro: la revisione include la sua data di modifica
+    revision = f"{version}-csv{csv_path.stat().st_mtime_ns:x}"
+    return _build_snapshot(np.arange(1, len(df) + 1), columns, dispositions, source="csv",
+                           version=version, revision=revision)
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_lock = threading.Lock()
+_last_version_check = 0.0
+# Tenuto dal thread che sta ricaricando lo snapshot (al massimo uno alla volta)
+_reload_lock = threading.Lock()
+
+
+def _load_unlocked() -> CatalogSnapshot:
+    global _snapshot
+    try:
+        snapshot = load_from_db()
+    except Exception as e:
+        print(f"⚠️  Catalogo non leggibile dal database: {e}")
+        snapshot = None
+    if snapshot is None:
+        try:
+            version = current_catalog_version()
+        except Exception:
+            version = 0
+        snapshot = load_from_csv(version=version)
+    _snapshot = snapshot
+    print(f"🪐 Catalogo caricato in memoria: {len(snapshot)} pianeti (da {snapshot.source})")
+    return snapshot
+
+
+def load_catalog() -> CatalogSnapshot:
+    """(Ri)carica lo snapshot globale, preferendo il database al CSV."""
+    with _lock:
+        return _load_unlocked()
+
+
+def get_catalog() -> CatalogSnapshot:
+    """Restituisce lo snapshot globale, caricandolo al primo accesso se necessario."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    with _lock:
+        if _snapshot is not None:
+            return _snapshot
+        return _load_unlocked()
+
+
+def refresh_catalog() -> CatalogSnapshot:
+    """
+    Snapshot allineato alla versione del catalogo nel database: se un import o
+    un inserimento l'ha cambiata, lo snapshot viene ricaricato (una sola volta).
+    """
+    snapshot = get_catalog()
+    try:
+        if current_catalog_version() == snapshot.version:
+            return snapshot
+        with _lock:
+            if _snapshot is not None and current_catalog_version() == _snapshot.version:
+                return _snapshot
+            return _load_unlocked()
+    except Exception as e:
+        print(f"⚠️  Versione del catalogo non leggibile, uso lo snapshot corrente: {e}")
+        return snapshot
+
+
+def _reload_in_background() -> None:
+    """Ricarica lo snapshot in un thread dedicato; lo scambio di _snapshot è atomico."""
+    if not _reload_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            refresh_catalog()
+        finally:
+            _reload_lock.release()
+
+    threading.Thread(target=run, name="catalog-reload", daemon=True).start()
+
+
+async def refresh_catalog_async() -> CatalogSnapshot:
+    """
+    Snapshot da servire subito. La versione nel database viene letta con
+    l'engine asincrono al massimo una volta ogni VERSION_CHECK_SECONDS; se è
+    cambiata, il nuovo snapshot si costruisce in sottofondo e fino ad allora
+    resta quello corrente.
+    """
+    global _last_version_check
+    snapshot = _snapshot
+    if snapshot is None:
+        return await asyncio.to_thread(get_catalog)
+    now = time.monotonic()
+    if now - _last_version_check < VERSION_CHECK_SECONDS:
+        return snapshot
+    _last_version_check = now
+    try:
+        async with async_engine.connect() as conn:
+            version = await conn.run_sync(read_catalog_version)
+    except Exception as e:
+        print(f"⚠️  Versione del catalogo non leggibile, uso lo snapshot corrente: {e}")
+        return snapshot
+    if version != snapshot.version:
+        _reload_in_background()
+    return snapshot
@@ -0,0 +1,186 @@
+"""
+Esportazione binaria colonnare del catalogo per i client che caricano
+l'intero set (GalaxyMap, notebook). Formati:
+
+- "arrow": Arrow IPC stream (application/vnd.apache.arrow.stream)
+- "parquet": Parquet (application/vnd.apache.parquet)
+- "float32": layout float32 compatto (application/x-koi-float32), descritto sotto
+
+Ogni formato viene generato una sola volta per snapshot del catalogo e
+tenuto in memoria come bytes. Arrow e Parquet richiedono pyarrow (opzionale).
+
+Layout float32 (little-endian):
+    0   4 byte  magic b"KOIF"
+    4   uint32  lunghezza H dell'intestazione JSON
+    8   H byte  intestazione JSON UTF-8, con spazi finali fino a un multiplo di 4
+    ... uint32 per riga: id dei pianeti (interi esatti, non float32)
+    ... uint8 per riga: disposizione (indice in "dispositions"), con zeri fino a un multiplo di 4
+    ... float32 per colonna (column-major): rows valori per ogni colonna, nell'ordine
+        di "columns"; NaN dove il valore manca
+    ... nomi dei pianeti in UTF-8 separati da "\\n" (offset e lunghezza nell'intestazione)
+L'intestazione contiene version, rows, columns, dispositions, ids_offset,
+dispositions_offset, data_offset, names_offset e names_length (offset in
+byte dall'inizio del payload).
+"""
+
+import json
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.catalog import CatalogSnapshot, DERIVED_COLUMNS, NUMERIC_COLUMNS, get_catalog
+from utils.http_cache import parse_qvalues
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow è opzionale: senza, solo il formato float32
+    pa = None
+    pq = None
+
+FLOAT32_MAGIC = b"KOIF"
+FLOAT32_VERSION = 2
+
+# Colonne numeriche esportate (negli altri formati precedute da id, nome e disposizione)
+EXPORT_COLUMNS = NUMERIC_COLUMNS + DERIVED_COLUMNS
+
+# Formato -> (media type, estensione del file)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "float32": ("application/x-koi-float32", "f32"),
+}
+
+# Media type alternativi accettati nell'header Accept
+MEDIA_TYPE_ALIASES = {
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/octet-stream": "float32",
+}
+
+# Ordine di preferenza quando il client accetta qualunque formato
+DEFAULT_ORDER = ("arrow", "parquet", "float32")
+
+
+def available_formats() -> List[str]:
+    return [name for name in DEFAULT_ORDER if name == "float32" or pa is not None]
+
+
+def negotiate(accept: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """
+    Formato da servire: quello richiesto con ?format=, altrimenti il primo
+    dell'header Accept disponibile; None se nessuno è accettabile.
+    """
+    formats = available_formats()
+    if requested:
+        return requested if requested in formats else None
+    if not accept:
+        return formats[0]
+    by_media_type = {media_type: name for name, (media_type, _) in EXPORT_FORMATS.items()}
+    by_media_type.update(MEDIA_TYPE_ALIASES)
+    for media_type, q in parse_qvalues(accept):
+        if q <= 0:
+            continue
+        if media_type in ("*/*", "application/*"):
+            return formats[0]
+        name = by_media_type.get(media_type)
+        if name in formats:
+            return name
+    return None
+
+
+def build_arrow_table(snapshot: CatalogSnapshot):
+    """Tabella Arrow del catalogo (float64, disposizione codificata a dizionario)."""
+    disposition = pa.DictionaryArray.from_arrays(
+        pa.array(snapshot.disposition_codes, type=pa.int8()), pa.array(list(snapshot.disposition_labels))
+    )
+    arrays = {
+        "id": pa.array(snapshot.ids, type=pa.int64()),
+        "name": pa.array(snapshot.names.tolist(), type=pa.string()),
+        "disposition": disposition,
+    }
+    for name in EXPORT_COLUMNS:
+        # I NaN diventano null, così i notebook li vedono come valori mancanti
+        arrays[name] = pa.array(snapshot.column(name), from_pandas=True)
+    return pa.table(arrays)
+
+
+def build_arrow_stream(snapshot: CatalogSnapshot) -> bytes:
+    table = build_arrow_table(snapshot)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def build_parquet(snapshot: CatalogSnapshot) -> bytes:
+    sink = pa.BufferOutputStream()
+    pq.write_table(build_arrow_table(snapshot), sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+def build_float32(snapshot: CatalogSnapshot) -> bytes:
+    """Payload nel layout float32 documentato nel docstring del modulo."""
+    columns = list(EXPORT_COLUMNS)
+    rows = len(snapshot)
+    if rows and (snapshot.ids.min() < 0 or snapshot.ids.max() > np.iinfo(np.uint32).max):
+        raise ValueError("Id dei pianeti fuori dall'intervallo uint32")
+    ids = snapshot.ids.astype("<u4").tobytes()
+    dispositions = snapshot.disposition_codes.astype(np.uint8).tobytes()
+    dispositions += b"\0" * (-len(dispositions) % 4)
+    data = np.empty((len(columns), rows), dtype="<f4")
+    for i, name in enumerate(columns):
+        data[i] = snapshot.column(name)
+    names = "\n".join(snapshot.names.tolist()).encode("utf-8")
+
+    def header_bytes(ids_offset: int) -> bytes:
+        dispositions_offset = ids_offset + len(ids)
+        data_offset = dispositions_offset + len(dispositions)
+        header = {
+            "version": FLOAT32_VERSION,
+            "rows": rows,
+            "columns": columns,
+            "dispositions": list(snapshot.disposition_labels),
+            "ids_offset": ids_offset,
+            "dispositions_offset": dispositions_offset,
+            "data_offset": data_offset,
+            "names_offset": data_offset + data.nbytes,
+            "names_length": len(names),
+        }
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        return encoded + b" " * (-len(encoded) % 4)
+
+    # Gli offset dipendono dalla lunghezza dell'intestazione, che li contiene
+    ids_offset = 0
+    header = header_bytes(ids_offset)
+    while 8 + len(header) != ids_offset:
+        ids_offset = 8 + len(header)
+        header = header_bytes(ids_offset)
+    return FLOAT32_MAGIC + struct.pack("<I", len(header)) + header + ids + dispositions + data.tobytes() + names
+
+
+BUILDERS = {
+    "arrow": build_arrow_stream,
+    "parquet": build_parquet,
+    "float32": build_float32,
+}
+
+_cache: Dict[str, bytes] = {}
+_cache_snapshot: Optional[CatalogSnapshot] = None
+_lock = threading.Lock()
+
+
+def export_catalog(fmt: str, snapshot: Optional[CatalogSnapshot] = None) -> bytes:
+    """Payload del formato richiesto per lo snapshot (di default quello corrente), generato al primo uso."""
+    global _cache, _cache_snapshot
+    if snapshot is None:
+        snapshot = get_catalog()
+    with _lock:
+        if _cache_snapshot is not snapshot:
+            _cache, _cache_snapshot = {}, snapshot
+        payload = _cache.get(fmt)
+        if payload is None:
+            payload = _cache[fmt] = BUILDERS[fmt](snapshot)
+        return payload
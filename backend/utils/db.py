@@ -3,53 +3,37 @@ Utilità per accedere ai dati planetari dal database.
 Compatibile con il formato KOI_cleaned.csv.
 """
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from db import SessionLocal
 from models import Planet
+from utils.serialization import rows_to_dicts, select_columns
+
+# Campi restituiti da get_all_planets (nomi originali CSV più alias per il frontend)
+ALL_PLANETS_FIELDS = (
+    "id", "name",
+    # Coordinate celesti
+    "ra", "dec",
+    # Dati planetari (nomi originali CSV)
+    "koi_disposition", "koi_period", "koi_prad", "koi_teq",
+    # Dati stellari
+    "koi_steff", "koi_srad",
+    # Altri dati
+    "source",
+    # Aliases per compatibilità frontend
+    "radius", "period", "eq_temp", "star_temp", "star_radius",
+)
 
 def get_all_planets():
     """
     Legge tutti i pianeti dal database e li restituisce come lista di dizionari.
     Formato compatibile con KOI_cleaned.csv e frontend.
+    Seleziona solo le colonne necessarie (tuple, senza oggetti ORM).
     """
     db: Session = SessionLocal()
     try:
-        planets = db.query(Planet).all()
-        
-        # Converte gli oggetti Planet in dizionari per compatibilità frontend
-        planet_dicts = []
-        for planet in planets:
-            planet_dict = {
-                "id": planet.id,
-                "name": planet.name,  # Usa la property per il nome generato
-                
-                # Coordinate celesti
-                "ra": planet.ra,
-                "dec": planet.dec,
-                
-                # Dati planetari (nomi originali CSV)
-                "koi_disposition": planet.koi_disposition,
-                "koi_period": planet.koi_period,
-                "koi_prad": planet.koi_prad,  # RAGGIO PLANETARIO - IMPORTANTE!
-                "koi_teq": planet.koi_teq,
-                
-                # Dati stellari
-                "koi_steff": planet.koi_steff,
-                "koi_srad": planet.koi_srad,
-                
-                # Altri dati
-                "source": planet.source,
-                
-                # Aliases per compatibilità frontend
-                "radius": planet.radius,  # = koi_prad
-                "period": planet.period,  # = koi_period  
-                "eq_temp": planet.eq_temp,  # = koi_teq
-                "star_temp": planet.star_temp,  # = koi_steff
-                "star_radius": planet.star_radius,  # = koi_srad
-            }
-            planet_dicts.append(planet_dict)
-        
-        return planet_dicts
+        rows = db.query(*select_columns(ALL_PLANETS_FIELDS)).order_by(Planet.id).all()
+        return rows_to_dicts(rows, ALL_PLANETS_FIELDS)
         
     finally:
         db.close()
@@ -63,11 +47,10 @@ def get_planets_count():
         db.close()
 
 def get_confirmed_planets():
-    """Restituisce solo i pianeti confermati."""
+    """Restituisce il numero di pianeti confermati (COUNT in SQL, senza caricare le righe)."""
     db: Session = SessionLocal()
     try:
-        planets = db.query(Planet).filter(Planet.koi_disposition == "CONFIRMED").all()
-        return len(planets)
+        return db.query(func.count(Planet.id)).filter(Planet.koi_disposition == "CONFIRMED").scalar()
     finally:
         db.close()
 
@@ -0,0 +1,130 @@
+"""
+Earth Similarity Index (ESI) vettoriale.
+Unica implementazione condivisa da API, importer e snapshot del catalogo:
+stessa formula del notebook data-analysis.ipynb (compute_ESI_row), ma
+calcolata su array NumPy per tutto il catalogo in un solo passaggio.
+Contiene anche il punteggio di abitabilità semplificato usato per le
+classifiche (persistito insieme all'ESI nella tabella planets).
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+# Pesi e valori di riferimento (Earth units)
+ESI_WEIGHTS = {
+    'radius': 0.57,       # R / R_earth
+    'density': 1.07,      # rho / rho_earth
+    'esc_vel': 0.70,      # Ve / Ve_earth
+    'temperature': 5.58,  # T (K), Earth ref = 288 K
+}
+EARTH_TEMP_K = 288.0
+EARTH_UNIT = 1.0
+
+COMPONENTS = ('radius', 'density', 'esc_vel', 'temperature')
+
+
+def _as_array(values) -> np.ndarray:
+    return np.atleast_1d(np.asarray(values, dtype=np.float64))
+
+
+def esi_component(values, ref: float, weight: float) -> np.ndarray:
+    """(1 - |x - x0| / (|x| + |x0|))^w, NaN dove il valore manca."""
+    x = _as_array(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = np.abs(x) + abs(ref)
+        base = 1.0 - np.abs(x - ref) / denom
+    base = np.where(denom == 0, np.nan, np.maximum(base, 0.0))
+    return base ** weight
+
+
+def escape_velocity_eu(radius_eu, density_eu) -> np.ndarray:
+    """Ve in Earth units: R * sqrt(density); NaN se un valore manca o non è positivo."""
+    r = _as_array(radius_eu)
+    d = _as_array(density_eu)
+    valid = (r > 0) & (d > 0)
+    return np.where(valid, r * np.sqrt(np.where(valid, d, 1.0)), np.nan)
+
+
+def esi_components(radius, temperature, density=None) -> Dict[str, np.ndarray]:
+    """
+    Componenti dell'ESI per ogni pianeta.
+
+    Args:
+        radius: raggio planetario (Earth radii), es. koi_prad
+        temperature: temperatura di equilibrio (K), es. koi_teq
+        density: densità (Earth units), opzionale; senza densità i termini
+            density ed esc_vel sono NaN e vengono ignorati
+    """
+    radius = _as_array(radius)
+    temperature = np.broadcast_to(_as_array(temperature), radius.shape)
+    if density is None:
+        density = np.full(radius.shape, np.nan)
+    density = np.broadcast_to(_as_array(density), radius.shape)
+    return {
+        'radius': esi_component(radius, EARTH_UNIT, ESI_WEIGHTS['radius']),
+        'density': esi_component(density, EARTH_UNIT, ESI_WEIGHTS['density']),
+        'esc_vel': esi_component(escape_velocity_eu(radius, density), EARTH_UNIT, ESI_WEIGHTS['esc_vel']),
+        'temperature': esi_component(temperature, EARTH_TEMP_K, ESI_WEIGHTS['temperature']),
+    }
+
+
+def combine_components(components: Dict[str, np.ndarray]):
+    """Media geometrica dei componenti disponibili: (prod c_i)^(1/n). Restituisce (esi, n)."""
+    stacked = np.vstack([components[name] for name in COMPONENTS])
+    valid = ~np.isnan(stacked)
+    n = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_sum = np.where(valid, np.log(np.where(valid, stacked, 1.0)), 0.0).sum(axis=0)
+        esi = np.exp(log_sum / n)
+    esi = np.where(n > 0, esi, np.nan)
+    return esi, n
+
+
+def compute_esi(radius, temperature, density=None) -> np.ndarray:
+    """ESI globale per ogni pianeta (NaN se nessun componente è disponibile)."""
+    esi, _ = combine_components(esi_components(radius, temperature, density))
+    return esi
+
+
+def compute_esi_table(radius, temperature, density=None) -> Dict[str, np.ndarray]:
+    """Componenti, ESI e numero di componenti usati, come le colonne di KOI_with_esi.csv."""
+    components = esi_components(radius, temperature, density)
+    esi, n = combine_components(components)
+    return {**components, 'ESI': esi, 'ESI_n_components': n}
+
+
+def esi_scalar(radius: Optional[float], temperature: Optional[float], density: Optional[float] = None) -> dict:
+    """ESI e componenti per un singolo pianeta (None al posto dei NaN)."""
+    table = compute_esi_table(
+        np.nan if radius is None else radius,
+        np.nan if temperature is None else temperature,
+        None if density is None else density,
+    )
+    out = {name: (None if np.isnan(values[0]) else float(values[0])) for name, values in table.items()
+           if name != 'ESI_n_components'}
+    out['ESI_n_components'] = int(table['ESI_n_components'][0])
+    return out
+
+
+def compute_habitability(radius, temperature, period) -> np.ndarray:
+    """
+    Punteggio di abitabilità semplificato (0..1, arrotondato a 3 decimali).
+    I valori mancanti o nulli non penalizzano; periodi fuori da [1, 1000]
+    giorni dimezzano il punteggio.
+    """
+    radius = _as_array(radius)
+    temperature = np.broadcast_to(_as_array(temperature), radius.shape)
+    period = np.broadcast_to(_as_array(period), radius.shape)
+    score = np.ones(radius.shape)
+    with np.errstate(invalid="ignore"):
+        has_radius = ~np.isnan(radius) & (radius != 0)
+        score = np.where(has_radius, score * np.maximum(0.1, 1.0 - np.abs(radius - 1.0) / 2.0), score)
+        has_temp = ~np.isnan(temperature) & (temperature != 0)
+        score = np.where(has_temp, score * np.maximum(0.1, 1.0 - np.abs(temperature - EARTH_TEMP_K) / 200.0), score)
+        extreme_period = ~np.isnan(period) & (period != 0) & ((period < 1) | (period > 1000))
+        score = np.where(extreme_period, score * 0.5, score)
+    # round() di Python (arrotondamento decimale esatto) invece di np.round,
+    # così i valori coincidono con quelli calcolati riga per riga
+    score = np.clip(score, 0.0, 1.0)
+    return np.array([round(value, 3) for value in score.tolist()], dtype=np.float64).reshape(score.shape)
@@ -0,0 +1,161 @@
+"""
+Cache HTTP legata alla versione del catalogo.
+Le risposte GET che dipendono solo dal catalogo ricevono un ETag forte
+ricavato dalla revisione dello snapshot (utils/catalog.py): un client che
+rimanda l'ETag con If-None-Match riceve 304 senza che la query venga
+eseguita. I corpi grandi (/planets/all, /planets/export) vengono compressi
+con gzip o brotli una sola volta per revisione e serviti dalla memoria.
+"""
+
+import gzip
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from utils.catalog import CatalogSnapshot, refresh_catalog_async
+
+try:
+    import brotli
+except ImportError:  # brotli è opzionale: senza, solo gzip
+    brotli = None
+
+# I corpi più piccoli vengono serviti senza compressione
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Livelli di compressione (la compressione avviene una volta per revisione del catalogo)
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "9"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "9"))
+
+# Il client può riusare la risposta, ma deve prima rivalidarla con l'ETag
+CACHE_CONTROL = "no-cache"
+
+# Codifiche disponibili, in ordine di preferenza a parità di q
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+# mtime=0: stesso contenuto, stessi byte (l'ETag è forte)
+ENCODERS["gzip"] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def parse_qvalues(header: str) -> List[Tuple[str, float]]:
+    """Valori di un header Accept* con il relativo q, in ordine di preferenza (q=0 compresi)."""
+    entries = []
+    for position, part in enumerate(header.split(",")):
+        fields = [field.strip() for field in part.split(";")]
+        value, q = fields[0].lower(), 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if value:
+            entries.append((value, q, position))
+    entries.sort(key=lambda entry: (-entry[1], entry[2]))
+    return [(value, q) for value, q, _ in entries]
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Codifica da usare per la risposta; None per il corpo non compresso."""
+    if not accept_encoding:
+        return None
+    quality = dict(reversed(parse_qvalues(accept_encoding)))
+    wildcard = quality.get("*", 0.0)
+    # A parità di q vince l'ordine di ENCODERS (brotli prima di gzip)
+    q, _, encoding = max((quality.get(name, wildcard), -i, name) for i, name in enumerate(ENCODERS))
+    return encoding if q > 0 else None
+
+
+def catalog_etag(snapshot: CatalogSnapshot, variant: str = "") -> str:
+    """ETag forte della revisione del catalogo; variant distingue formato e codifica."""
+    tag = f"{snapshot.revision}-{variant}" if variant else snapshot.revision
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Confronto debole di If-None-Match (RFC 9110), con più ETag o "*"."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str, vary: Optional[str] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
+
+
+class PrecompressedBodies:
+    """Corpi compressi per (percorso, variante, codifica), validi per una sola revisione del catalogo."""
+
+    def __init__(self):
+        self._revision: Optional[str] = None
+        self._bodies: Dict[Tuple[str, str, str], bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, snapshot: CatalogSnapshot, key: Tuple[str, str], encoding: str, body: bytes) -> bytes:
+        with self._lock:
+            if self._revision != snapshot.revision:
+                self._revision, self._bodies = snapshot.revision, {}
+            encoded = self._bodies.get(key + (encoding,))
+            if encoded is None:
+                encoded = self._bodies[key + (encoding,)] = ENCODERS[encoding](body)
+            return encoded
+
+
+precompressed = PrecompressedBodies()
+
+
+def versioned_response(request: Request, snapshot: CatalogSnapshot, body: bytes, media_type: str,
+                       variant: str = "", compress: bool = True, vary: str = "Accept-Encoding",
+                       headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Risposta con un corpo che dipende solo dalla revisione del catalogo: 304 se
+    il client ha già questa rappresentazione, altrimenti il corpo, precompresso
+    se il client accetta gzip o brotli.
+    """
+    encoding = None
+    if compress and len(body) >= COMPRESS_MIN_BYTES:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+    etag = catalog_etag(snapshot, "-".join(part for part in (variant, encoding) if part))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, vary)
+    response_headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": vary, **(headers or {})}
+    if encoding is not None:
+        body = precompressed.get(snapshot, (request.url.path, variant), encoding, body)
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=response_headers)
+
+
+class CatalogCachedRoute(APIRoute):
+    """
+    Route che dipendono dal catalogo: ogni richiesta controlla (senza bloccare
+    l'event loop) se lo snapshot va ricaricato. Le risposte GET 200 ricevono
+    l'ETag della revisione servita e un If-None-Match corrispondente ottiene
+    304 senza eseguire l'handler. Gli handler che impostano già un ETag
+    (versioned_response) mantengono il proprio.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def conditional_handler(request: Request) -> Response:
+            # ETag calcolato prima della query: al massimo più vecchio del contenuto, mai più nuovo
+            snapshot = await refresh_catalog_async()
+            if request.method != "GET":
+                return await handler(request)
+            etag = catalog_etag(snapshot)
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return not_modified(etag)
+            response = await handler(request)
+            if response.status_code == 200 and "etag" not in response.headers:
+                response.headers["ETag"] = etag
+                response.headers["Cache-Control"] = CACHE_CONTROL
+            return response
+
+        return conditional_handler
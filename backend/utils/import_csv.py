@@ -1,46 +1,25 @@
-import pandas as pd
-from sqlalchemy.orm import Session
-from db import SessionLocal, engine, Base
-from models import Planet
+"""
+Importa un CSV del catalogo KOI nel database.
+Usa l'import massivo di utils/bulk_import.py (lettura a blocchi, executemany
+in un'unica transazione, indici ricostruiti alla fine).
+"""
 
-# CREA LE TABELLE SE NON ESISTONO
-Base.metadata.create_all(bind=engine)
+import sys
+from pathlib import Path
 
-def load_csv_to_db(csv_path: str):
-    df = pd.read_csv(csv_path)
-
-    print(f"Colonne trovate nel CSV: {list(df.columns)}")
-
-    required_cols = [
-        "kepoi_name",   # nome del pianeta
-        "koi_period",   # periodo orbitale
-        "koi_prad",     # raggio del pianeta
-        "koi_srad",     # raggio della stella
-        "koi_steff",    # temperatura stella
-        "koi_teq"       # temperatura di equilibrio (fixata!)
-    ]
+# Aggiungi il percorso del backend al sys.path per le importazioni
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-    missing = [col for col in required_cols if col not in df.columns]
-    if missing:
-        raise RuntimeError(f"❌ Colonne mancanti: {missing}")
+from utils.bulk_import import bulk_import
+from utils.catalog import CSV_PATH
 
-    db: Session = SessionLocal()
 
-    for _, row in df.iterrows():
-        planet = Planet(
-            name=row.get("kepoi_name"),
-            period=row.get("koi_period"),
-            radius=row.get("koi_prad"),
-            star_radius=row.get("koi_srad"),
-            star_temp=row.get("koi_steff"),
-            eq_temp=row.get("koi_teq")
-        )
-        db.add(planet)
-
-    db.commit()
-    db.close()
-    print(f"✅ Import completato: {len(df)} pianeti inseriti con successo!")
+def load_csv_to_db(csv_path: str):
+    report = bulk_import(Path(csv_path))
+    print(f"✅ Import completato: {report.imported} pianeti inseriti in {report.total_seconds:.2f}s "
+          f"({report.rows_per_second:,.0f} righe/s), {report.quarantined} righe in quarantena")
+    return report
 
 
 if __name__ == "__main__":
-    load_csv_to_db("data/KOI_cleaned.csv")
+    load_csv_to_db(sys.argv[1] if len(sys.argv) > 1 else CSV_PATH)
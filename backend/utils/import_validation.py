@@ -0,0 +1,118 @@
+"""
+Validazione delle righe del CSV prima dell'import.
+Ogni colonna ha una regola (tipo, obbligatorietà, intervallo o valori
+ammessi) definita in IMPORT_SCHEMA; le regole sono applicate in modo
+vettoriale a un blocco di righe. Le righe rifiutate finiscono nella tabella
+import_quarantine con un codice del motivo, invece di essere corrette con
+valori di default o scartate in silenzio.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Codici dei motivi di rifiuto
+MISSING_REQUIRED = "missing_required"
+INVALID_NUMBER = "invalid_number"
+OUT_OF_RANGE = "out_of_range"
+INVALID_CHOICE = "invalid_choice"
+DUPLICATE_KEY = "duplicate_key"
+
+DISPOSITIONS = ("CONFIRMED", "CANDIDATE", "FALSE POSITIVE")
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    """Regola di una colonna: "float" con intervallo opzionale, "choice" o "string"."""
+
+    kind: str = "float"
+    required: bool = False
+    min: Optional[float] = None
+    max: Optional[float] = None
+    min_inclusive: bool = True
+    choices: Tuple[str, ...] = ()
+
+
+# Regole per colonna (nomi come nel modello Planet). Gli intervalli escludono
+# solo i valori fisicamente impossibili: il catalogo contiene falsi positivi
+# con raggi e periodi estremi, che devono restare interrogabili.
+IMPORT_SCHEMA: Dict[str, ColumnRule] = {
+    "koi_disposition": ColumnRule(kind="choice", required=True, choices=DISPOSITIONS),
+    "ra": ColumnRule(required=True, min=0.0, max=360.0),
+    "dec": ColumnRule(required=True, min=-90.0, max=90.0),
+    "koi_period": ColumnRule(required=True, min=0.0, min_inclusive=False),
+    "koi_prad": ColumnRule(min=0.0, min_inclusive=False),
+    "koi_teq": ColumnRule(min=0.0, min_inclusive=False),
+    "koi_duration": ColumnRule(min=0.0, min_inclusive=False),
+    "koi_depth": ColumnRule(min=0.0),
+    "koi_insol": ColumnRule(min=0.0),
+    "koi_steff": ColumnRule(min=0.0, min_inclusive=False),
+    "koi_srad": ColumnRule(min=0.0, min_inclusive=False),
+    "koi_slogg": ColumnRule(min=0.0, max=10.0),
+    "koi_kepmag": ColumnRule(),
+    "kepoi_name": ColumnRule(kind="string"),
+    "source": ColumnRule(kind="string"),
+}
+
+
+def _missing(values: pd.Series) -> pd.Series:
+    if values.dtype != object:
+        return values.isna()
+    return values.isna() | (values.astype(str).str.strip() == "")
+
+
+def validate_chunk(chunk: pd.DataFrame, schema: Dict[str, ColumnRule] = IMPORT_SCHEMA) -> pd.DataFrame:
+    """
+    Primo motivo di rifiuto di ogni riga del blocco, nell'ordine dello schema.
+    Restituisce un DataFrame (stesso indice del blocco, solo righe rifiutate)
+    con le colonne reason, column e value.
+    """
+    reason = pd.Series(None, index=chunk.index, dtype=object)
+    column = pd.Series(None, index=chunk.index, dtype=object)
+
+    def reject(mask: pd.Series, code: str, name: str) -> None:
+        mask = mask & reason.isna()
+        reason[mask] = code
+        column[mask] = name
+
+    for name, rule in schema.items():
+        if name not in chunk.columns:
+            if rule.required:
+                reject(pd.Series(True, index=chunk.index), MISSING_REQUIRED, name)
+            continue
+        values = chunk[name]
+        missing = _missing(values)
+        if rule.required:
+            reject(missing, MISSING_REQUIRED, name)
+        if rule.kind == "choice":
+            reject(~missing & ~values.astype(str).str.strip().isin(rule.choices), INVALID_CHOICE, name)
+        elif rule.kind == "float":
+            numbers = pd.to_numeric(values, errors="coerce")
+            invalid = ~missing & ~np.isfinite(numbers.to_numpy(dtype=np.float64))
+            reject(invalid, INVALID_NUMBER, name)
+            out_of_range = pd.Series(False, index=chunk.index)
+            if rule.min is not None:
+                out_of_range |= (numbers < rule.min) if rule.min_inclusive else (numbers <= rule.min)
+            if rule.max is not None:
+                out_of_range |= numbers > rule.max
+            reject(~missing & ~invalid & out_of_range, OUT_OF_RANGE, name)
+
+    rejected = reason.notna()
+    values = [
+        None if name is None or name not in chunk.columns else chunk.at[index, name]
+        for index, name in zip(chunk.index[rejected], column[rejected])
+    ]
+    return pd.DataFrame({
+        "reason": reason[rejected],
+        "column": column[rejected],
+        "value": [None if v is None or v != v else str(v) for v in values],
+    }, index=chunk.index[rejected])
+
+
+def row_json(chunk: pd.DataFrame, index) -> str:
+    """Riga originale del blocco in JSON (NaN -> null), salvata in quarantena."""
+    row = chunk.loc[index]
+    return json.dumps({name: (None if value != value else value) for name, value in row.items()}, default=str)
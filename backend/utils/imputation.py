@@ -0,0 +1,237 @@
+"""
+Imputazione deterministica e vettoriale delle feature mancanti per le predizioni.
+Le statistiche vengono calcolate una sola volta per revisione del catalogo
+(tabella planets) e applicate come operazioni su array all'intero batch.
+"""
+
+import os
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+
+from utils.catalog import CatalogSnapshot, get_catalog
+
+# Strategia di default: "median", "knn" oppure "random"
+DEFAULT_STRATEGY = os.getenv("IMPUTATION_STRATEGY", "median").strip().lower()
+
+# Disposizione di riferimento per le mediane: i candidati da classificare
+DEFAULT_DISPOSITION = "CANDIDATE"
+
+# Valori plausibili basati su statistiche reali degli esopianeti (strategia "random")
+PLAUSIBLE_RANGES = {
+    'koi_steff': (3500, 7000),  # Temperatura stellare (K)
+    'koi_slogg': (4.0, 4.8),    # Gravità stellare
+    'koi_srad': (0.5, 2.0),     # Raggio stellare (solar radii)
+    'koi_kepmag': (10.0, 17.0), # Magnitudine Kepler
+    'koi_period': (0.5, 500.0), # Periodo orbitale (giorni)
+    'koi_duration': (0.5, 10.0),# Durata transito (ore)
+    'koi_depth': (10.0, 10000.0), # Profondità transito (ppm)
+    'koi_prad': (0.5, 20.0),    # Raggio planetario (Earth radii)
+    'koi_insol': (0.01, 1000.0),# Insolazione
+    'koi_teq': (200, 2000)      # Temperatura equilibrio (K)
+}
+
+# Campi generati in scala logaritmica per distribuzioni più realistiche
+LOG_SCALE_FIELDS = ('koi_period', 'koi_depth', 'koi_insol')
+
+
+class Imputer:
+    """Base: riempie i NaN di una matrice (n, len(fields)) senza modificarla in place."""
+
+    name = "base"
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = list(fields)
+
+    def fill(self, X: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        missing = np.isnan(X)
+        if not missing.any():
+            return X
+        return self.fill(X.copy(), missing)
+
+    def describe(self) -> dict:
+        return {"strategy": self.name, "fields": self.fields}
+
+
+class MedianImputer(Imputer):
+    """Mediana della colonna per una disposizione del catalogo."""
+
+    name = "median"
+
+    def __init__(self, fields: Sequence[str], catalog: CatalogSnapshot, disposition: str = DEFAULT_DISPOSITION):
+        super().__init__(fields)
+        self.disposition = disposition
+        mask = catalog.disposition_mask(disposition)
+        if not mask.any():
+            mask = np.ones(len(catalog), dtype=bool)
+        # Per disposizione; fallback sull'intero catalogo se la colonna è vuota
+        self.medians = np.array([
+            _nanmedian(catalog.column(f)[mask], fallback=catalog.column(f)) for f in self.fields
+        ])
+
+    def fill(self, X, missing):
+        return np.where(missing, self.medians, X)
+
+    def describe(self):
+        return {**super().describe(), "disposition": self.disposition,
+                "medians": dict(zip(self.fields, self.medians.tolist()))}
+
+
+class KNNImputer(Imputer):
+    """Media dei k vicini più prossimi nel catalogo, sulle sole feature osservate."""
+
+    name = "knn"
+
+    # Righe con valori mancanti elaborate per volta
+    chunk_rows = 512
+
+    def __init__(self, fields: Sequence[str], catalog: CatalogSnapshot, k: int = 5):
+        super().__init__(fields)
+        self.k = k
+        reference = np.column_stack([catalog.column(f) for f in self.fields])
+        reference = reference[~np.isnan(reference).any(axis=1)]
+        # Standardizzazione per colonna, così nessuna feature domina la distanza
+        self.center = reference.mean(axis=0)
+        self.spread = reference.std(axis=0)
+        self.spread[self.spread == 0] = 1.0
+        self.reference = reference
+        self.reference_z = (reference - self.center) / self.spread
+        self.reference_z_sq = self.reference_z ** 2
+        self.fallback = np.median(reference, axis=0)
+
+    def fill(self, X, missing):
+        rows = np.flatnonzero(missing.any(axis=1))
+        # A blocchi di chunk_rows righe: la matrice delle distanze resta
+        # (chunk_rows x righe di riferimento) anche per batch molto grandi
+        for start in range(0, len(rows), self.chunk_rows):
+            chunk = rows[start:start + self.chunk_rows]
+            X[chunk] = self._fill_rows(X[chunk], missing[chunk])
+        return X
+
+    def _fill_rows(self, X, missing):
+        observed = (~missing).astype(np.float64)
+        Z = np.nan_to_num((X - self.center) / self.spread) * observed
+        # Distanza euclidea mascherata: sum_j w_j (z_j - r_j)^2, espansa in prodotti matriciali
+        distances = Z @ self.reference_z.T
+        distances *= -2.0
+        distances += (Z ** 2).sum(axis=1, keepdims=True)
+        distances += observed @ self.reference_z_sq.T
+        k = min(self.k, len(self.reference))
+        neighbours = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        estimates = self.reference[neighbours].mean(axis=1)
+        # Righe senza alcuna feature osservata: mediana del catalogo
+        estimates[observed.sum(axis=1) == 0] = self.fallback
+        return np.where(missing, estimates, X)
+
+    def describe(self):
+        return {**super().describe(), "k": self.k, "reference_rows": len(self.reference)}
+
+
+class SeededRandomImputer(Imputer):
+    """
+    Valori casuali negli intervalli plausibili, ma deterministici: il seme è
+    derivato dal contenuto della riga, quindi richieste identiche producono
+    sempre gli stessi valori.
+    """
+
+    name = "random"
+
+    def __init__(self, fields: Sequence[str], seed: int = 0):
+        super().__init__(fields)
+        self.seed = seed
+        ranges = [PLAUSIBLE_RANGES.get(f, (np.nan, np.nan)) for f in self.fields]
+        log_scale = np.array([f in LOG_SCALE_FIELDS for f in self.fields])
+        low = np.array([r[0] for r in ranges], dtype=np.float64)
+        high = np.array([r[1] for r in ranges], dtype=np.float64)
+        self.log_scale = log_scale
+        self.low = np.where(log_scale, np.log10(low), low)
+        self.high = np.where(log_scale, np.log10(high), high)
+
+    def fill(self, X, missing):
+        u = _row_uniforms(X, self.seed)
+        draws = self.low + u * (self.high - self.low)
+        draws = np.round(np.where(self.log_scale, 10 ** draws, draws), 2)
+        return np.where(missing, draws, X)
+
+    def describe(self):
+        return {**super().describe(), "seed": self.seed}
+
+
+def _nanmedian(values: np.ndarray, fallback: np.ndarray) -> float:
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        values = fallback[~np.isnan(fallback)]
+    return float(np.median(values)) if len(values) else np.nan
+
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    """Hash splitmix64 vettoriale (aritmetica uint64 modulare)."""
+    with np.errstate(over="ignore"):
+        x = (x + np.uint64(0x9E3779B97F4A7C15)) & _MASK64
+        x = ((x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)) & _MASK64
+        x = ((x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)) & _MASK64
+        return x ^ (x >> np.uint64(31))
+
+
+def _row_uniforms(X: np.ndarray, seed: int) -> np.ndarray:
+    """Uniformi in [0, 1) per cella, funzione solo del seme e dei valori osservati della riga."""
+    bits = np.where(np.isnan(X), 0.0, X).astype(np.float64).view(np.uint64)
+    h = np.full(X.shape[0], np.uint64(seed), dtype=np.uint64)
+    for j in range(X.shape[1]):
+        h = _splitmix64(h ^ bits[:, j])
+    columns = np.arange(X.shape[1], dtype=np.uint64)
+    cell = _splitmix64(h[:, None] ^ _splitmix64(columns)[None, :])
+    return (cell >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def build_imputer(strategy: str, fields: Sequence[str], catalog: Optional[CatalogSnapshot] = None) -> Imputer:
+    """Factory per le strategie di imputazione disponibili."""
+    if strategy == "random":
+        return SeededRandomImputer(fields)
+    catalog = catalog or get_catalog()
+    if strategy == "median":
+        return MedianImputer(fields, catalog)
+    if strategy == "knn":
+        return KNNImputer(fields, catalog)
+    raise ValueError(f"Strategia di imputazione non valida: {strategy}. Strategie disponibili: median, knn, random")
+
+
+_imputers = {}
+_imputers_revision: Optional[str] = None
+_lock = threading.Lock()
+
+
+def peek_imputer(fields: Sequence[str], strategy: str = DEFAULT_STRATEGY) -> Optional[Imputer]:
+    """Imputer già costruito per la revisione corrente del catalogo, oppure None (non lo costruisce)."""
+    imputers = _imputers
+    if _imputers_revision != get_catalog().revision:
+        return None
+    return imputers.get((strategy, tuple(fields)))
+
+
+def get_imputer(fields: Sequence[str], strategy: str = DEFAULT_STRATEGY) -> Imputer:
+    """
+    Imputer condiviso per strategia e ordine di colonne, costruito una sola
+    volta per revisione del catalogo: mediane e vicini del KNN seguono lo
+    snapshot ricaricato dopo un import.
+    """
+    global _imputers, _imputers_revision
+    catalog = get_catalog()
+    key = (strategy, tuple(fields))
+    imputers = _imputers
+    if _imputers_revision == catalog.revision and key in imputers:
+        return imputers[key]
+    with _lock:
+        if _imputers_revision != catalog.revision:
+            _imputers, _imputers_revision = {}, catalog.revision
+        imputer = _imputers.get(key)
+        if imputer is None:
+            imputer = _imputers[key] = build_imputer(strategy, fields, catalog)
+        return imputer
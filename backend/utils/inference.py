@@ -0,0 +1,99 @@
+"""
+Nucleo di inferenza senza pandas per il classificatore di disposizione.
+Porta le feature direttamente in un array float32 nell'ordine atteso dal
+modello e applica lo StandardScaler come semplici array di media/scala.
+"""
+
+import threading
+from typing import Mapping
+
+import numpy as np
+
+# Colonne non scalate che il modello riceve prima delle feature dello scaler
+RA_DEC_FEATURES = ("RA", "Dec")
+
+
+class InferenceCore:
+    """Pipeline scaler + modello precompilata in operazioni NumPy."""
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.feature_names = [str(name) for name in scaler.feature_names_in_]
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+        model_features = _model_feature_names(model)
+        if model_features is None:
+            model_features = list(RA_DEC_FEATURES) + self.feature_names
+        missing = [f for f in list(RA_DEC_FEATURES) + self.feature_names if f not in model_features]
+        if missing or len(model_features) != len(self.feature_names) + len(RA_DEC_FEATURES):
+            raise ValueError(
+                f"Feature del modello {model_features} incompatibili con lo scaler {self.feature_names}"
+            )
+        self.n_features = len(model_features)
+        # Posizioni nel vettore del modello
+        self.ra_dec_index = np.array([model_features.index(f) for f in RA_DEC_FEATURES])
+        self.scaled_index = np.array([model_features.index(f) for f in self.feature_names])
+        self._local = threading.local()
+
+    def _row_buffer(self) -> np.ndarray:
+        """Riga float32 preallocata, una per thread."""
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = np.empty((1, self.n_features), dtype=np.float32)
+            self._local.row = row
+        return row
+
+    def transform(self, X_raw: np.ndarray, ra_dec: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Costruisce la matrice di input del modello.
+
+        Args:
+            X_raw: feature non scalate, shape (n, len(feature_names)), ordine dello scaler
+            ra_dec: coordinate RA/Dec non scalate, shape (n, 2)
+            out: matrice float32 di destinazione (opzionale)
+        """
+        n = X_raw.shape[0]
+        if out is None:
+            out = np.empty((n, self.n_features), dtype=np.float32)
+        out[:, self.scaled_index] = (X_raw - self.mean) / self.scale
+        out[:, self.ra_dec_index] = ra_dec
+        return out
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilità della classe CONFIRMED (1) con una sola valutazione degli alberi."""
+        return self.model.predict_proba(X)[:, 1]
+
+    def score_batch(self, X_raw: np.ndarray, ra_dec: np.ndarray) -> np.ndarray:
+        """Probabilità CONFIRMED per un batch di righe."""
+        return self.predict_proba(self.transform(X_raw, ra_dec))
+
+    def score_one(self, features: Mapping[str, float], ra: float, dec: float) -> float:
+        """Probabilità CONFIRMED per un singolo candidato (feature indicizzate per nome dello scaler)."""
+        raw = np.fromiter((features[name] for name in self.feature_names), dtype=np.float64,
+                          count=len(self.feature_names))
+        return self.score_row(raw, ra, dec)
+
+    def transform_row(self, raw: np.ndarray, ra: float, dec: float) -> np.ndarray:
+        """Riga di input del modello (buffer del thread corrente) per feature già ordinate."""
+        row = self._row_buffer()
+        row[0, self.scaled_index] = (raw - self.mean) / self.scale
+        row[0, self.ra_dec_index] = np.array((ra, dec), dtype=np.float64)  # None -> NaN
+        return row
+
+    def score_row(self, raw: np.ndarray, ra: float, dec: float) -> float:
+        """Probabilità CONFIRMED per una riga già nell'ordine di feature_names."""
+        return float(self.predict_proba(self.transform_row(raw, ra, dec))[0])
+
+
+def _model_feature_names(model):
+    """Nomi delle feature registrati nel modello (sklearn o booster XGBoost)."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return [str(n) for n in names]
+    get_booster = getattr(model, "get_booster", None)
+    if get_booster is not None:
+        names = get_booster().feature_names
+        if names:
+            return list(names)
+    return None
@@ -0,0 +1,170 @@
+"""
+Esecuzione dell'inferenza fuori dall'event loop di asyncio.
+Un pool di thread limitato esegue il lavoro CPU (imputazione, scaler, modello);
+le richieste concorrenti che arrivano nella stessa finestra di micro-batching
+vengono unite in una sola chiamata al modello. Oltre la profondità massima
+della coda le nuove richieste vengono rifiutate (503) invece di accodarsi.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.inference import InferenceCore
+from utils.metrics import registry, stage_timer
+
+# Thread dedicati all'inferenza
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Richieste ammesse contemporaneamente (in coda + in esecuzione)
+INFERENCE_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", "64"))
+# Finestra di micro-batching in millisecondi (0 disabilita l'accorpamento)
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "2"))
+# Righe oltre le quali un micro-batch parte subito senza attendere la finestra
+INFERENCE_MAX_BATCH_ROWS = int(os.getenv("INFERENCE_MAX_BATCH_ROWS", "4096"))
+
+batch_rows = registry.histogram(
+    "inference_batch_rows", "Righe valutate per chiamata al modello",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536),
+)
+
+
+class InferenceOverloaded(Exception):
+    """La coda dell'inferenza è piena."""
+
+
+class InferenceDispatcher:
+    """Pool di thread con controllo di ammissione e micro-batching delle chiamate al modello."""
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, queue_depth: int = INFERENCE_QUEUE_DEPTH,
+                 batch_window_ms: float = INFERENCE_BATCH_WINDOW_MS, max_batch_rows: int = INFERENCE_MAX_BATCH_ROWS):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._in_flight = 0
+        self._pending: List[Tuple[InferenceCore, np.ndarray, np.ndarray, asyncio.Future]] = []
+        self._pending_rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.rejected = 0
+        self.model_calls = 0
+        self.coalesced_requests = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _admit(self) -> None:
+        if self._in_flight >= self.queue_depth:
+            self.rejected += 1
+            raise InferenceOverloaded(f"Inference queue full ({self.queue_depth} requests in flight)")
+        self._in_flight += 1
+
+    def _release(self, _future=None) -> None:
+        self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args):
+        """Esegue una funzione CPU-bound nel pool, rispettando la profondità della coda."""
+        self._admit()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self._release()
+
+    async def score(self, core: InferenceCore, X: np.ndarray, ra_dec: np.ndarray) -> np.ndarray:
+        """
+        Probabilità CONFIRMED per le righe date. Le chiamate concorrenti che
+        arrivano nella stessa finestra vengono unite in un'unica predict_proba.
+        """
+        self._admit()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(self._release)
+        if self.batch_window <= 0 or len(X) >= self.max_batch_rows:
+            self._dispatch(loop, [(core, X, ra_dec, future)])
+        else:
+            self._pending.append((core, X, ra_dec, future))
+            self._pending_rows += len(X)
+            if self._pending_rows >= self.max_batch_rows:
+                self._flush(loop)
+            elif self._timer is None:
+                self._timer = loop.call_later(self.batch_window, self._flush, loop)
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pending_rows = self._pending, [], 0
+        # Normalmente c'è un solo modello; in caso di ricarica si separano i gruppi
+        groups = {}
+        for item in pending:
+            groups.setdefault(id(item[0]), []).append(item)
+        for items in groups.values():
+            self._dispatch(loop, items)
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop, items) -> None:
+        core = items[0][0]
+        self.model_calls += 1
+        self.coalesced_requests += len(items)
+        job = loop.run_in_executor(self.executor, _score_group, core, [i[1] for i in items], [i[2] for i in items])
+
+        def deliver(done: asyncio.Future):
+            if done.cancelled():
+                error = asyncio.CancelledError()
+            else:
+                error = done.exception()
+            offset = 0
+            for _, X, _, future in items:
+                if future.done():
+                    offset += len(X)
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(done.result()[offset:offset + len(X)])
+                offset += len(X)
+
+        job.add_done_callback(deliver)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "batch_window_ms": self.batch_window * 1000.0,
+            "max_batch_rows": self.max_batch_rows,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+            "model_calls": self.model_calls,
+            "coalesced_requests": self.coalesced_requests,
+        }
+
+
+def _score_group(core: InferenceCore, X_parts: List[np.ndarray], ra_dec_parts: List[np.ndarray]) -> np.ndarray:
+    """Eseguita nel pool: una sola trasformazione e una sola predict_proba per il gruppo."""
+    with stage_timer("scaling", "pool"):
+        if len(X_parts) == 1 and len(X_parts[0]) == 1:
+            X_model = core.transform_row(X_parts[0][0], ra_dec_parts[0][0, 0], ra_dec_parts[0][0, 1])
+        else:
+            X_model = core.transform(np.vstack(X_parts), np.vstack(ra_dec_parts))
+    with stage_timer("inference", "pool"):
+        result = core.predict_proba(X_model).astype(np.float64)
+    batch_rows.observe(len(result))
+    return result
+
+
+dispatcher = InferenceDispatcher()
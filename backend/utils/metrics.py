@@ -0,0 +1,184 @@
+"""
+Strumentazione leggera per il backend: istogrammi di latenza in formato
+Prometheus, timer per le fasi della predizione e log di debug campionati.
+"""
+
+import bisect
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+
+# Frazione di richieste di predizione di cui registrare il payload (0 = mai, 1 = sempre)
+LOG_SAMPLE_RATE = float(os.getenv("PREDICTION_LOG_SAMPLE_RATE", "0.01"))
+# Livello del logger applicativo
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Limiti superiori (secondi) dei bucket degli istogrammi
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("exobabel")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Istogramma cumulativo con etichette, compatibile con il formato testuale Prometheus."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [conteggi per bucket (non cumulativi)..., somma, conteggio totale]
+                series = [0] * len(self.buckets) + [0.0, 0]
+                self._series[key] = series
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, le=_format_float(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, le='+Inf')} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {values[-1]}")
+        return "\n".join(lines)
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: Labels, **extra: str) -> str:
+    items = list(key) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class MetricsRegistry:
+    """Raccolta di istogrammi esposti dall'endpoint /metrics."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = Histogram(name, description, buckets)
+                self._histograms[name] = histogram
+            return histogram
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return "\n".join(h.render() for h in histograms) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latenza delle richieste HTTP per router e route"
+)
+prediction_stage_duration = registry.histogram(
+    "prediction_stage_duration_seconds", "Durata delle fasi della pipeline di predizione"
+)
+
+
+@contextmanager
+def stage_timer(stage: str, endpoint: str):
+    """Misura una fase della predizione (validation, imputation, scaling, inference)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        prediction_stage_duration.observe(time.perf_counter() - start, stage=stage, endpoint=endpoint)
+
+
+def should_sample(rate: Optional[float] = None) -> bool:
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+def _json_safe(value):
+    """NaN e infiniti diventano null: il JSON standard non li ammette."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    return value
+
+
+def log_sampled(event: str, rate: Optional[float] = None, **payload) -> None:
+    """Registra un evento strutturato (JSON) solo per una frazione delle richieste."""
+    if logger.isEnabledFor(logging.INFO) and should_sample(rate):
+        logger.info(json.dumps(_json_safe({"event": event, **payload}), default=str, allow_nan=False))
+
+
+class MetricsMiddleware:
+    """Middleware ASGI che misura la latenza di ogni richiesta HTTP per router."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # FastAPI salva la route risolta nello scope durante il routing
+            route = scope.get("route")
+            if route is not None:
+                router = route.tags[0] if getattr(route, "tags", None) else "root"
+                path = route.path
+            else:
+                router, path = "unmatched", "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                router=router, route=path, method=scope["method"], status=str(status["code"]),
+            )
@@ -0,0 +1,240 @@
+"""
+Caricamento del modello di classificazione e dello scaler.
+Valida le feature, esegue un warmup all'avvio dell'app e, se richiesto,
+esporta il booster nel formato nativo XGBoost (JSON/UBJ), più rapido da
+caricare del pickle.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import joblib
+import numpy as np
+
+from utils.inference import InferenceCore
+
+MODELS_DIR = Path(__file__).parent.parent / "models"
+MODEL_PATH = MODELS_DIR / "best_model.pkl"
+SCALER_PATH = MODELS_DIR / "scaler.pkl"
+
+# Formato nativo da esportare/preferire all'avvio: "ubj", "json" oppure vuoto (solo pickle)
+NATIVE_FORMAT = os.getenv("MODEL_NATIVE_FORMAT", "").strip().lower()
+NATIVE_FORMATS = ("ubj", "json")
+
+# Righe sintetiche usate per il warmup
+WARMUP_ROWS = int(os.getenv("MODEL_WARMUP_ROWS", "256"))
+
+# Intervallo minimo (secondi) tra due controlli di modifica dei file del modello
+RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "5"))
+
+
+@dataclass
+class ModelBundle:
+    """Modello, scaler e nucleo di inferenza con le metriche di caricamento."""
+
+    model: object
+    scaler: object
+    core: InferenceCore
+    model_source: str
+    model_hash: str
+    file_mtimes: tuple
+    load_seconds: float
+    warmup_seconds: Optional[float] = None
+    warmup_rows: int = 0
+    loaded_at: float = 0.0
+
+    def diagnostics(self) -> dict:
+        return {
+            "model_type": type(self.model).__name__,
+            "scaler_type": type(self.scaler).__name__,
+            "model_source": self.model_source,
+            "model_hash": self.model_hash,
+            "features": ["RA", "Dec"] + self.core.feature_names,
+            "load_ms": round(self.load_seconds * 1000, 3),
+            "warmup_ms": round(self.warmup_seconds * 1000, 3) if self.warmup_seconds is not None else None,
+            "warmup_rows": self.warmup_rows,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def native_model_path(fmt: str) -> Path:
+    return MODEL_PATH.with_suffix(f".{fmt}")
+
+
+def export_native_model(model, fmt: str = "ubj") -> Path:
+    """Salva il booster nel formato nativo XGBoost accanto al pickle."""
+    if fmt not in NATIVE_FORMATS:
+        raise ValueError(f"Formato non supportato: {fmt}. Formati disponibili: {list(NATIVE_FORMATS)}")
+    path = native_model_path(fmt)
+    model.save_model(str(path))
+    print(f"💾 Modello esportato in formato nativo: {path}")
+    return path
+
+
+def _file_hash(*paths: Path) -> str:
+    """SHA-256 del contenuto dei file del modello."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_mtimes() -> tuple:
+    return tuple(p.stat().st_mtime if p.exists() else None for p in (MODEL_PATH, SCALER_PATH))
+
+
+def _load_native_model(path: Path):
+    import xgboost as xgb
+
+    model = xgb.XGBClassifier()
+    model.load_model(str(path))
+    return model
+
+
+def _fresh_native_path() -> Optional[Path]:
+    """File nativo da usare, se esiste ed è aggiornato rispetto al pickle."""
+    if NATIVE_FORMAT not in NATIVE_FORMATS:
+        return None
+    path = native_model_path(NATIVE_FORMAT)
+    if path.exists() and (not MODEL_PATH.exists() or path.stat().st_mtime >= MODEL_PATH.stat().st_mtime):
+        return path
+    return None
+
+
+def load_model_bundle() -> ModelBundle:
+    """Carica scaler e modello e verifica che le feature siano coerenti."""
+    start = time.perf_counter()
+    mtimes = _file_mtimes()
+    scaler = joblib.load(SCALER_PATH)
+
+    native_path = _fresh_native_path()
+    if native_path is not None:
+        model = _load_native_model(native_path)
+        source = str(native_path.name)
+    else:
+        model = joblib.load(MODEL_PATH)
+        source = str(MODEL_PATH.name)
+    # L'hash segue sempre il pickle: il file nativo ne è solo un derivato
+    model_hash = _file_hash(MODEL_PATH if MODEL_PATH.exists() else native_path, SCALER_PATH)
+
+    # Solleva ValueError se le feature del modello non corrispondono allo scaler
+    core = InferenceCore(model, scaler)
+    load_seconds = time.perf_counter() - start
+
+    if native_path is None and NATIVE_FORMAT in NATIVE_FORMATS:
+        export_native_model(model, NATIVE_FORMAT)
+
+    print(f"✅ Model loaded from {source} in {load_seconds * 1000:.1f} ms ({type(model).__name__})")
+    return ModelBundle(
+        model=model,
+        scaler=scaler,
+        core=core,
+        model_source=source,
+        model_hash=model_hash,
+        file_mtimes=mtimes,
+        load_seconds=load_seconds,
+        loaded_at=time.time(),
+    )
+
+
+def warmup(bundle: ModelBundle, rows: int = WARMUP_ROWS) -> float:
+    """Esegue un batch sintetico e una riga singola per inizializzare xgboost/sklearn."""
+    core = bundle.core
+    rng = np.random.default_rng(0)
+    X_raw = core.mean + core.scale * rng.standard_normal((rows, len(core.feature_names)))
+    ra_dec = np.column_stack([rng.uniform(0, 360, rows), rng.uniform(-90, 90, rows)])
+
+    start = time.perf_counter()
+    core.score_batch(X_raw, ra_dec)
+    core.score_one(dict(zip(core.feature_names, X_raw[0])), ra_dec[0, 0], ra_dec[0, 1])
+    bundle.warmup_seconds = time.perf_counter() - start
+    bundle.warmup_rows = rows
+    print(f"🔥 Model warmup: {rows} rows in {bundle.warmup_seconds * 1000:.1f} ms")
+    return bundle.warmup_seconds
+
+
+_bundle: Optional[ModelBundle] = None
+_load_error: Optional[str] = None
+_last_check = 0.0
+_lock = threading.Lock()
+# Tenuto dal thread che controlla i file del modello (al massimo uno alla volta)
+_reload_lock = threading.Lock()
+
+
+def _load_unlocked(run_warmup: bool) -> Optional[ModelBundle]:
+    global _bundle, _load_error
+    try:
+        bundle = load_model_bundle()
+        if run_warmup:
+            warmup(bundle)
+    except Exception as e:
+        print(f"❌ Error loading model/scaler: {e}")
+        _load_error = str(e)
+        return None
+    _bundle, _load_error = bundle, None
+    return bundle
+
+
+def load_models(run_warmup: bool = True) -> Optional[ModelBundle]:
+    """(Ri)carica modello e scaler; chiamata dal lifespan dell'app."""
+    with _lock:
+        return _load_unlocked(run_warmup)
+
+
+def get_model_bundle() -> Optional[ModelBundle]:
+    """Restituisce il bundle caricato, caricandolo al primo accesso se necessario."""
+    bundle = _bundle
+    if bundle is not None or _load_error is not None:
+        return bundle
+    with _lock:
+        if _bundle is not None or _load_error is not None:
+            return _bundle
+        return _load_unlocked(run_warmup=False)
+
+
+def load_error() -> Optional[str]:
+    return _load_error
+
+
+def _check_files(bundle: ModelBundle) -> None:
+    """Eseguita in un thread di sottofondo: confronta mtime e hash dei file e ricarica se sono cambiati."""
+    try:
+        if _file_mtimes() == bundle.file_mtimes:
+            return
+        with _lock:
+            if _bundle is not bundle:
+                return
+            if MODEL_PATH.exists() and _file_hash(MODEL_PATH, SCALER_PATH) == bundle.model_hash:
+                bundle.file_mtimes = _file_mtimes()
+                return
+            print("♻️  Model files changed on disk, reloading...")
+            # Il nuovo bundle sostituisce il vecchio solo dopo caricamento e warmup
+            _load_unlocked(run_warmup=True)
+    except Exception as e:
+        print(f"❌ Error checking model files: {e}")
+    finally:
+        _reload_lock.release()
+
+
+def refresh_if_changed() -> Optional[ModelBundle]:
+    """
+    Restituisce subito il bundle corrente. Al massimo una volta ogni
+    RELOAD_CHECK_SECONDS avvia in sottofondo il controllo dei file del modello
+    (mtime, hash) e l'eventuale ricarica: gli handler non aspettano mai.
+    """
+    global _last_check
+    bundle = _bundle
+    now = time.monotonic()
+    if bundle is None or now - _last_check < RELOAD_CHECK_SECONDS:
+        return bundle
+    _last_check = now
+    if _reload_lock.acquire(blocking=False):
+        threading.Thread(target=_check_files, args=(bundle,), name="model-reload", daemon=True).start()
+    return bundle
@@ -0,0 +1,143 @@
+"""
+Ricerca per nome sulle colonne materializzate name e kepoi_name.
+La ricerca per prefisso usa gli indici COLLATE NOCASE con un intervallo
+[prefisso, prefisso + U+10FFFF); la ricerca per sottostringa usa un indice
+FTS5 con tokenizer trigram, tenuto allineato alla tabella planets da trigger.
+"""
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from models import Planet
+
+FTS_TABLE = "planets_name_fts"
+
+# Il tokenizer trigram indicizza sequenze di 3 caratteri: query più corte vanno in scansione
+MIN_TRIGRAM_LENGTH = 3
+
+# Carattere massimo Unicode: ogni nome che inizia con il prefisso è minore di prefisso + questo
+PREFIX_UPPER_SENTINEL = "\U0010ffff"
+
+FTS_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, kepoi_name, content='planets', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS planets_name_fts_ai AFTER INSERT ON planets BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, kepoi_name) VALUES (new.id, new.name, new.kepoi_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS planets_name_fts_ad AFTER DELETE ON planets BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, kepoi_name) VALUES ('delete', old.id, old.name, old.kepoi_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS planets_name_fts_au AFTER UPDATE OF name, kepoi_name ON planets BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, kepoi_name) VALUES ('delete', old.id, old.name, old.kepoi_name);
+        INSERT INTO {FTS_TABLE}(rowid, name, kepoi_name) VALUES (new.id, new.name, new.kepoi_name);
+    END""",
+]
+
+# Trigger che tengono allineato l'indice (l'import massivo li sospende durante il caricamento)
+FTS_TRIGGERS = ("planets_name_fts_ai", "planets_name_fts_ad", "planets_name_fts_au")
+
+_fts_available = None
+
+
+def create_name_index(conn, rebuild: bool = False) -> None:
+    """
+    Crea indice FTS5 e trigger sulla connessione data (nella sua transazione).
+    Con rebuild=True, o se l'indice è appena stato creato, lo ricostruisce
+    dal contenuto attuale della tabella. OperationalError senza FTS5/trigram.
+    """
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"), {"name": FTS_TABLE}
+    ).first() is not None
+    for statement in FTS_STATEMENTS:
+        conn.execute(text(statement))
+    if rebuild or not exists:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def drop_name_triggers(conn) -> None:
+    """Rimuove i trigger di sincronizzazione; create_name_index(conn, rebuild=True) li ripristina."""
+    for trigger in FTS_TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+
+
+def ensure_name_index(engine, rebuild: bool = False) -> bool:
+    """
+    Crea (se mancano) l'indice FTS5 trigram e i trigger di sincronizzazione.
+    Restituisce False se SQLite non supporta FTS5/trigram: in quel caso la
+    sottostringa ripiega su LIKE.
+    """
+    global _fts_available
+    try:
+        with engine.begin() as conn:
+            create_name_index(conn, rebuild)
+    except OperationalError as e:
+        print(f"⚠️  Indice FTS5 trigram non disponibile, ricerca per sottostringa senza indice: {e}")
+        _fts_available = False
+        return False
+    _fts_available = True
+    return True
+
+
+def prefix_bounds(prefix: str):
+    """Intervallo [low, high) dei nomi che iniziano con prefix (confronto NOCASE)."""
+    return prefix, prefix + PREFIX_UPPER_SENTINEL
+
+
+def _query(db: Session, columns):
+    """Oggetti Planet completi, oppure solo le colonne indicate (tuple)."""
+    return db.query(*columns) if columns else db.query(Planet)
+
+
+def search_by_prefix(db: Session, prefix: str, limit: int = 20, columns=None) -> list:
+    """Nomi (name o kepoi_name) che iniziano con prefix, senza distinzione maiuscole/minuscole."""
+    low, high = prefix_bounds(prefix)
+    return (_query(db, columns)
+            .filter(or_(
+                (Planet.name >= low) & (Planet.name < high),
+                (Planet.kepoi_name >= low) & (Planet.kepoi_name < high),
+            ))
+            .order_by(Planet.name)
+            .limit(limit)
+            .all())
+
+
+def _fts_phrase(query: str) -> str:
+    """Frase FTS5 letterale: gli operatori della sintassi MATCH non vengono interpretati."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def search_by_substring(db: Session, query: str, limit: int = 20, after_id: int = 0, columns=None) -> list:
+    """Nomi che contengono query, in ordine di id a partire da after_id; usa l'indice trigram quando possibile."""
+    if _fts_available is not False and len(query) >= MIN_TRIGRAM_LENGTH:
+        try:
+            ids = db.execute(
+                text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q AND rowid > :after "
+                     "ORDER BY rowid LIMIT :limit"),
+                {"q": _fts_phrase(query), "after": after_id, "limit": limit},
+            ).scalars().all()
+        except OperationalError:
+            ids = None
+        if ids is not None:
+            if not ids:
+                return []
+            return _query(db, columns).filter(Planet.id.in_(ids)).order_by(Planet.id).all()
+    pattern = f"%{query}%"
+    return (_query(db, columns)
+            .filter(or_(Planet.name.ilike(pattern), Planet.kepoi_name.ilike(pattern)), Planet.id > after_id)
+            .order_by(Planet.id)
+            .limit(limit)
+            .all())
+
+
+def search_names(db: Session, query: str, limit: int = 20, mode: str = "prefix", columns=None) -> list:
+    """Ricerca per nome: mode "prefix" (indice B-tree) o "substring" (indice trigram)."""
+    query = query.strip()
+    if not query:
+        return []
+    if mode == "prefix":
+        return search_by_prefix(db, query, limit, columns)
+    if mode == "substring":
+        return search_by_substring(db, query, limit, columns=columns)
+    raise ValueError(f"Modalità di ricerca non valida: {mode}. Modalità disponibili: ['prefix', 'substring']")
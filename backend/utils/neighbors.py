@@ -0,0 +1,145 @@
+"""
+Ricerca dei k pianeti più simili (k-nearest-neighbour) nello spazio delle
+feature fisiche standardizzate. Le feature vengono standardizzate con media
+e scala di scaler.pkl (le stesse del classificatore) e indicizzate con un
+KD-tree costruito una volta per snapshot del catalogo.
+"""
+
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from utils.catalog import CatalogSnapshot, get_catalog
+from utils.model_loader import get_model_bundle
+
+# Colonne del catalogo usate per la similarità -> nome della feature nello scaler
+NEIGHBOR_FEATURES = {
+    "koi_prad": "planet_radius",
+    "koi_teq": "Teq",
+    "koi_period": "period",
+    "koi_insol": "insolation",
+    "koi_steff": "Teff",
+    "koi_srad": "radius",
+}
+
+DEFAULT_K = 10
+MAX_K = 100
+
+
+def standardization(snapshot: CatalogSnapshot, bundle) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    Media e scala per le colonne di NEIGHBOR_FEATURES: quelle dello scaler se
+    il modello è caricato, altrimenti calcolate sul catalogo.
+    """
+    if bundle is not None:
+        core = bundle.core
+        try:
+            positions = [core.feature_names.index(name) for name in NEIGHBOR_FEATURES.values()]
+        except ValueError:
+            positions = None
+        if positions is not None:
+            return core.mean[positions], core.scale[positions], "scaler"
+    X = np.column_stack([snapshot.column(name) for name in NEIGHBOR_FEATURES])
+    scale = np.nanstd(X, axis=0)
+    return np.nanmean(X, axis=0), np.where(scale > 0, scale, 1.0), "catalog"
+
+
+class NeighborIndex:
+    """KD-tree sulle feature standardizzate (righe con feature mancanti escluse)."""
+
+    def __init__(self, snapshot: CatalogSnapshot, bundle=None):
+        self.snapshot = snapshot
+        # Hash del modello/scaler usato: l'indice va ricostruito se cambia
+        self.scaling_hash = bundle.model_hash if bundle is not None else None
+        self.mean, self.scale, self.scaling_source = standardization(snapshot, bundle)
+        X = np.column_stack([snapshot.column(name) for name in NEIGHBOR_FEATURES])
+        self.rows = np.flatnonzero(~np.isnan(X).any(axis=1))
+        self.points = (X[self.rows] - self.mean) / self.scale
+        self.tree = cKDTree(self.points)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def standardize(self, features: Dict[str, Optional[float]]) -> np.ndarray:
+        """Vettore standardizzato; NaN per le feature non fornite."""
+        raw = np.array(
+            [np.nan if features.get(name) is None else features[name] for name in NEIGHBOR_FEATURES],
+            dtype=np.float64,
+        )
+        return (raw - self.mean) / self.scale
+
+    def query(self, features: Dict[str, Optional[float]], k: int = DEFAULT_K,
+              exclude_rows: Sequence[int] = ()) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        I k pianeti più vicini al vettore di feature dato.
+        Con tutte le feature usa il KD-tree; con un sottoinsieme calcola la
+        distanza solo sulle feature fornite con una scansione NumPy.
+        Restituisce (indici di riga dello snapshot, distanze euclidee standardizzate).
+        """
+        point = self.standardize(features)
+        given = ~np.isnan(point)
+        if not given.any():
+            raise ValueError(f"Serve almeno una feature tra {list(NEIGHBOR_FEATURES)}")
+        exclude = set(int(r) for r in exclude_rows)
+        want = min(k + len(exclude), len(self.rows))
+        if given.all():
+            distances, positions = self.tree.query(point, k=want)
+            distances, positions = np.atleast_1d(distances), np.atleast_1d(positions)
+        else:
+            diff = self.points[:, given] - point[given]
+            all_distances = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+            positions = np.argpartition(all_distances, want - 1)[:want]
+            positions = positions[np.argsort(all_distances[positions], kind="stable")]
+            distances = all_distances[positions]
+        rows = self.rows[positions]
+        keep = np.array([int(r) not in exclude for r in rows], dtype=bool)
+        return rows[keep][:k], distances[keep][:k]
+
+    def row_features(self, row: int) -> Dict[str, Optional[float]]:
+        values = {name: float(self.snapshot.column(name)[row]) for name in NEIGHBOR_FEATURES}
+        return {name: (None if v != v else v) for name, v in values.items()}
+
+    def row_of_id(self, planet_id: int) -> Optional[int]:
+        ids = self.snapshot.ids
+        position = int(np.searchsorted(ids, planet_id))
+        if position < len(ids) and ids[position] == planet_id:
+            return position
+        return None
+
+    def results(self, rows: np.ndarray, distances: np.ndarray) -> list:
+        """Righe del catalogo nel formato della risposta, dalla più simile."""
+        snapshot = self.snapshot
+        out = []
+        for row, distance in zip(rows.tolist(), distances.tolist()):
+            out.append({
+                "id": int(snapshot.ids[row]),
+                "name": snapshot.names[row],
+                "disposition": snapshot.disposition_labels[snapshot.disposition_codes[row]],
+                "distance": round(distance, 6),
+                **self.row_features(row),
+            })
+        return out
+
+
+_index: Optional[NeighborIndex] = None
+_lock = threading.Lock()
+
+
+def get_neighbor_index() -> NeighborIndex:
+    """
+    Indice del catalogo corrente; viene ricostruito quando lo snapshot viene
+    ricaricato (nuova revisione, vedi CatalogCachedRoute) o cambia lo scaler.
+    """
+    global _index
+    snapshot = get_catalog()
+    bundle = get_model_bundle()
+    scaling_hash = bundle.model_hash if bundle is not None else None
+    index = _index
+    if index is not None and index.snapshot.revision == snapshot.revision and index.scaling_hash == scaling_hash:
+        return index
+    with _lock:
+        if _index is None or _index.snapshot.revision != snapshot.revision or _index.scaling_hash != scaling_hash:
+            _index = NeighborIndex(snapshot, bundle)
+        return _index
@@ -1,164 +1,193 @@
 """
 Utilità per ricerche binarie ottimizzate sui pianeti.
 Sfrutta gli indici del database per implementare algoritmi di ricerca efficienti.
+Le ricerche selezionano solo i campi richiesti e restituiscono una pagina di
+tuple (paginazione keyset, vedi utils/pagination.py e utils/serialization.py).
 """
 
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from models import Planet
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence
+from utils.name_search import search_by_substring
+from utils.pagination import DEFAULT_PAGE_SIZE, Page, paginate
+from utils.serialization import SEARCH_FIELDS, select_columns
+
+# Campi esposti dal frontend -> colonne reali della tabella planets
+# (gli alias radius/period/... sono property Python e non si possono usare nelle query)
+FIELD_COLUMNS = {
+    'radius': Planet.koi_prad,
+    'period': Planet.koi_period,
+    'eq_temp': Planet.koi_teq,
+    'star_temp': Planet.koi_steff,
+    'star_radius': Planet.koi_srad,
+    'name': Planet.name,
+    'esi': Planet.esi,
+    'habitability_score': Planet.habitability_score
+}
 
 class PlanetSearchOptimized:
     """Classe per ricerche ottimizzate sui pianeti utilizzando gli indici del database."""
-    
+
     def __init__(self, db: Session):
         self.db = db
-    
-    def binary_search_by_radius(self, min_radius: float, max_radius: float) -> List[Planet]:
+
+    def binary_search_by_radius(self, min_radius: float, max_radius: float,
+                                limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                fields: Sequence[str] = SEARCH_FIELDS) -> Page:
         """
         Ricerca binaria ottimizzata per raggio planetario.
-        Utilizza l'indice idx_planets_radius per performance migliori.
+        Utilizza l'indice su koi_prad per performance migliori.
         """
-        return (self.db.query(Planet)
-                .filter(and_(Planet.radius >= min_radius, Planet.radius <= max_radius))
-                .order_by(Planet.radius)
-                .all())
-    
-    def binary_search_by_temperature(self, min_temp: float, max_temp: float) -> List[Planet]:
+        query = (self.db.query(*select_columns(fields))
+                 .filter(and_(Planet.koi_prad >= min_radius, Planet.koi_prad <= max_radius)))
+        return paginate(query, [Planet.koi_prad], limit, cursor)
+
+    def binary_search_by_temperature(self, min_temp: float, max_temp: float,
+                                     limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                     fields: Sequence[str] = SEARCH_FIELDS) -> Page:
         """
         Ricerca binaria ottimizzata per temperatura di equilibrio.
-        Utilizza l'indice idx_planets_eq_temp per performance migliori.
+        Utilizza l'indice su koi_teq per performance migliori.
         """
-        return (self.db.query(Planet)
-                .filter(and_(Planet.eq_temp >= min_temp, Planet.eq_temp <= max_temp))
-                .order_by(Planet.eq_temp)
-                .all())
-    
-    def binary_search_by_period(self, min_period: float, max_period: float) -> List[Planet]:
+        query = (self.db.query(*select_columns(fields))
+                 .filter(and_(Planet.koi_teq >= min_temp, Planet.koi_teq <= max_temp)))
+        return paginate(query, [Planet.koi_teq], limit, cursor)
+
+    def binary_search_by_period(self, min_period: float, max_period: float,
+                                limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                fields: Sequence[str] = SEARCH_FIELDS) -> Page:
         """
         Ricerca binaria ottimizzata per periodo orbitale.
-        Utilizza l'indice idx_planets_period per performance migliori.
-        """
-        return (self.db.query(Planet)
-                .filter(and_(Planet.period >= min_period, Planet.period <= max_period))
-                .order_by(Planet.period)
-                .all())
-    
-    def search_earth_like_planets(self, 
+        Utilizza l'indice su koi_period per performance migliori.
+        """
+        query = (self.db.query(*select_columns(fields))
+                 .filter(and_(Planet.koi_period >= min_period, Planet.koi_period <= max_period)))
+        return paginate(query, [Planet.koi_period], limit, cursor)
+
+    def search_earth_like_planets(self,
                                  radius_tolerance: float = 0.5,
-                                 temp_tolerance: float = 50.0) -> List[Planet]:
+                                 temp_tolerance: float = 50.0,
+                                 limit: int = DEFAULT_PAGE_SIZE,
+                                 cursor: Optional[str] = None,
+                                 fields: Sequence[str] = SEARCH_FIELDS) -> Page:
         """
         Ricerca ottimizzata per pianeti simili alla Terra.
         Utilizza l'indice composito idx_planet_radius_temp.
-        
+
         Args:
             radius_tolerance: Tolleranza per il raggio (in raggi terrestri)
             temp_tolerance: Tolleranza per la temperatura (in Kelvin)
+            limit: Dimensione della pagina
+            cursor: Cursore restituito dalla pagina precedente
         """
         earth_radius = 1.0  # Raggio terrestre di riferimento
         earth_temp = 288.0  # Temperatura terrestre di riferimento (K)
-        
-        return (self.db.query(Planet)
-                .filter(and_(
-                    Planet.radius >= earth_radius - radius_tolerance,
-                    Planet.radius <= earth_radius + radius_tolerance,
-                    Planet.eq_temp >= earth_temp - temp_tolerance,
-                    Planet.eq_temp <= earth_temp + temp_tolerance
-                ))
-                .order_by(Planet.radius, Planet.eq_temp)
-                .all())
-    
-    def search_by_star_properties(self, 
+
+        query = (self.db.query(*select_columns(fields))
+                 .filter(and_(
+                     Planet.koi_prad >= earth_radius - radius_tolerance,
+                     Planet.koi_prad <= earth_radius + radius_tolerance,
+                     Planet.koi_teq >= earth_temp - temp_tolerance,
+                     Planet.koi_teq <= earth_temp + temp_tolerance
+                 )))
+        return paginate(query, [Planet.koi_prad, Planet.koi_teq], limit, cursor)
+
+    def search_by_star_properties(self,
                                  min_star_radius: float,
                                  max_star_radius: float,
                                  min_star_temp: float,
-                                 max_star_temp: float) -> List[Planet]:
+                                 max_star_temp: float,
+                                 limit: int = DEFAULT_PAGE_SIZE,
+                                 cursor: Optional[str] = None,
+                                 fields: Sequence[str] = SEARCH_FIELDS) -> Page:
         """
         Ricerca ottimizzata basata sulle proprietà stellari.
         Utilizza l'indice composito idx_star_properties.
         """
-        return (self.db.query(Planet)
-                .filter(and_(
-                    Planet.star_radius >= min_star_radius,
-                    Planet.star_radius <= max_star_radius,
-                    Planet.star_temp >= min_star_temp,
-                    Planet.star_temp <= max_star_temp
-                ))
-                .order_by(Planet.star_radius, Planet.star_temp)
-                .all())
-    
+        query = (self.db.query(*select_columns(fields))
+                 .filter(and_(
+                     Planet.koi_srad >= min_star_radius,
+                     Planet.koi_srad <= max_star_radius,
+                     Planet.koi_steff >= min_star_temp,
+                     Planet.koi_steff <= max_star_temp
+                 )))
+        return paginate(query, [Planet.koi_srad, Planet.koi_steff], limit, cursor)
+
     def search_habitable_zone_planets(self,
                                     min_radius: float = 0.5,
                                     max_radius: float = 2.0,
                                     min_temp: float = 200.0,
                                     max_temp: float = 350.0,
                                     min_period: float = 0.1,
-                                    max_period: float = 500.0) -> List[Planet]:
+                                    max_period: float = 500.0,
+                                    limit: int = DEFAULT_PAGE_SIZE,
+                                    cursor: Optional[str] = None,
+                                    fields: Sequence[str] = SEARCH_FIELDS) -> Page:
         """
         Ricerca ottimizzata per pianeti nella zona abitabile.
-        Utilizza l'indice composito idx_planet_habitability.
-        """
-        return (self.db.query(Planet)
-                .filter(and_(
-                    Planet.radius >= min_radius,
-                    Planet.radius <= max_radius,
-                    Planet.eq_temp >= min_temp,
-                    Planet.eq_temp <= max_temp,
-                    Planet.period >= min_period,
-                    Planet.period <= max_period
-                ))
-                .order_by(Planet.radius, Planet.eq_temp, Planet.period)
-                .all())
-    
-    def fast_name_search(self, name_pattern: str, exact_match: bool = False) -> List[Planet]:
-        """
-        Ricerca ottimizzata per nome utilizzando l'indice idx_planets_name.
-        
+        Utilizza l'indice composito idx_planet_radius_temp.
+        """
+        query = (self.db.query(*select_columns(fields))
+                 .filter(and_(
+                     Planet.koi_prad >= min_radius,
+                     Planet.koi_prad <= max_radius,
+                     Planet.koi_teq >= min_temp,
+                     Planet.koi_teq <= max_temp,
+                     Planet.koi_period >= min_period,
+                     Planet.koi_period <= max_period
+                 )))
+        return paginate(query, [Planet.koi_prad, Planet.koi_teq, Planet.koi_period], limit, cursor)
+
+    def fast_name_search(self, name_pattern: str, exact_match: bool = False, limit: int = 100) -> List[Planet]:
+        """
+        Ricerca ottimizzata per nome (name o kepoi_name, senza distinzione maiuscole/minuscole).
+        La corrispondenza esatta usa gli indici NOCASE, la sottostringa l'indice trigram.
+
         Args:
             name_pattern: Pattern di ricerca
             exact_match: Se True, cerca corrispondenza esatta
+            limit: Numero massimo di risultati
         """
         if exact_match:
             return (self.db.query(Planet)
-                   .filter(Planet.name == name_pattern)
+                   .filter(or_(Planet.name == name_pattern, Planet.kepoi_name == name_pattern))
+                   .limit(limit)
                    .all())
         else:
-            return (self.db.query(Planet)
-                   .filter(Planet.name.ilike(f"%{name_pattern}%"))
-                   .order_by(Planet.name)
-                   .all())
-    
-    def get_sorted_planets_by_field(self, field: str, limit: int = 100, ascending: bool = True) -> List[Planet]:
+            return search_by_substring(self.db, name_pattern, limit)
+
+    def get_sorted_planets_by_field(self, field: str, limit: int = DEFAULT_PAGE_SIZE, ascending: bool = True,
+                                    cursor: Optional[str] = None,
+                                    fields: Sequence[str] = SEARCH_FIELDS) -> Page:
         """
         Restituisce pianeti ordinati per un campo specifico.
-        Sfrutta gli indici per ordinamento veloce.
-        
+        Sfrutta gli indici per ordinamento veloce; i pianeti senza valore sono esclusi.
+
         Args:
-            field: Campo per ordinamento ('radius', 'period', 'eq_temp', 'star_temp', 'star_radius')
-            limit: Numero massimo di risultati
+            field: Campo per ordinamento (vedi FIELD_COLUMNS)
+            limit: Dimensione della pagina
             ascending: Ordinamento crescente se True, decrescente se False
+            cursor: Cursore restituito dalla pagina precedente
+        """
+        if field not in FIELD_COLUMNS:
+            raise ValueError(f"Campo non valido: {field}. Campi disponibili: {list(FIELD_COLUMNS.keys())}")
+
+        column = FIELD_COLUMNS[field]
+        query = self.db.query(*select_columns(fields)).filter(column.isnot(None))
+        return paginate(query, [column], limit, cursor, descending=not ascending)
+
+    def top_ranked(self, score: str = 'esi', limit: int = 10, cursor: Optional[str] = None,
+                   fields: Sequence[str] = SEARCH_FIELDS) -> Page:
+        """
+        Pianeti con il punteggio più alto (ESI o abitabilità).
+        I punteggi sono colonne indicizzate: SQLite legge l'indice in ordine
+        inverso e si ferma dopo `limit` righe, senza scansione completa.
         """
-        field_map = {
-            'radius': Planet.radius,
-            'period': Planet.period,
-            'eq_temp': Planet.eq_temp,
-            'star_temp': Planet.star_temp,
-            'star_radius': Planet.star_radius,
-            'name': Planet.name
-        }
-        
-        if field not in field_map:
-            raise ValueError(f"Campo non valido: {field}. Campi disponibili: {list(field_map.keys())}")
-        
-        order_column = field_map[field]
-        if not ascending:
-            order_column = order_column.desc()
-            
-        return (self.db.query(Planet)
-               .order_by(order_column)
-               .limit(limit)
-               .all())
+        if score not in ('esi', 'habitability_score'):
+            raise ValueError(f"Punteggio non valido: {score}. Punteggi disponibili: ['esi', 'habitability_score']")
+        return self.get_sorted_planets_by_field(score, limit, ascending=False, cursor=cursor, fields=fields)
 
 def get_planet_search(db: Session) -> PlanetSearchOptimized:
     """Factory function per creare un'istanza di PlanetSearchOptimized."""
-    return PlanetSearchOptimized(db)
\ No newline at end of file
+    return PlanetSearchOptimized(db)
@@ -0,0 +1,76 @@
+"""
+Paginazione keyset (a cursore) per le liste di pianeti.
+Il cursore è opaco per il client: codifica i valori delle colonne di
+ordinamento (più l'id, che rende l'ordine stabile) dell'ultima riga della
+pagina. La pagina successiva riparte con un confronto su row value, che
+SQLite risolve con l'indice della colonna di ordinamento invece di OFFSET.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from sqlalchemy import tuple_
+
+from models import Planet
+
+# Dimensione di pagina predefinita e massima
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Header con il cursore della pagina successiva (assente sull'ultima pagina)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass
+class Page:
+    """Una pagina di risultati e il cursore per richiedere la successiva."""
+
+    items: list
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(order: Sequence[str], values: Sequence) -> str:
+    payload = json.dumps({"o": list(order), "v": list(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order: Sequence[str]) -> list:
+    """Valori del cursore; ValueError se è malformato o appartiene a un altro ordinamento."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        cursor_order, values = payload["o"], payload["v"]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError("Cursore non valido")
+    if cursor_order != list(order) or not isinstance(values, list) or len(values) != len(order):
+        raise ValueError("Cursore non valido per questo ordinamento")
+    return values
+
+
+def paginate(query, order_columns: List, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+             descending: bool = False) -> Page:
+    """
+    Applica ordinamento (colonne + id), filtro keyset e limite a una query
+    che seleziona colonne (db.query(*colonne)); gli elementi della pagina sono
+    tuple con le sole colonne selezionate. Le colonne di ordinamento non devono
+    contenere NULL (filtrarli a monte).
+    """
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    keys = list(order_columns) + [Planet.id]
+    order = [column.key for column in keys]
+    if cursor:
+        values = decode_cursor(cursor, order)
+        row, after = tuple_(*keys), tuple_(*values)
+        query = query.filter(row < after if descending else row > after)
+    # Le chiavi del cursore vengono selezionate in coda e poi rimosse dalle righe
+    query = query.add_columns(*[column.label(f"_cursor_{i}") for i, column in enumerate(keys)])
+    query = query.order_by(*[column.desc() if descending else column for column in keys])
+    rows = query.limit(limit + 1).all()
+    n_keys = len(keys)
+    items = [tuple(row)[:-n_keys] for row in rows[:limit]]
+    if len(rows) <= limit:
+        return Page(items=items)
+    return Page(items=items, next_cursor=encode_cursor(order, list(rows[limit - 1])[-n_keys:]))
@@ -0,0 +1,118 @@
+"""
+Cache LRU (con TTL opzionale) dei risultati del classificatore.
+La chiave è il vettore di feature dopo l'imputazione, quantizzato, più RA/Dec;
+la cache si svuota da sola quando cambia l'hash del file del modello.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+# Numero massimo di risultati in cache (0 disabilita la cache)
+CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+# Durata di validità in secondi (vuoto = nessuna scadenza)
+CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "0")) or None
+# Cifre decimali mantenute nella chiave
+CACHE_DECIMALS = int(os.getenv("PREDICTION_CACHE_DECIMALS", "6"))
+
+
+class PredictionCache:
+    """Mappa chiave -> probabilità CONFIRMED con evizione LRU e contatori hit/miss."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: Optional[float] = CACHE_TTL,
+                 decimals: int = CACHE_DECIMALS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.decimals = decimals
+        self.model_hash: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def keys(self, X: np.ndarray, ra_dec: np.ndarray) -> List[bytes]:
+        """Una chiave per riga: valori quantizzati, NaN normalizzati, -0.0 -> 0.0."""
+        values = np.round(np.hstack([X, ra_dec]).astype(np.float64), self.decimals) + 0.0
+        values[np.isnan(values)] = np.nan
+        values = np.ascontiguousarray(values)
+        return [row.tobytes() for row in values]
+
+    def bind_model(self, model_hash: str) -> None:
+        """Associa la cache a un modello; se l'hash cambia i risultati vengono scartati."""
+        if model_hash == self.model_hash:
+            return
+        with self._lock:
+            if model_hash != self.model_hash:
+                if self.model_hash is not None:
+                    print(f"♻️  Model hash changed, prediction cache cleared ({len(self._data)} entries)")
+                self._data.clear()
+                self.model_hash = model_hash
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[float]]:
+        if not self.enabled:
+            self.misses += len(keys)
+            return [None] * len(keys)
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and self.ttl is not None and now - entry[1] > self.ttl:
+                    del self._data[key]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[0])
+        return results
+
+    def put_many(self, keys: List[bytes], values: List[float]) -> None:
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._data[key] = (value, now)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: bytes) -> Optional[float]:
+        return self.get_many([key])[0]
+
+    def put(self, key: bytes, value: float) -> None:
+        self.put_many([key], [value])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "model_hash": self.model_hash,
+        }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,178 @@
+"""
+Cache in memoria dei risultati delle ricerche ottimizzate (/search/*).
+La chiave è l'endpoint più i parametri già validati e normalizzati, e il
+valore è il corpo JSON serializzato. La cache vale per una sola revisione
+del catalogo: quando la versione cambia viene svuotata. L'evizione è LRU
+con un limite in byte. Le richieste identiche che arrivano mentre la query
+è in corso aspettano il risultato della prima (singleflight), invece di
+ripetere la query.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Response
+
+from utils.catalog import get_catalog
+from utils.pagination import NEXT_CURSOR_HEADER
+
+# Byte massimi occupati dai corpi in cache (0 disabilita la cache)
+CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Le risposte più grandi non vengono messe in cache, per non svuotarla da sole
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("SEARCH_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+# Stima dello spazio occupato da chiave e strutture di ogni voce
+ENTRY_OVERHEAD_BYTES = 256
+
+# Header della risposta da conservare insieme al corpo
+CACHED_HEADERS = (NEXT_CURSOR_HEADER.lower(),)
+
+# Corpo, media type e header di una risposta in cache
+Entry = Tuple[bytes, Optional[str], Dict[str, str]]
+
+
+class SearchResultCache:
+    """Mappa (endpoint, parametri) -> risposta serializzata, con evizione LRU in byte e contatori."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.revision: Optional[str] = None
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.oversized = 0
+        self._data: "OrderedDict[tuple, Tuple[Entry, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Query in corso per chiave (solo dal thread dell'event loop)
+        self._pending: Dict[tuple, asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def bind_revision(self, revision: str) -> None:
+        """Associa la cache a una revisione del catalogo; se cambia i risultati vengono scartati."""
+        if revision == self.revision:
+            return
+        with self._lock:
+            if revision != self.revision:
+                self._data.clear()
+                self.size_bytes = 0
+                self.revision = revision
+
+    def get(self, key: tuple) -> Optional[Entry]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def put(self, key: tuple, entry: Entry) -> None:
+        body, _, headers = entry
+        size = len(body) + sum(len(k) + len(v) for k, v in headers.items()) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_entry_bytes:
+            self.oversized += 1
+            return
+        with self._lock:
+            # Una query iniziata con la revisione precedente non entra nella cache nuova
+            if key[0] != self.revision:
+                return
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self._data[key] = (entry, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.size_bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size_bytes = 0
+
+    async def respond(self, key: tuple, compute: Callable[[], Awaitable[Response]]) -> Response:
+        """
+        Risposta per la chiave: dalla cache se presente, altrimenti calcolata con
+        compute(); le richieste identiche concorrenti condividono lo stesso calcolo.
+        Le eccezioni di compute() arrivano a tutte le richieste in attesa.
+        """
+        if not self.enabled:
+            self.misses += 1
+            return await compute()
+        revision = get_catalog().revision
+        self.bind_revision(revision)
+        key = (revision,) + key
+
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return _response(entry)
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return _response(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # La richiesta che eseguiva la query è stata annullata: si riprova in proprio
+                return await compute()
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            response = await compute()
+        except asyncio.CancelledError:
+            del self._pending[key]
+            future.cancel()
+            raise
+        except Exception as e:
+            del self._pending[key]
+            future.set_exception(e)
+            future.exception()  # nessun avviso "exception was never retrieved" se non ci sono attese
+            raise
+        del self._pending[key]
+        entry = (
+            bytes(response.body),
+            response.headers.get("content-type"),
+            {name: value for name, value in response.headers.items() if name in CACHED_HEADERS},
+        )
+        if response.status_code == 200:
+            self.put(key, entry)
+        future.set_result(entry)
+        return response
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._data),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entry_bytes": self.max_entry_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "oversized": self.oversized,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "revision": self.revision,
+        }
+
+
+def _response(entry: Entry) -> Response:
+    body, content_type, headers = entry
+    return Response(content=body, headers={**headers, "content-type": content_type} if content_type else headers)
+
+
+search_cache = SearchResultCache()
@@ -0,0 +1,91 @@
+"""
+Proiezione delle colonne e serializzazione veloce delle risposte sui pianeti.
+Le query selezionano solo le colonne richieste (tuple, niente oggetti ORM)
+e le righe vengono codificate in JSON con orjson, se installato.
+Il parametro fields= permette al client di chiedere un sottoinsieme dei campi.
+"""
+
+import json
+from typing import Iterable, Optional, Sequence, Tuple
+
+from fastapi import Response
+from sqlalchemy import func
+
+from models import Planet
+from utils.pagination import NEXT_CURSOR_HEADER, Page
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale: senza, si usa il modulo json standard
+    orjson = None
+
+# Colonne interne della sincronizzazione, non esposte dalle API
+INTERNAL_COLUMNS = ("sync_key", "content_hash")
+
+# Campi disponibili -> espressioni SQL (colonne della tabella e alias per il frontend)
+PLANET_FIELDS = {column.name: column for column in Planet.__table__.columns if column.name not in INTERNAL_COLUMNS}
+PLANET_FIELDS.update({
+    "disposition": Planet.koi_disposition,
+    "radius": Planet.koi_prad,
+    "period": Planet.koi_period,
+    "eq_temp": Planet.koi_teq,
+    "temperature": Planet.koi_teq,
+    "star_temp": Planet.koi_steff,
+    "star_radius": Planet.koi_srad,
+    # Distanza dai valori terrestri di riferimento
+    "radius_diff": func.abs(Planet.koi_prad - 1.0),
+    "temp_diff": func.abs(Planet.koi_teq - 288.0),
+})
+
+# Tutte le colonne della tabella, nell'ordine del modello
+TABLE_FIELDS = tuple(column.name for column in Planet.__table__.columns if column.name not in INTERNAL_COLUMNS)
+
+# Campi restituiti di default dalle ricerche
+SEARCH_FIELDS = ("id", "name", "radius", "period", "eq_temp", "star_temp", "star_radius")
+
+FIELDS_DESCRIPTION = "Campi da restituire separati da virgola (es. id,name,radius)"
+
+
+def parse_fields(fields: Optional[str], default: Sequence[str]) -> Tuple[str, ...]:
+    """Campi richiesti dal client; ValueError se uno non esiste."""
+    if not fields:
+        return tuple(default)
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in PLANET_FIELDS]
+    if unknown or not names:
+        raise ValueError(f"Campi non validi: {unknown}. Campi disponibili: {sorted(PLANET_FIELDS)}")
+    return names
+
+
+def select_columns(names: Iterable[str]) -> list:
+    """Colonne etichettate con il nome del campo, da passare a db.query(*...)."""
+    return [PLANET_FIELDS[name].label(name) for name in names]
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+
+def rows_to_dicts(rows, names: Sequence[str]) -> list:
+    return [dict(zip(names, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    """Risposta JSON codificata con orjson (NaN -> null), senza passare da jsonable_encoder."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def rows_response(rows, names: Sequence[str], headers: Optional[dict] = None) -> FastJSONResponse:
+    return FastJSONResponse(rows_to_dicts(rows, names), headers=headers)
+
+
+def page_response(page: Page, names: Sequence[str]) -> FastJSONResponse:
+    """Pagina di righe proiettate; il cursore successivo va nell'header."""
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+    return rows_response(page.items, names, headers)
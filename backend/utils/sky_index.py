@@ -0,0 +1,143 @@
+"""
+Indice spaziale del cielo per ricerche per posizione (RA/Dec).
+Le coordinate del catalogo vengono convertite in vettori unitari 3D e
+indicizzate con un KD-tree (scipy): una ricerca a cono diventa una ricerca
+per distanza di corda, e sui candidati si calcola la distanza angolare
+esatta (great-circle). La ricerca a box interroga il cono che contiene il
+box e poi filtra i candidati sui limiti esatti di RA/Dec.
+"""
+
+import threading
+from typing import Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from utils.catalog import CatalogSnapshot, get_catalog
+
+
+def radec_to_unit(ra_deg, dec_deg) -> np.ndarray:
+    """Vettori unitari (x, y, z) per coordinate equatoriali in gradi."""
+    ra = np.radians(np.asarray(ra_deg, dtype=np.float64))
+    dec = np.radians(np.asarray(dec_deg, dtype=np.float64))
+    cos_dec = np.cos(dec)
+    return np.stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)], axis=-1)
+
+
+def angular_separation(ra1, dec1, ra2, dec2) -> np.ndarray:
+    """Distanza angolare in gradi (formula di Vincenty, stabile anche a piccole distanze)."""
+    ra1, dec1, ra2, dec2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (ra1, dec1, ra2, dec2))
+    delta = ra2 - ra1
+    sin_d1, cos_d1 = np.sin(dec1), np.cos(dec1)
+    sin_d2, cos_d2 = np.sin(dec2), np.cos(dec2)
+    num = np.hypot(cos_d2 * np.sin(delta), cos_d1 * sin_d2 - sin_d1 * cos_d2 * np.cos(delta))
+    den = sin_d1 * sin_d2 + cos_d1 * cos_d2 * np.cos(delta)
+    return np.degrees(np.arctan2(num, den))
+
+
+def chord_length(radius_deg: float) -> float:
+    """Distanza euclidea tra vettori unitari separati da radius_deg."""
+    return 2.0 * np.sin(np.radians(min(radius_deg, 180.0)) / 2.0)
+
+
+class SkyIndex:
+    """KD-tree sui vettori unitari delle posizioni del catalogo (righe senza RA/Dec escluse)."""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        ra = snapshot.column("ra")
+        dec = snapshot.column("dec")
+        self.rows = np.flatnonzero(~np.isnan(ra) & ~np.isnan(dec))
+        self.ra = ra[self.rows]
+        self.dec = dec[self.rows]
+        self.tree = cKDTree(radec_to_unit(self.ra, self.dec))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def cone(self, ra: float, dec: float, radius_deg: float, limit: Optional[int] = None):
+        """
+        Righe del catalogo entro radius_deg da (ra, dec), ordinate per distanza.
+        Restituisce (indici di riga dello snapshot, distanze in gradi).
+        """
+        center = radec_to_unit(ra, dec)
+        # Piccolo margine sulla corda: il filtro esatto sulla distanza angolare viene dopo
+        candidates = np.asarray(self.tree.query_ball_point(center, chord_length(radius_deg) * (1 + 1e-9)), dtype=np.int64)
+        separation = angular_separation(ra, dec, self.ra[candidates], self.dec[candidates])
+        keep = separation <= radius_deg
+        candidates, separation = candidates[keep], separation[keep]
+        order = np.argsort(separation, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return self.rows[candidates[order]], separation[order]
+
+    def box(self, ra_min: float, ra_max: float, dec_min: float, dec_max: float,
+            limit: Optional[int] = None) -> np.ndarray:
+        """
+        Righe con dec_min <= Dec <= dec_max e RA nell'intervallo [ra_min, ra_max]
+        (se ra_min > ra_max l'intervallo attraversa RA = 0). Ordinate per RA, Dec.
+        """
+        ra_span = (ra_max - ra_min) % 360.0
+        if ra_span == 0.0 and ra_min != ra_max:
+            ra_span = 360.0  # es. [0, 360]: tutto il cerchio
+        # Cono che contiene il box: centro al punto medio, raggio fino al punto più lontano
+        # del bordo (gli angoli o il centro dei lati a Dec costante)
+        ra_center = (ra_min + ra_span / 2.0) % 360.0
+        dec_center = (dec_min + dec_max) / 2.0
+        corners_ra = np.array([ra_min, ra_max, ra_min, ra_max, ra_center, ra_center])
+        corners_dec = np.array([dec_min, dec_min, dec_max, dec_max, dec_min, dec_max])
+        radius = float(angular_separation(ra_center, dec_center, corners_ra, corners_dec).max())
+        if ra_span > 180.0 or dec_min <= -90.0 or dec_max >= 90.0:
+            # Box molto ampi o che includono un polo: il cono non è più stretto del cielo intero
+            radius = 180.0
+        rows, _ = self.cone(ra_center, dec_center, radius + 1e-6)
+        positions = np.searchsorted(self.rows, rows)
+        ra, dec = self.ra[positions], self.dec[positions]
+        in_dec = (dec >= dec_min) & (dec <= dec_max)
+        if ra_min <= ra_max:
+            in_ra = (ra >= ra_min) & (ra <= ra_max)
+        else:
+            in_ra = (ra >= ra_min) | (ra <= ra_max)
+        rows = rows[in_dec & in_ra]
+        order = np.lexsort((self.snapshot.column("dec")[rows], self.snapshot.column("ra")[rows]))
+        if limit is not None:
+            order = order[:limit]
+        return rows[order]
+
+
+_index: Optional[SkyIndex] = None
+_lock = threading.Lock()
+
+
+def get_sky_index() -> SkyIndex:
+    """Indice del catalogo corrente; viene ricostruito se lo snapshot è stato ricaricato."""
+    global _index
+    snapshot = get_catalog()
+    index = _index
+    if index is not None and index.snapshot is snapshot:
+        return index
+    with _lock:
+        if _index is None or _index.snapshot is not snapshot:
+            _index = SkyIndex(snapshot)
+        return _index
+
+
+def sky_rows(snapshot: CatalogSnapshot, rows: np.ndarray, separation: Optional[np.ndarray] = None) -> list:
+    """Righe del catalogo nel formato delle risposte delle ricerche sul cielo."""
+    def values(name):
+        return [None if v != v else v for v in snapshot.column(name)[rows].tolist()]
+
+    columns = {
+        "id": snapshot.ids[rows].tolist(),
+        "name": snapshot.names[rows].tolist(),
+        "disposition": snapshot.dispositions()[rows].tolist(),
+        "ra": values("ra"),
+        "dec": values("dec"),
+        "radius": values("koi_prad"),
+        "temperature": values("koi_teq"),
+        "esi": values("esi"),
+    }
+    if separation is not None:
+        columns["separation_deg"] = separation.tolist()
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
@@ -0,0 +1,181 @@
+"""
+Tile del cielo a livelli di dettaglio per il rendering della GalaxyMap.
+Il cielo è diviso in una piramide di tile RA/Dec (equirettangolare): il
+livello L ha 2^(L+1) colonne di RA e 2^L righe di Dec, tile quadrate di
+180/2^L gradi, numerate riga per riga dal polo sud:
+    tile = dec_index * 2^(L+1) + ra_index
+I figli della tile (L, dec_index, ra_index) sono le quattro tile del livello
+L+1 con indici 2*dec_index + {0, 1} e 2*ra_index + {0, 1}.
+
+Il raffinamento è additivo: ogni pianeta compare in una sola tile. Il
+livello 0 contiene i pianeti più importanti (per ESI o per raggio) di ogni
+tile, fino a TILE_CAPACITY; ogni livello successivo aggiunge i più
+importanti tra quelli rimasti, e l'ultimo livello contiene tutti i restanti.
+Il client carica le tile visibili partendo dal livello 0 e scende finché
+has_children è vero. Le tile vengono costruite e serializzate una sola
+volta per snapshot del catalogo e per criterio di importanza.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.catalog import CatalogSnapshot, get_catalog
+from utils.serialization import dumps
+from utils.sky_index import sky_rows
+
+# Pianeti per tile nei livelli intermedi
+TILE_CAPACITY = int(os.getenv("TILE_CAPACITY", "256"))
+# Livello più profondo: contiene tutti i pianeti non ancora assegnati
+TILE_MAX_LEVEL = int(os.getenv("TILE_MAX_LEVEL", "10"))
+
+# Criteri di importanza: colonna del catalogo, valori più alti prima (NaN in fondo)
+RANKINGS = {"esi": "esi", "radius": "koi_prad"}
+DEFAULT_RANKING = "esi"
+
+
+def tile_grid(level: int) -> Tuple[int, int, float]:
+    """Colonne di RA, righe di Dec e lato (gradi) delle tile del livello."""
+    dec_tiles = 2 ** level
+    return 2 * dec_tiles, dec_tiles, 180.0 / dec_tiles
+
+
+def tile_bounds(level: int, tile: int) -> dict:
+    ra_tiles, _, size = tile_grid(level)
+    dec_index, ra_index = divmod(tile, ra_tiles)
+    return {
+        "ra_min": ra_index * size,
+        "ra_max": (ra_index + 1) * size,
+        "dec_min": -90.0 + dec_index * size,
+        "dec_max": -90.0 + (dec_index + 1) * size,
+    }
+
+
+def tile_of(level: int, ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+    """Indice della tile del livello per ogni coordinata (RA 360 -> 0, Dec 90 nell'ultima riga)."""
+    ra_tiles, dec_tiles, size = tile_grid(level)
+    ra_index = np.minimum((np.mod(ra, 360.0) // size).astype(np.int64), ra_tiles - 1)
+    dec_index = np.clip(((dec + 90.0) // size).astype(np.int64), 0, dec_tiles - 1)
+    return dec_index * ra_tiles + ra_index
+
+
+class SkyTiles:
+    """Piramide di tile di uno snapshot per un criterio di importanza, con i corpi JSON già serializzati."""
+
+    def __init__(self, snapshot: CatalogSnapshot, ranking: str = DEFAULT_RANKING,
+                 capacity: int = TILE_CAPACITY, max_level: int = TILE_MAX_LEVEL):
+        self.snapshot = snapshot
+        self.ranking = ranking
+        self.capacity = capacity
+        ra = snapshot.column("ra")
+        dec = snapshot.column("dec")
+        located = np.flatnonzero(~np.isnan(ra) & ~np.isnan(dec))
+        self.unplaced = len(snapshot) - len(located)
+
+        # Righe in ordine di importanza: una volta ordinate, la selezione per tile è stabile
+        importance = snapshot.column(RANKINGS[ranking])[located]
+        order = np.lexsort((snapshot.ids[located], -np.nan_to_num(importance, nan=0.0), np.isnan(importance)))
+        remaining = located[order]
+
+        self.tiles: Dict[Tuple[int, int], np.ndarray] = {}
+        self.max_level = 0
+        for level in range(max_level + 1):
+            if remaining.size == 0:
+                break
+            self.max_level = level
+            keys = tile_of(level, ra[remaining], dec[remaining])
+            if level == max_level:
+                keep = np.ones(remaining.size, dtype=bool)
+            else:
+                # Posizione di ogni riga tra quelle della sua tile (già in ordine di importanza)
+                grouped = np.argsort(keys, kind="stable")
+                sorted_keys = keys[grouped]
+                starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+                rank = np.arange(remaining.size) - np.repeat(starts, np.diff(np.r_[starts, remaining.size]))
+                keep = np.zeros(remaining.size, dtype=bool)
+                keep[grouped[rank < capacity]] = True
+            # Righe tenute raggruppate per tile, sempre in ordine di importanza
+            selected, selected_keys = remaining[keep], keys[keep]
+            grouped = np.argsort(selected_keys, kind="stable")
+            tiles, starts = np.unique(selected_keys[grouped], return_index=True)
+            for tile, rows in zip(tiles.tolist(), np.split(selected[grouped], starts[1:])):
+                self.tiles[(level, tile)] = rows
+            remaining = remaining[~keep]
+
+        # Una tile ha figli se un suo discendente contiene pianeti
+        self.parents = set()
+        for level, tile in self.tiles:
+            while level > 0:
+                ra_tiles, _, _ = tile_grid(level)
+                dec_index, ra_index = divmod(tile, ra_tiles)
+                level, tile = level - 1, (dec_index // 2) * (ra_tiles // 2) + ra_index // 2
+                self.parents.add((level, tile))
+
+        self.bodies = {key: self._render(*key) for key in self.tiles}
+
+    def _render(self, level: int, tile: int) -> bytes:
+        rows = self.tiles.get((level, tile), np.empty(0, dtype=np.int64))
+        return dumps({
+            "level": level,
+            "tile": tile,
+            "ranking": self.ranking,
+            "bounds": tile_bounds(level, tile),
+            "has_children": (level, tile) in self.parents,
+            "count": int(rows.size),
+            "planets": sky_rows(self.snapshot, rows),
+        })
+
+    def body(self, level: int, tile: int) -> bytes:
+        """Corpo JSON della tile (serializzato alla costruzione; le tile vuote al volo)."""
+        if not 0 <= level <= TILE_MAX_LEVEL:
+            raise KeyError(level)
+        ra_tiles, dec_tiles, _ = tile_grid(level)
+        if not 0 <= tile < ra_tiles * dec_tiles:
+            raise KeyError(tile)
+        body = self.bodies.get((level, tile))
+        return body if body is not None else self._render(level, tile)
+
+    def describe(self) -> dict:
+        """Schema della piramide e numero di tile non vuote per livello."""
+        levels = []
+        for level in range(self.max_level + 1):
+            ra_tiles, dec_tiles, size = tile_grid(level)
+            counts = [rows.size for (tile_level, _), rows in self.tiles.items() if tile_level == level]
+            levels.append({
+                "level": level,
+                "ra_tiles": ra_tiles,
+                "dec_tiles": dec_tiles,
+                "size_deg": size,
+                "tiles": len(counts),
+                "planets": int(sum(counts)),
+            })
+        return {
+            "ranking": self.ranking,
+            "capacity": self.capacity,
+            "max_level": self.max_level,
+            "total": len(self.snapshot),
+            "unplaced": self.unplaced,
+            "levels": levels,
+        }
+
+
+_tiles: Dict[str, SkyTiles] = {}
+_tiles_snapshot: Optional[CatalogSnapshot] = None
+_lock = threading.Lock()
+
+
+def get_sky_tiles(ranking: str = DEFAULT_RANKING) -> SkyTiles:
+    """Piramide del catalogo corrente per il criterio indicato; ricostruita se lo snapshot cambia."""
+    global _tiles, _tiles_snapshot
+    if ranking not in RANKINGS:
+        raise ValueError(f"Criterio non valido: {ranking}. Valori ammessi: {list(RANKINGS)}")
+    snapshot = get_catalog()
+    with _lock:
+        if _tiles_snapshot is not snapshot:
+            _tiles, _tiles_snapshot = {}, snapshot
+        tiles = _tiles.get(ranking)
+        if tiles is None:
+            tiles = _tiles[ranking] = SkyTiles(snapshot, ranking)
+        return tiles
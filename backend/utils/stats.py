@@ -0,0 +1,180 @@
+"""
+Aggregati del catalogo per le viste di popolazione: conteggi per
+disposizione, istogrammi 1D e griglie 2D calcolati con NumPy sullo
+snapshot in memoria. I risultati restano in memoria per snapshot (cioè per
+versione del catalogo): le richieste ripetute non ricalcolano nulla.
+Le colonne a coda lunga (raggio, periodo, insolazione, profondità) usano
+di default bin logaritmici; i valori mancanti e quelli fuori intervallo
+vengono contati a parte.
+"""
+
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.catalog import CatalogSnapshot, DERIVED_COLUMNS, NUMERIC_COLUMNS, get_catalog
+
+# Colonne aggregabili
+STATS_COLUMNS = NUMERIC_COLUMNS + DERIVED_COLUMNS
+
+# Scala di default dei bin per colonna (le altre sono lineari)
+DEFAULT_SCALES = {"koi_prad": "log", "koi_period": "log", "koi_insol": "log", "koi_depth": "log"}
+SCALES = ("linear", "log")
+
+# Istogrammi e griglia restituiti dal riepilogo di /stats
+SUMMARY_HISTOGRAMS = ("koi_prad", "koi_teq", "koi_period", "koi_insol")
+SUMMARY_GRID = ("koi_period", "koi_prad")
+
+DEFAULT_BINS = 30
+MAX_BINS = 200
+DEFAULT_GRID_BINS = 30
+MAX_GRID_BINS = 100
+
+# Risultati memorizzati per snapshot (combinazioni di parametri diverse)
+RESULT_CACHE_SIZE = 256
+
+
+def _round(values: np.ndarray) -> list:
+    """Estremi dei bin con 6 cifre significative (payload più compatto)."""
+    return [float(f"{v:.6g}") for v in values.tolist()]
+
+
+class CatalogStats:
+    """Aggregati di uno snapshot del catalogo, memorizzati per combinazione di parametri."""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        self.histogram = lru_cache(maxsize=RESULT_CACHE_SIZE)(self._histogram)
+        self.grid = lru_cache(maxsize=RESULT_CACHE_SIZE)(self._grid)
+        self.summary = lru_cache(maxsize=1)(self._summary)
+
+    def disposition_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.snapshot.disposition_codes, minlength=len(self.snapshot.disposition_labels))
+        return dict(zip(self.snapshot.disposition_labels, counts.tolist()))
+
+    def _mask(self, disposition: Optional[str]) -> Optional[np.ndarray]:
+        if disposition is None:
+            return None
+        if disposition not in self.snapshot.disposition_labels:
+            raise ValueError(
+                f"Disposizione non valida: {disposition}. Valori disponibili: {list(self.snapshot.disposition_labels)}"
+            )
+        return self.snapshot.disposition_mask(disposition)
+
+    def _axis(self, column: str, scale: Optional[str], bins: int, range_min: Optional[float],
+              range_max: Optional[float], mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, dict]:
+        """
+        Valori di una colonna nello spazio dei bin (log10 per la scala logaritmica),
+        estremi dei bin nello stesso spazio e descrizione dell'asse per la risposta.
+        """
+        if column not in STATS_COLUMNS:
+            raise ValueError(f"Colonna non valida: {column}. Colonne disponibili: {list(STATS_COLUMNS)}")
+        scale = scale or DEFAULT_SCALES.get(column, "linear")
+        if scale not in SCALES:
+            raise ValueError(f"Scala non valida: {scale}. Valori ammessi: {list(SCALES)}")
+        if not 1 <= bins <= MAX_BINS:
+            raise ValueError(f"bins deve essere tra 1 e {MAX_BINS}")
+        if range_min is not None and range_max is not None and range_min >= range_max:
+            raise ValueError("range_min deve essere minore di range_max")
+
+        values = self.snapshot.column(column)
+        if mask is not None:
+            values = values[mask]
+        finite = np.isfinite(values)
+        if scale == "log":
+            if range_min is not None and range_min <= 0:
+                raise ValueError("Con la scala logaritmica range_min deve essere positivo")
+            # I valori non positivi non hanno un bin logaritmico: contano come sotto
+            # l'intervallo; i non finiti restano NaN e contano come mancanti
+            binnable = finite & (values > 0)
+            space = np.where(finite, -np.inf, np.nan)
+            space[binnable] = np.log10(values[binnable])
+            lo = np.log10(range_min) if range_min is not None else None
+            hi = np.log10(range_max) if range_max is not None else None
+        else:
+            binnable = finite
+            space = np.where(finite, values, np.nan)
+            lo, hi = range_min, range_max
+
+        present = space[binnable]
+        if lo is None:
+            lo = float(present.min()) if present.size else 0.0
+        if hi is None:
+            hi = float(present.max()) if present.size else 1.0
+        if hi <= lo:
+            hi = lo + 1.0
+        edges = np.linspace(lo, hi, bins + 1)
+        axis = {
+            "column": column,
+            "scale": scale,
+            "edges": _round(10.0 ** edges if scale == "log" else edges),
+        }
+        return space, edges, axis
+
+    def _histogram(self, column: str, scale: Optional[str] = None, bins: int = DEFAULT_BINS,
+                   range_min: Optional[float] = None, range_max: Optional[float] = None,
+                   disposition: Optional[str] = None) -> dict:
+        """Istogramma 1D: counts[i] conta i valori in [edges[i], edges[i+1]) (l'ultimo bin è chiuso)."""
+        mask = self._mask(disposition)
+        space, edges, axis = self._axis(column, scale, bins, range_min, range_max, mask)
+        missing = np.isnan(space)
+        present = space[~missing]
+        counts, _ = np.histogram(present, bins=edges)
+        return {
+            **axis,
+            "disposition": disposition,
+            "counts": counts.tolist(),
+            "total": int(space.size),
+            "missing": int(missing.sum()),
+            "underflow": int((present < edges[0]).sum()),
+            "overflow": int((present > edges[-1]).sum()),
+        }
+
+    def _grid(self, x: str, y: str, x_scale: Optional[str] = None, y_scale: Optional[str] = None,
+              x_bins: int = DEFAULT_GRID_BINS, y_bins: int = DEFAULT_GRID_BINS,
+              disposition: Optional[str] = None) -> dict:
+        """Griglia 2D: counts[i][j] conta i pianeti nel bin i di x e nel bin j di y."""
+        if not (1 <= x_bins <= MAX_GRID_BINS and 1 <= y_bins <= MAX_GRID_BINS):
+            raise ValueError(f"x_bins e y_bins devono essere tra 1 e {MAX_GRID_BINS}")
+        mask = self._mask(disposition)
+        x_space, x_edges, x_axis = self._axis(x, x_scale, x_bins, None, None, mask)
+        y_space, y_edges, y_axis = self._axis(y, y_scale, y_bins, None, None, mask)
+        # Solo i pianeti con entrambi i valori dentro gli estremi (i non positivi in scala log sono esclusi)
+        both = np.isfinite(x_space) & np.isfinite(y_space)
+        counts, _, _ = np.histogram2d(x_space[both], y_space[both], bins=[x_edges, y_edges])
+        return {
+            "x": x_axis,
+            "y": y_axis,
+            "disposition": disposition,
+            "counts": counts.astype(np.int64).tolist(),
+            "total": int(x_space.size),
+            "binned": int(both.sum()),
+        }
+
+    def _summary(self) -> dict:
+        """Conteggi per disposizione, istogrammi principali e griglia periodo/raggio."""
+        return {
+            "total": len(self.snapshot),
+            "dispositions": self.disposition_counts(),
+            "histograms": {column: self.histogram(column) for column in SUMMARY_HISTOGRAMS},
+            "grid": self.grid(*SUMMARY_GRID),
+        }
+
+
+_stats: Optional[CatalogStats] = None
+_lock = threading.Lock()
+
+
+def get_catalog_stats() -> CatalogStats:
+    """Aggregati del catalogo corrente; ricreati (vuoti) quando lo snapshot viene ricaricato."""
+    global _stats
+    snapshot = get_catalog()
+    stats = _stats
+    if stats is not None and stats.snapshot is snapshot:
+        return stats
+    with _lock:
+        if _stats is None or _stats.snapshot is not snapshot:
+            _stats = CatalogStats(snapshot)
+        return _stats